@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class ControlAllocator:
+    """Maps normalized axis commands to actuator outputs.
+
+    Each mode holds a precomputed effectiveness matrix (outputs x axes)
+    and an output offset, so mixing is a single matrix-vector product.
+    Transitions interpolate between the matrices of two modes. Outputs
+    listed as motors are desaturated as a group: if any motor would
+    exceed its upper limit the whole group is shifted down, which keeps
+    the differential (attitude) part of the command intact at the cost
+    of collective thrust. All buffers are preallocated.
+
+    Parameters
+    ----------
+    axes : int
+        Length of the command vector.
+    minimum : np.ndarray
+        Lower limit of each output.
+    maximum : np.ndarray
+        Upper limit of each output.
+    motors : slice, optional
+        Outputs desaturated together, by default None.
+    """
+
+    def __init__(self, axes: int, minimum: np.ndarray, maximum: np.ndarray, motors: slice | None = None) -> None:
+        """Inits the allocator with output limits."""
+        self.axes = axes
+        self.minimum = np.asarray(minimum, dtype=np.float64)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+        self.outputs = self.minimum.shape[0]
+        assert self.maximum.shape == self.minimum.shape, "ControlAllocator limits must have the same shape"
+
+        self._motors = motors
+        self._matrices: dict[str, np.ndarray] = {}
+        self._offsets: dict[str, np.ndarray] = {}
+
+        self._blend_matrix = np.zeros((self.outputs, 2*axes), dtype=np.float64)
+        self._blend_command = np.zeros(2*axes, dtype=np.float64)
+        self._blend_offset = np.zeros(self.outputs, dtype=np.float64)
+        self._blend_scratch = np.zeros(self.outputs, dtype=np.float64)
+        self._nan = np.zeros(self.outputs, dtype=bool)
+        self._excess = np.zeros(len(range(*motors.indices(self.outputs))) if motors is not None else 0, dtype=np.float64)
+
+    def add_mode(self, name: str, matrix: np.ndarray, offset: np.ndarray | None = None) -> None:
+        """Register the effectiveness matrix and offset of a mode."""
+        matrix = np.array(matrix, dtype=np.float64)
+        assert matrix.shape == (self.outputs, self.axes), f"Mixing matrix for {name} must be {self.outputs}x{self.axes}"
+        self._matrices[name] = matrix
+        self._offsets[name] = np.zeros(self.outputs, dtype=np.float64) if offset is None else np.array(offset, dtype=np.float64)
+
+    def allocate(self, mode: str, command: np.ndarray, out: np.ndarray, offset: np.ndarray | None = None) -> np.ndarray:
+        """Mix a command with a single mode into out."""
+        np.matmul(self._matrices[mode], command, out=out)
+        out += self._offsets[mode]
+        if offset is not None:
+            out += offset
+        return self._saturate(out)
+
+    def blend(
+            self,
+            mode_a: str,
+            command_a: np.ndarray,
+            mode_b: str,
+            command_b: np.ndarray,
+            ratio: float,
+            out: np.ndarray,
+            offset: np.ndarray | None = None) -> np.ndarray:
+        """Mix two commands with the matrices of two modes interpolated by ratio (1 is mode_b)."""
+        axes = self.axes
+        np.multiply(self._matrices[mode_a], 1-ratio, out=self._blend_matrix[:, :axes])
+        np.multiply(self._matrices[mode_b], ratio, out=self._blend_matrix[:, axes:])
+        self._blend_command[:axes] = command_a
+        self._blend_command[axes:] = command_b
+
+        np.multiply(self._offsets[mode_a], 1-ratio, out=self._blend_offset)
+        np.multiply(self._offsets[mode_b], ratio, out=self._blend_scratch)
+        self._blend_offset += self._blend_scratch
+
+        np.matmul(self._blend_matrix, self._blend_command, out=out)
+        out += self._blend_offset
+        if offset is not None:
+            out += offset
+        return self._saturate(out)
+
+    def _saturate(self, out: np.ndarray) -> np.ndarray:
+        """Desaturate the motor group, then clamp every output to its limits."""
+        np.copyto(out, 0.0, where=np.isnan(out, out=self._nan))
+
+        if self._motors is not None:
+            motors = out[self._motors]
+            excess = np.subtract(motors, self.maximum[self._motors], out=self._excess).max()
+            if excess > 0.0:
+                motors -= excess
+
+        np.maximum(out, self.minimum, out=out)
+        np.minimum(out, self.maximum, out=out)
+        return out
+
+
+def _tests() -> bool:
+    allocator = ControlAllocator(2, minimum=[-1.0, 0.0, 0.0], maximum=[1.0, 1.0, 1.0], motors=slice(1, 3))
+    allocator.add_mode('a', [[1.0, 0.0], [0.5, 1.0], [-0.5, 1.0]])
+    allocator.add_mode('b', [[0.0, 0.0], [0.0, 2.0], [0.0, 2.0]], offset=[0.5, 0.0, 0.0])
+    out = np.zeros(3)
+
+    allocator.allocate('a', np.array([0.2, 0.5]), out)
+    assert np.allclose(out, [0.2, 0.6, 0.4])
+
+    # Collective is reduced so the differential survives
+    allocator.allocate('a', np.array([0.4, 0.95]), out)
+    assert np.allclose(out, [0.4, 1.0, 0.6])
+
+    allocator.blend('a', np.array([0.2, 0.5]), 'b', np.array([0.0, 0.25]), 0.5, out)
+    assert np.allclose(out, [0.35, 0.55, 0.45])
+    allocator.blend('a', np.array([0.2, 0.5]), 'b', np.array([0.0, 0.25]), 0.0, out)
+    assert np.allclose(out, [0.2, 0.6, 0.4])
+
+    allocator.allocate('a', np.array([np.nan, 0.5]), out)
+    assert np.allclose(out, [0.0, 0.0, 0.0])
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
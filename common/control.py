@@ -0,0 +1,673 @@
+"""AFCS control laws
+
+Flight and VTOL control laws as a pure step function with no asyncio or
+UAVCAN dependency, so they can run inside the live AFCS or in batch
+simulations and regression runs faster than real time.
+
+    state = ControlState()
+    outputs, state = step(state, sensors, setpoints, dt=1e4)
+
+The state is updated in place and returned; copy() it first to keep the
+previous one. Sensors are any object with att, alt, aoa and ias members
+laid out like the uav.RxBuffer the AFCS takes each cycle, whose dt
+fields (microseconds, 0.0 when there is no fresh sample) are used
+unless dt is given.
+"""
+
+import copy
+import math
+import os
+
+import numpy as np
+
+from common.allocation import ControlAllocator
+from common.angles import calc_dyaw
+from common.pid import PIDBank, RateGroup
+from common.profiler import StageProfiler
+from common.schedule import GainSchedule
+from common.states import GlobalStates as g
+
+MAX_THROTTLE = 14000
+BASE_THROTTLE_PCT = 0.4
+GAIN_SCHEDULE = os.path.join(os.path.dirname(__file__), 'gain_schedule.json')
+
+# Mixing matrices, columns are roll, pitch, yaw, throttle
+FLIGHT_MIX = [
+    [ 1.0,  1.0,  0.0,  0.0], # elevon1
+    [-1.0,  1.0,  0.0,  0.0], # elevon2
+    [ 0.0,  0.0,  0.0,  0.0], # wing tilt
+    [ 0.0,  0.0,  0.0,  1.0], # esc1
+    [ 0.0,  0.0,  0.0,  1.0], # esc2
+    [ 0.0,  0.0,  0.0,  1.0], # esc3
+    [ 0.0,  0.0,  0.0,  1.0], # esc4
+]
+VTOL_MIX = [
+    [ 0.0,  0.0, -1.0,  0.0],
+    [ 0.0,  0.0,  1.0,  0.0],
+    [ 0.0,  0.0,  0.0,  0.0],
+    [ 0.0,  1.0,  0.0,  1.0],
+    [ 0.0,  1.0,  0.0,  1.0],
+    [ 1.0, -1.0,  0.0,  1.0],
+    [-1.0, -1.0,  0.0,  1.0],
+]
+TRANSIT_MIX = [[0.0]*4]*3 + VTOL_MIX[3:]
+
+VTOL_SUBMODES = (g.CUSTOM_SUBMODE_TAKEOFF_ASCENT, g.CUSTOM_SUBMODE_TAKEOFF_DEPART, g.CUSTOM_SUBMODE_LANDING_DESCENT, g.CUSTOM_SUBMODE_LANDING_HOVER)
+TRANSIT_SUBMODES = (g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT, g.CUSTOM_SUBMODE_LANDING_TRANSIT)
+FLIGHT_SUBMODES = (g.CUSTOM_SUBMODE_FLIGHT_NORMAL, g.CUSTOM_SUBMODE_FLIGHT_TERRAIN_AVOIDANCE)
+
+# Stages lapped by a StageProfiler around and inside step()
+PROFILE_STAGES = ('setpoints', 'flight', 'vtol', 'mix', 'mode', 'tx')
+
+# Internal setpoints that are copied from Setpoints each step
+SETPOINT_NAMES = {'_sp_altitude': 'altitude', '_sp_heading': 'heading', '_spf_ias': 'ias'}
+
+
+class Setpoints:
+    """Commanded values for a control step."""
+    def __init__(
+            self,
+            submode: int = g.CUSTOM_SUBMODE_UNINIT,
+            altitude: float = 100.0,
+            heading: float = 0.0,
+            ias: float = 40.0,
+            hover_alt: float = 0.0) -> None:
+        """Inits the setpoints."""
+        self.submode = submode
+        self.altitude = altitude
+        self.heading = heading
+        self.ias = ias
+        self.hover_alt = hover_alt
+
+
+class Sensors:
+    """Sensor samples for offline use, laid out like uav.RxBuffer."""
+    class Att:
+        def __init__(self) -> None:
+            self.roll = 0.0
+            self.pitch = 0.0
+            self.yaw = 0.0
+            self.rollspeed = 0.0
+            self.pitchspeed = 0.0
+            self.yawspeed = 0.0
+            self.xspeed = 0.0
+            self.yspeed = 0.0
+            self.zspeed = 0.0
+            self.dt = 0.0
+
+    class Alt:
+        def __init__(self) -> None:
+            self.altitude = 0.0
+            self.dt = 0.0
+
+    class Aoa:
+        def __init__(self) -> None:
+            self.aoa = 0.0
+            self.dt = 0.0
+
+    class Ias:
+        def __init__(self) -> None:
+            self.ias = 0.0
+            self.dt = 0.0
+
+    def __init__(self) -> None:
+        """Inits zeroed sensors."""
+        self.att = Sensors.Att()
+        self.alt = Sensors.Alt()
+        self.aoa = Sensors.Aoa()
+        self.ias = Sensors.Ias()
+
+
+class Outputs:
+    """Actuator outputs and mode requests from a control step.
+
+    Attributes
+    ----------
+    servos : np.ndarray
+        Elevon 1, elevon 2 and wing tilt in radians.
+    throttles : np.ndarray
+        Four motor commands, 0 to MAX_THROTTLE.
+    inc_mode : bool
+        The step requests the next submode.
+    disarm : bool
+        The step requests a switch to ground disarmed.
+    """
+    def __init__(self, servos: np.ndarray, throttles: np.ndarray) -> None:
+        """Inits the outputs on the state's buffers."""
+        self.servos = servos
+        self.throttles = throttles
+        self.inc_mode = False
+        self.disarm = False
+
+
+class ControlState:
+    """Controllers and internal variables of the control laws.
+
+    Attribute names match the AFCS tuning map (utilities.pid_tune_map),
+    so controllers and internal setpoints can be set by name.
+
+    Parameters
+    ----------
+    inner_divider : int, optional
+        Rate divider of the rate loops, by default 1.
+    outer_divider : int, optional
+        Rate divider of the attitude, altitude and heading loops, by default 2.
+    schedule : GainSchedule, optional
+        Gain schedule, by default None which loads GAIN_SCHEDULE. Scheduled
+        kp values are multipliers (PIDBank scale) on each controller's
+        current kp, so gains set from the GCS keep being scheduled.
+    """
+    def __init__(self, inner_divider: int = 1, outer_divider: int = 2, schedule: GainSchedule | None = None) -> None:
+        """Inits the controllers with their default gains."""
+        # Rate loops run every sensor sample, attitude/altitude/heading loops at a divided rate
+        self._inner = RateGroup(inner_divider)
+        self._outer = RateGroup(outer_divider)
+
+        self._vpath = 0.0
+        self._dyaw = 0.0
+        self._ias_scalar = 1.0
+        self._vtol_ratio = 1.0
+
+        # Output buffers are preallocated and only ever updated in place
+        self._fcommand = np.zeros(4, dtype=np.float64) # roll, pitch, yaw, throttle
+        self._vcommand = np.zeros(4, dtype=np.float64)
+        self._command = np.zeros(4, dtype=np.float64)
+        self._tilt_offset = np.zeros(7, dtype=np.float64)
+
+        self._outputs = np.zeros(7, dtype=np.float64) # elevons*2, wingtilt, throttles*4 (normalized)
+        self._servos: np.ndarray = self._outputs[:3]
+        self._motors = self._outputs[3:]
+        self._throttles: np.ndarray = np.zeros(4, dtype=np.float64)
+        self.outputs = Outputs(self._servos, self._throttles)
+
+        self._allocator = ControlAllocator(
+            4,
+            minimum=[-math.pi/12, -math.pi/12, 0.0, 0.0, 0.0, 0.0, 0.0],
+            maximum=[7*math.pi/12, 7*math.pi/12, math.pi/2, 1.0, 1.0, 1.0, 1.0],
+            motors=slice(3, 7)
+        )
+        self._allocator.add_mode('flight', FLIGHT_MIX)
+        self._allocator.add_mode('vtol', VTOL_MIX, offset=[math.pi/2, math.pi/2, math.pi/2, 0.0, 0.0, 0.0, 0.0])
+        self._allocator.add_mode('transit', TRANSIT_MIX) # Wing tilts are added as an offset
+        self._allocator.add_mode('safe', np.zeros((7, 4)), offset=[math.pi/2, math.pi/2, math.pi/2, 0.0, 0.0, 0.0, 0.0])
+
+        # Active setpoints, copied from Setpoints each step
+        self._spf_ias = 40.0
+        self._sp_altitude = 100.0
+        self._sp_heading = 0.0
+
+        self._spf_vpath = 0.0
+        self._spf_aoa = 0.1
+        self._spf_roll = 0.0
+        self._spf_rollspeed = 0.0
+
+        self._spv_xspeed = 0.0
+        self._spv_yspeed = 0.0
+        self._spv_pitchspeed = 0.0
+        self._spv_rollspeed = 0.0
+        self._spv_pitch = 0.0
+        self._spv_roll = 0.0
+        self._spv_yawspeed = 0.0
+        self._spv_vs = 0.0
+
+        self._outf_pitch = 0.0
+        self._outf_roll = 0.0
+        self._outf_throttle_ias = 0.0
+        self._throttle_roll_corr = 0.0
+        self._throttle_vpa_corr = 0.0
+
+        self._outv_pitch = 0.0
+        self._outv_roll = 0.0
+        self._outv_yaw = 0.0
+        self._outv_throttle = 0.0
+        self._outv_thr_mode = 0 # 0-settle 1-hover 2-launch
+
+        self._ftilt = math.pi/2
+        self._rtilt = math.pi/2
+        self._last_tilt = 0.0
+        self._outt_pitch = 0.0
+
+        # self._pid{f or v}_{from}_{to}
+
+        self._pids = PIDBank()
+
+        self._pidf_alt_vpa = self._pids.add(kp=0.007, ti=0.006, td=0.1, integral_limit=0.05, maximum=0.15, minimum=-0.2)
+        self._pidf_vpa_aoa = self._pids.add(kp=0.7, ti=3.0, td=0.05, integral_limit=0.3, maximum=math.pi/6, minimum=0.02)
+        self._pidf_vpa_thr = self._pids.add(kp=0.15, ti=0.003, td=0.0, integral_limit=0.5, maximum=0.25, minimum=0.0)
+        self._pidf_aoa_out = self._pids.add(kp=-0.10, ti=-0.008, td=0.02, integral_limit=2.5, maximum=0.2, minimum=-0.2)
+        self._pidf_dyw_rol = self._pids.add(kp=-0.75, ti=-8.0, td=0.002, integral_limit=0.1, maximum=math.pi/6, minimum=-math.pi/6)
+        self._pidf_rol_rls = self._pids.add(kp=1.5, ti=6.0, td=0.02, integral_limit=0.2, maximum=2.0, minimum=-2.0)
+        self._pidf_rls_out = self._pids.add(kp=0.005, ti=0.003, td=0.005, integral_limit=0.1, maximum=0.1, minimum=-0.1)
+        self._pidf_ias_thr = self._pids.add(kp=0.08, ti=4.0, td=0.1, integral_limit=1.0, maximum=(1-BASE_THROTTLE_PCT), minimum=0.0) # TODO
+
+        self._pidv_xdp_xsp = self._pids.add(kp=0.0, ti=0.0, td=0.0, integral_limit=None, minimum=-5.0, maximum=5.0)
+        self._pidv_xsp_rol = self._pids.add(kp=0.1, ti=0.9, td=0.1, integral_limit=0.3, minimum=-math.pi/12, maximum=math.pi/12) # TODO
+        self._pidv_rol_rls = self._pids.add(kp=1.0, ti=1.0, td=0.05, integral_limit=0.08, minimum=-math.pi/6, maximum=math.pi/6)
+        self._pidv_rls_out = self._pids.add(kp=0.021, ti=0.05, td=0.04, integral_limit=0.3, minimum=-0.08, maximum=0.08)
+
+        self._pidv_ydp_ysp = self._pids.add(kp=0.0, ti=0.0, td=0.0, integral_limit=None, minimum=-5.0, maximum=5.0)
+        self._pidv_ysp_pit = self._pids.add(kp=-0.13, ti=-1.5, td=0.1, integral_limit=3.0, minimum=-math.pi/8-0.3, maximum=math.pi/12+0.3)
+        self._pidv_pit_pts = self._pids.add(kp=0.7, ti=0.8, td=0.0, integral_limit=0.1, minimum=-math.pi/6, maximum=math.pi/6)
+        self._pidv_pts_out = self._pids.add(kp=0.027, ti=0.03, td=0.06, integral_limit=1.0, minimum=-0.1, maximum=0.1)
+
+        self._pidv_alt_vsp = self._pids.add(kp=0.5, ti=1.0, td=0.05, integral_limit=0.5, minimum=-1.5, maximum=2.0)
+        self._pidv_vsp_out = self._pids.add(kp=0.18, ti=0.4, td=0.001, integral_limit=5.0, minimum=0.0, maximum=0.68)
+
+        self._pidv_dyw_yws = self._pids.add(kp=-0.9, ti=-1.0, td=0.0, integral_limit=0.2, minimum=-math.pi/6, maximum=math.pi/6)
+        self._pidv_yws_out = self._pids.add(kp=0.2, ti=0.3, td=0.01, integral_limit=0.15, minimum=-math.pi/24, maximum=math.pi/24)
+
+        self._pidt_dep_out = self._pids.add(kp=0.33, ti=3.0, td=0.6, integral_limit=None, minimum=None, maximum=None)
+        self._pidt_arr_out = self._pids.add(kp=0.3, ti=0.0, td=0.0, integral_limit=None, minimum=None, maximum=None)
+        # TODO: arrival needs to bleed off energy first
+
+        # Controllers that share a sensor sample and are stepped together
+        self._idxv_outer1 = np.array([p.index for p in (self._pidv_xsp_rol, self._pidv_ysp_pit)])
+        self._idxv_outer2 = np.array([p.index for p in (self._pidv_rol_rls, self._pidv_pit_pts, self._pidv_dyw_yws)])
+        self._idxv_inner = np.array([p.index for p in (self._pidv_vsp_out, self._pidv_rls_out, self._pidv_pts_out, self._pidv_yws_out)])
+
+        # Lookups by airspeed and VTOL ratio, resolved to table positions once here
+        self._schedule = schedule if schedule is not None else GainSchedule.load(GAIN_SCHEDULE)
+        self._sched_surface = self._schedule.index('surface')
+        self._sched_kp = [(getattr(self, '_'+name), i) for name, i in self._schedule.section('kp').items()]
+        self._sched_transit = [
+            (getattr(self, '_'+name), '_integral', i) if name.startswith('pid') else (self, '_'+name, i)
+            for name, i in self._schedule.section('transit').items()
+        ]
+
+    def copy(self) -> 'ControlState':
+        """Return an independent copy of the state."""
+        return copy.deepcopy(self)
+
+
+def step(state: ControlState, sensors, setpoints: Setpoints, dt: float | None = None, profiler: StageProfiler | None = None) -> tuple[Outputs, ControlState]:
+    """Run one control step.
+
+    Parameters
+    ----------
+    state : ControlState
+        Controller state, updated in place.
+    sensors
+        Sensor samples laid out like uav.RxBuffer (or Sensors).
+    setpoints : Setpoints
+        Commanded values and the current submode.
+    dt : float, optional
+        Time step in microseconds applied to every sensor, by default
+        None which uses the dt of each sensor.
+    profiler : StageProfiler, optional
+        Profiler of PROFILE_STAGES to lap the setpoints, flight, vtol
+        and mix stages on, by default None.
+
+    Returns
+    -------
+    tuple[Outputs, ControlState]
+        The actuator outputs and the updated state.
+    """
+    s = state
+    submode = setpoints.submode
+
+    s._sp_altitude = setpoints.altitude
+    s._sp_heading = setpoints.heading
+    s._spf_ias = setpoints.ias
+
+    s._vtol_ratio = 2*s._rtilt / (math.pi)#1 - min(sensors.ias.ias/20, 1) # 1 is VTOL
+    s._vtol_ratio = max(min(s._vtol_ratio, 1.0), 0.0)
+
+    scheduled = s._schedule.update(sensors.ias.ias, s._vtol_ratio)
+    s._ias_scalar = scheduled[s._sched_surface]
+    for pid, i in s._sched_kp:
+        pid.scale = scheduled[i] # Applied on top of the tuned kp when cycled
+
+    outputs = s.outputs
+    outputs.inc_mode = False
+    outputs.disarm = False
+    if profiler is not None:
+        profiler.lap('setpoints')
+
+    # Controls
+    if submode in FLIGHT_SUBMODES:
+        _flight_laws(s, sensors, submode, dt)
+    elif submode in TRANSIT_SUBMODES:
+        _flight_laws(s, sensors, submode, dt, wipe=False)
+    if profiler is not None:
+        profiler.lap('flight')
+
+    if submode in VTOL_SUBMODES or submode in TRANSIT_SUBMODES:
+        _vtol_laws(s, sensors, submode, dt)
+    if profiler is not None:
+        profiler.lap('vtol')
+
+    _mix(s, submode)
+    if profiler is not None:
+        profiler.lap('mix')
+
+    # Mode increments
+    match submode:
+        case g.CUSTOM_SUBMODE_TAKEOFF_ASCENT:
+            outputs.inc_mode = sensors.alt.altitude > setpoints.hover_alt-3
+        case g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
+            outputs.inc_mode = sensors.ias.ias > 4.5
+        case g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
+            outputs.inc_mode = s._vtol_ratio==0 and s._ftilt==0 and s._rtilt==0
+        case g.CUSTOM_SUBMODE_LANDING_TRANSIT:
+            # TODO
+            outputs.inc_mode = sensors.ias.ias<10 and s._ftilt==math.pi/2
+        case g.CUSTOM_SUBMODE_LANDING_HOVER:
+            # TODO
+            outputs.inc_mode = sensors.alt.altitude < setpoints.hover_alt-3 # and over H
+        case g.CUSTOM_SUBMODE_LANDING_DESCENT:
+            # TODO
+            outputs.inc_mode = False
+        case g.CUSTOM_SUBMODE_FLIGHT_NORMAL | g.CUSTOM_SUBMODE_FLIGHT_TERRAIN_AVOIDANCE:
+            pass # TODO: terr avoidance check
+
+    return outputs, s
+
+
+def _flight_laws(s: ControlState, sensors, submode: int, dt: float | None, wipe: bool = True) -> np.ndarray:
+    """Calculate flight axis commands from sensors."""
+    alt = sensors.alt
+    att = sensors.att
+    aoa = sensors.aoa
+    ias = sensors.ias
+    alt_dt = alt.dt if dt is None else dt
+    att_dt = att.dt if dt is None else dt
+    aoa_dt = aoa.dt if dt is None else dt
+    ias_dt = ias.dt if dt is None else dt
+
+    if alt_dt > 0.0:
+        if (step_dt:=s._outer.tick('f_alt', alt_dt)) > 0.0:
+            s._spf_vpath = s._pidf_alt_vpa.cycle(alt.altitude, s._sp_altitude, step_dt)
+
+    if att_dt > 0.0 or aoa_dt > 0.0:
+        if not aoa_dt > 0.0:
+            step_dt = att_dt
+        elif not att_dt > 0.0:
+            step_dt = aoa_dt
+        else:
+            step_dt = (att_dt + aoa_dt) / 2
+
+        s._vpath = att.pitch - math.cos(att.roll) * aoa.aoa
+        if submode==g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
+            s._spf_vpath = 0.0
+        if (step_dt:=s._outer.tick('f_vpa', step_dt)) > 0.0:
+            s._spf_aoa = s._pidf_vpa_aoa.cycle(s._vpath, s._spf_vpath, step_dt)
+            s._throttle_vpa_corr = s._pidf_vpa_thr.cycle(s._vpath, s._spf_vpath, step_dt)
+
+    if att_dt > 0.0:
+        s._dyaw = calc_dyaw(att.yaw, s._sp_heading)
+
+        if (step_dt:=s._outer.tick('f_att', att_dt)) > 0.0:
+            s._spf_roll = s._pidf_dyw_rol.cycle(s._dyaw, 0.0, step_dt)
+            s._spf_rollspeed = s._pidf_rol_rls.cycle(att.roll, s._spf_roll, step_dt)
+        if (step_dt:=s._inner.tick('f_att', att_dt)) > 0.0:
+            s._outf_roll = s._pidf_rls_out.cycle(att.rollspeed, s._spf_rollspeed, step_dt)
+
+        s._throttle_roll_corr = abs(math.sin(att.roll)) if abs(att.roll)>math.pi/24 else 0.0
+
+    if aoa_dt > 0.0:
+        if (step_dt:=s._inner.tick('f_aoa', aoa_dt)) > 0.0:
+            s._outf_pitch = s._pidf_aoa_out.cycle(aoa.aoa, s._spf_aoa, step_dt)
+        if submode==g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
+            for target, field, i in s._sched_transit:
+                setattr(target, field, s._schedule.values[i])
+
+    if ias_dt > 0.0:
+        if (step_dt:=s._outer.tick('f_ias', ias_dt)) > 0.0:
+            s._outf_throttle_ias = BASE_THROTTLE_PCT+(1+3*s._throttle_roll_corr)*s._pidf_ias_thr.cycle(ias.ias, s._spf_ias, step_dt)
+
+    s._throttle_roll_corr = min(s._throttle_roll_corr, 1.0)
+    s._throttle_vpa_corr = min(s._throttle_vpa_corr, 1.0)
+
+    s._fcommand[0] = s._outf_roll
+    s._fcommand[1] = s._outf_pitch
+    s._fcommand[2] = 0.0
+    s._fcommand[3] = min(max(s._outf_throttle_ias + 0*s._throttle_vpa_corr, 0.0), 1.0)
+
+    if wipe:
+        s._outt_pitch = 0.0
+        s._ftilt = 0.0
+        s._rtilt = 0.0
+
+    return s._fcommand
+
+
+def _vtol_laws(s: ControlState, sensors, submode: int, dt: float | None) -> np.ndarray:
+    """Calculate VTOL axis commands from sensors."""
+    alt = sensors.alt
+    att = sensors.att
+    aoa = sensors.aoa
+    alt_dt = alt.dt if dt is None else dt
+    att_dt = att.dt if dt is None else dt
+
+    if alt_dt > 0.0:
+        if (step_dt:=s._outer.tick('v_alt', alt_dt)) > 0.0:
+            s._spv_vs = s._pidv_alt_vsp.cycle(alt.altitude, s._sp_altitude, step_dt)
+        s._outv_thr_mode = 1
+        if alt.altitude < 0.5:
+            if submode == g.CUSTOM_SUBMODE_TAKEOFF_ASCENT:
+                s._outv_thr_mode = 2
+            elif alt.altitude < 0.1:
+                s._outv_thr_mode = 0
+
+        if alt.altitude < 0.05:
+            s._pidv_pts_out._integral = 0.55
+            s._pidv_xdp_xsp._integral = 0.0
+            s._pidv_xsp_rol._integral = 0.0
+            s._pidv_rol_rls._integral = 0.0
+            s._pidv_rls_out._integral = 0.0
+            s._pidv_ydp_ysp._integral = 0.0
+            s._pidv_ysp_pit._integral = 0.8
+            s._pidv_pit_pts._integral = 0.0
+            s._pidv_alt_vsp._integral = 0.0
+            s._pidv_vsp_out._integral = 0.0
+            s._pidv_dyw_yws._integral = 0.0
+            s._pidv_yws_out._integral = 0.0
+            s._pidv_vsp_out.minimum = 0.0
+        else:
+            s._pidv_vsp_out.minimum = 0.50
+
+    # TODO: camera-relative position hold
+    # s._spv_xspeed = s._pidv_xdp_xsp.cycle(cam.xdp, 0.0, cam.dt)
+    # s._spv_yspeed = s._pidv_ydp_ysp.cycle(cam.ydp, 0.0, cam.dt)
+
+    if att_dt > 0.0:
+        if submode == g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
+            # Move both tilts by a base rate
+            if s._ftilt > -aoa.aoa+0.02:
+                s._ftilt -= att_dt*1e-7
+            s._rtilt -= att_dt*1e-7
+
+            # Calculate desired pitch adjustment with PID
+            s._outt_pitch = s._pidt_dep_out.cycle(att.pitchspeed, s._spv_pitchspeed, att_dt) * att_dt * 1e-6
+
+            # Put the nose up (lower rear wing a little)!
+            if s._outt_pitch>0.0:
+                s._rtilt -= s._outt_pitch
+            # OR put the nose down (lower front wing a little), but don't put the front wing at negative AOA!
+            elif s._ftilt > -aoa.aoa+0.02:
+                s._ftilt += 1.9*s._outt_pitch # Front wing has to move more because it's smaller
+
+            # One more protection against negative AOA on front wing
+            s._ftilt = max(s._ftilt, -aoa.aoa+0.02)
+        elif submode == g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
+            s._outt_pitch = 0.0
+            s._ftilt = math.pi/2
+            s._rtilt = math.pi/2
+        elif submode == g.CUSTOM_SUBMODE_LANDING_TRANSIT:
+            s._spf_ias = 0
+
+            # Move both tilts by a base rate
+            if s._ftilt > -aoa.aoa+0.02:
+                s._ftilt += att_dt*1e-7
+            s._rtilt += att_dt*1e-7
+
+            # Calculate desired pitch adjustment with PID
+            s._outt_pitch = s._pidt_dep_out.cycle(att.pitchspeed, s._spv_pitchspeed, att_dt) * att_dt * 1e-6
+
+            # Put the nose up (raise front wing a little), but don't put the front wing at negative AOA!
+            if s._outt_pitch>0.0:
+                if s._ftilt > -aoa.aoa+0.02:
+                    s._ftilt += 1.9*s._outt_pitch # Front wing has to move more because it's smaller
+            # OR put the nose down (raise rear wing a little)!
+            else:
+                s._rtilt -= s._outt_pitch
+
+            # One more protection against negative AOA on front wing
+            s._ftilt = max(s._ftilt, -aoa.aoa+0.02)
+        else:
+            s._outt_pitch = 0.0
+            s._ftilt = 0.0
+            s._rtilt = 0.0
+
+        s._dyaw = calc_dyaw(att.yaw, s._sp_heading) if alt.altitude>3 else 0.0
+
+        if (step_dt:=s._outer.tick('v_att', att_dt)) > 0.0:
+            s._spv_roll, s._spv_pitch = s._pids.step(
+                s._idxv_outer1,
+                (att.xspeed, att.yspeed),
+                (s._spv_xspeed, s._spv_yspeed),
+                step_dt
+            )
+            if submode == g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
+                s._spv_pitch = -0.4*s._vtol_ratio
+            elif submode == g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
+                s._spv_pitch = -0.4
+            s._spv_rollspeed, s._spv_pitchspeed, s._spv_yawspeed = s._pids.step(
+                s._idxv_outer2,
+                (att.roll, att.pitch, s._dyaw),
+                (s._spv_roll, s._spv_pitch, 0.0),
+                step_dt
+            )
+
+        if (step_dt:=s._inner.tick('v_att', att_dt)) > 0.0:
+            s._outv_throttle, s._outv_roll, s._outv_pitch, s._outv_yaw = s._pids.step(
+                s._idxv_inner,
+                (att.zspeed, att.rollspeed, att.pitchspeed, att.yawspeed),
+                (s._spv_vs, s._spv_rollspeed, s._spv_pitchspeed, s._spv_yawspeed),
+                step_dt
+            )
+
+    match s._outv_thr_mode:
+        case 0:
+            s._outv_throttle = 0.0
+            s.outputs.disarm = True
+        case 1:
+            pass
+        case 2:
+            s._outv_throttle = 0.55
+            s._pidv_vsp_out._integral = 3.2
+
+    s._vcommand[0] = s._outv_roll
+    s._vcommand[1] = s._outv_pitch
+    s._vcommand[2] = s._outv_yaw
+    s._vcommand[3] = s._outv_throttle
+
+    s._rtilt = max(min(s._rtilt, math.pi/2), 0.0)
+    s._ftilt = max(min(s._ftilt, math.pi/2), 0.0)
+
+    return s._vcommand
+
+
+def _mix(s: ControlState, submode: int) -> None:
+    """Allocate the flight and VTOL commands to actuators."""
+    match submode:
+        case g.CUSTOM_SUBMODE_TAKEOFF_ASCENT | g.CUSTOM_SUBMODE_TAKEOFF_DEPART | g.CUSTOM_SUBMODE_LANDING_DESCENT | g.CUSTOM_SUBMODE_LANDING_HOVER:
+            # VTOL
+            s._allocator.allocate('vtol', s._vcommand, out=s._outputs)
+        case g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT | g.CUSTOM_SUBMODE_LANDING_TRANSIT:
+            # Departure or arrival transition
+            if submode == g.CUSTOM_SUBMODE_LANDING_TRANSIT:
+                s._vtol_ratio = math.sin(s._ftilt)
+            s._tilt_offset[:2] = s._rtilt
+            s._tilt_offset[2] = s._ftilt
+            s._allocator.blend('flight', s._fcommand, 'transit', s._vcommand, s._vtol_ratio, out=s._outputs, offset=s._tilt_offset)
+        case g.CUSTOM_SUBMODE_FLIGHT_NORMAL | g.CUSTOM_SUBMODE_FLIGHT_TERRAIN_AVOIDANCE:
+            # Normal flight, surface authority scaled with airspeed
+            np.multiply(s._fcommand, s._ias_scalar, out=s._command)
+            s._command[3] = s._fcommand[3]
+            s._allocator.allocate('flight', s._command, out=s._outputs)
+        case g.CUSTOM_SUBMODE_FLIGHT_MANUAL:
+            # Manual flight via GCS
+            # TODO switch from lua to GCS
+            pass
+        case _:
+            # Safed
+            s._command.fill(0.0)
+            s._allocator.allocate('safe', s._command, out=s._outputs)
+
+    np.multiply(s._motors, MAX_THROTTLE, out=s._throttles)
+
+
+def _tests() -> bool:
+    import time
+
+    sensors = Sensors()
+    sensors.alt.altitude = 20.0
+    sensors.ias.ias = 30.0
+    sensors.att.pitch = 0.05
+    sensors.aoa.aoa = 0.08
+    setpoints = Setpoints(altitude=25.0, heading=0.3, ias=35.0, hover_alt=20.0)
+
+    for submode in [
+        g.CUSTOM_SUBMODE_TAKEOFF_ASCENT,
+        g.CUSTOM_SUBMODE_TAKEOFF_DEPART,
+        g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT,
+        g.CUSTOM_SUBMODE_FLIGHT_NORMAL,
+        g.CUSTOM_SUBMODE_LANDING_TRANSIT,
+        g.CUSTOM_SUBMODE_LANDING_HOVER,
+        g.CUSTOM_SUBMODE_UNINIT,
+    ]:
+        setpoints.submode = submode
+        state = ControlState()
+        previous = state.copy()
+        before = [previous._outputs.copy(), previous._pids.output.copy(), previous._pids._integral.copy()]
+        outputs, state = step(state, sensors, setpoints, dt=1e4)
+
+        assert np.all(np.isfinite(outputs.servos)) and np.all(np.isfinite(outputs.throttles))
+        assert np.all(outputs.throttles >= 0.0) and np.all(outputs.throttles <= MAX_THROTTLE)
+        assert not np.array_equal(state._outputs, before[0]) # The step did update the outputs...
+        assert all(np.array_equal(a, b) for a, b in zip([previous._outputs, previous._pids.output, previous._pids._integral], before)) # ...but not the copy
+
+    # Stepping without fresh samples must not touch the controllers
+    setpoints.submode = g.CUSTOM_SUBMODE_FLIGHT_NORMAL
+    state = ControlState()
+    step(state, Sensors(), setpoints)
+    assert not state._pids._integral.any()
+
+    # Scheduled surface authority and kp
+    schedule = GainSchedule([0.0, 40.0], [0.0, 1.0], {'surface': [1.0, 0.5], 'kp/pidf_rls_out': [[1.0, 1.0], [2.0, 4.0]]})
+    state = ControlState(schedule=schedule)
+    sensors.ias.ias = 40.0
+    step(state, sensors, setpoints, dt=1e4) # Tilts start in VTOL
+    assert state._ias_scalar == 0.5 and state._pidf_rls_out.scale == 4.0
+    step(state, sensors, setpoints, dt=1e4)
+    assert state._pidf_rls_out.scale == 2.0 and state._pidf_rls_out.kp == 0.005
+
+    # Tuning a scheduled controller keeps the new kp
+    state._pidf_rls_out.set(kp=0.01)
+    step(state, sensors, setpoints, dt=1e4)
+    assert state._pidf_rls_out.kp == 0.01 and state._pidf_rls_out.scale == 2.0
+    sensors.ias.ias = 30.0
+
+    state = ControlState()
+    steps = 10000
+    tstart = time.perf_counter()
+    for _ in range(steps):
+        step(state, sensors, setpoints, dt=1e4)
+    print(f"{steps/(time.perf_counter()-tstart):.0f} steps/s")
+
+    profiler = StageProfiler(PROFILE_STAGES)
+    for _ in range(100):
+        profiler.start()
+        step(state, sensors, setpoints, dt=1e4, profiler=profiler)
+        profiler.lap('mode')
+        profiler.lap('tx')
+        profiler.end()
+    print(profiler)
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class DatarefTable:
+    """X-Plane dataref values in one contiguous float64 array.
+
+    Names are resolved to integer slots once, when the table is built, so
+    readers that hold a slot or a group view never hash a dataref name
+    again. Groups are runs of consecutive datarefs (e.g. a quaternion)
+    exposed as NumPy views that always show the current values.
+
+    Because everything lives in one array, the table can be copied with
+    snapshot() or backed by any float64 buffer, such as a file with
+    memmap() for logging.
+
+    Parameters
+    ----------
+    defaults : dict[bytes, float]
+        Initial value of each dataref, in slot order.
+    groups : dict[str, tuple[bytes, ...]] | None, optional
+        Named runs of consecutive datarefs, by default None.
+    values : np.ndarray | None, optional
+        float64 buffer to store values in, by default a new array.
+    initialize : bool, optional
+        Whether to write the defaults into values, by default True.
+    """
+
+    def __init__(self, defaults: dict[bytes, float], groups: dict[str, tuple[bytes, ...]] | None = None,
+                 values: np.ndarray | None = None, initialize: bool = True) -> None:
+        """Inits the table and resolves every group to a slice."""
+        self.defaults = dict(defaults)
+        self.names = tuple(self.defaults)
+        self._slots = {name: slot for slot, name in enumerate(self.names)}
+
+        if values is None:
+            values = np.empty(len(self.names), dtype=np.float64)
+        assert values.dtype == np.float64 and values.shape == (len(self.names),), "DatarefTable buffer must be float64 with one value per dataref"
+        self.values = values
+        if initialize:
+            self.values[:] = list(self.defaults.values())
+
+        self.groups = dict(groups or {})
+        self._groups: dict[str, slice] = {}
+        for group, names in self.groups.items():
+            first = self._slots[names[0]]
+            assert [self._slots[name] for name in names] == list(range(first, first+len(names))), f"Group {group} is not consecutive"
+            self._groups[group] = slice(first, first+len(names))
+
+    def slot(self, name: bytes) -> int:
+        """Return the slot of a dataref."""
+        return self._slots[name]
+
+    def view(self, group: str) -> np.ndarray:
+        """Return a view of a group that stays current as values change."""
+        return self.values[self._groups[group]]
+
+    def snapshot(self, out: np.ndarray | None = None) -> np.ndarray:
+        """Return a copy of every value, optionally into out."""
+        if out is None:
+            return self.values.copy()
+        out[:] = self.values
+        return out
+
+    def with_buffer(self, values: np.ndarray, initialize: bool = False) -> 'DatarefTable':
+        """Return a table with the same layout backed by values."""
+        return DatarefTable(self.defaults, self.groups, values, initialize)
+
+    def memmap(self, path: str, mode: str = 'w+') -> 'DatarefTable':
+        """Return a table with the same layout backed by a file.
+
+        With mode 'w+' the file is created holding the current values,
+        otherwise the values already in the file are kept.
+        """
+        table = self.with_buffer(np.memmap(path, dtype=np.float64, mode=mode, shape=(len(self.names),)))
+        if mode == 'w+':
+            table.values[:] = self.values
+        return table
+
+    def items(self) -> zip:
+        return zip(self.names, self.values.tolist())
+
+    def __getitem__(self, name: bytes) -> float:
+        return float(self.values[self._slots[name]])
+
+    def __setitem__(self, name: bytes, value: float) -> None:
+        self.values[self._slots[name]] = value
+
+    def __contains__(self, name: bytes) -> bool:
+        return name in self._slots
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def _tests() -> bool:
+    import os
+    import tempfile
+
+    table = DatarefTable(
+        {b'q/w': 1.0, b'q/x': 0.0, b'q/y': 0.0, b'q/z': 0.0, b'alt': 100.0},
+        groups={'quaternion': (b'q/w', b'q/x', b'q/y', b'q/z')},
+    )
+    assert len(table) == 5 and table.slot(b'alt') == 4 and b'alt' in table
+    assert table[b'alt'] == 100.0
+
+    quaternion = table.view('quaternion')
+    table.values[1] = 0.5
+    assert quaternion.tolist() == [1.0, 0.5, 0.0, 0.0] # Views follow the table
+    assert np.shares_memory(quaternion, table.values)
+
+    snapshot = table.snapshot()
+    table[b'alt'] = 200.0
+    assert snapshot[4] == 100.0 and dict(table.items())[b'alt'] == 200.0
+
+    try:
+        DatarefTable({b'a': 0.0, b'b': 0.0, b'c': 0.0}, groups={'bad': (b'a', b'c')})
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("Non-consecutive group accepted")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'datarefs.bin')
+        mapped = table.memmap(path)
+        assert mapped[b'alt'] == 200.0 and mapped.view('quaternion')[1] == 0.5
+        mapped[b'alt'] = 300.0
+        mapped.values.flush()
+        assert table.memmap(path, mode='r+')[b'alt'] == 300.0
+        del mapped
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
@@ -1,8 +1,16 @@
 import asyncio
 from functools import wraps
 
-def async_loop_decorator(close=True):
-    """Provide decorator to gracefully loop coroutines"""
+from common.scheduler import RateScheduler
+
+def async_loop_decorator(close=True, freq: float | str | None = None):
+    """Provide decorator to gracefully loop coroutines
+
+    If freq is given (in Hz, or as the name of an attribute of the
+    instance holding the rate), each iteration is paced by a
+    RateScheduler stored in self._schedulers instead of yielding with
+    asyncio.sleep(0), so the loop body should not sleep itself.
+    """
     def decorator(func):
         @wraps(func) # Preserve metadata like func.__name__
         async def wrapper(self, *args, **kwargs):
@@ -13,11 +21,20 @@ def async_loop_decorator(close=True):
             else:
                 stop = asyncio.Event()
 
+            scheduler = None
+            if freq is not None:
+                rate = getattr(self, freq) if isinstance(freq, str) else freq
+                scheduler = RateScheduler(rate, name=func.__name__)
+                self.__dict__.setdefault('_schedulers', {})[func.__name__] = scheduler
+
             try:
                 while not stop.is_set():
                     try:
-                        await asyncio.sleep(0)
+                        if scheduler is None:
+                            await asyncio.sleep(0)
                         await func(self, *args, **kwargs)
+                        if scheduler is not None:
+                            await scheduler.wait()
                     except asyncio.exceptions.CancelledError:
                         stop.set()
                         raise
@@ -0,0 +1,142 @@
+"""DSDL precompilation
+
+Compiles the public regulated data types into common/pycyphal_generated
+once, and records a hash of the DSDL sources (and the compiler versions)
+next to the generated package. prepare() only recompiles when that hash
+no longer matches, so a normal start skips code generation entirely.
+
+Only the standard library is imported at module level so scripts/setup.py
+can use this before dependencies are installed.
+
+Run `python -m common.dsdl` to compile ahead of time, or with -f to force it.
+"""
+
+import hashlib
+import importlib
+import importlib.metadata
+import logging
+import os
+import shutil
+import sys
+import time
+
+DSDL_PATH = './common/public_regulated_data_types'
+GENERATED_PATH = './common/pycyphal_generated'
+HASH_FILE = 'dsdl.sha256'
+
+NAMESPACES = ('reg', 'uavcan')
+
+# Everything the UAV and simulated components import from the generated package
+IMPORTS = (
+    'reg.udral.service.actuator.common',
+    'reg.udral.service.actuator.common.sp',
+    'reg.udral.service.common',
+    'reg.udral.physics.electricity',
+    'reg.udral.physics.dynamics.rotation',
+    'reg.udral.physics.kinematics.rotation',
+    'reg.udral.physics.kinematics.cartesian',
+    'reg.udral.physics.kinematics.translation',
+    'reg.udral.physics.kinematics.geodetic',
+    'uavcan.node',
+    'uavcan.time',
+    'uavcan.si.unit.temperature',
+    'uavcan.si.unit.angle',
+    'uavcan.si.unit.length',
+    'uavcan.si.unit.velocity',
+    'uavcan.si.unit.angular_velocity',
+)
+
+
+def source_hash() -> str:
+    """Return a hash of every DSDL source file and the compiler versions."""
+    digest = hashlib.sha256()
+    for package in ('pycyphal', 'nunavut', 'pydsdl'):
+        try:
+            digest.update(f"{package} {importlib.metadata.version(package)}\n".encode())
+        except importlib.metadata.PackageNotFoundError:
+            pass
+
+    for namespace in NAMESPACES:
+        root = os.path.join(DSDL_PATH, namespace)
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.dsdl'):
+                    continue
+                path = os.path.join(directory, filename)
+                digest.update(os.path.relpath(path, DSDL_PATH).replace(os.sep, '/').encode())
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+    return digest.hexdigest()
+
+
+def compiled_hash() -> str | None:
+    """Return the hash recorded by the last compile, if any."""
+    try:
+        with open(os.path.join(GENERATED_PATH, HASH_FILE), 'r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def generate(digest: str | None = None) -> None:
+    """Regenerate the Python package from the DSDL sources and record their hash."""
+    import pycyphal.dsdl
+
+    digest = source_hash() if digest is None else digest
+    for namespace in NAMESPACES:
+        shutil.rmtree(os.path.join(GENERATED_PATH, namespace), ignore_errors=True)
+    try:
+        os.remove(os.path.join(GENERATED_PATH, HASH_FILE))
+    except FileNotFoundError:
+        pass
+
+    pycyphal.dsdl.compile_all([os.path.join(DSDL_PATH, namespace) for namespace in NAMESPACES], GENERATED_PATH)
+    with open(os.path.join(GENERATED_PATH, HASH_FILE), 'w') as file:
+        file.write(digest)
+
+
+def prepare(force: bool = False, logger: logging.Logger | None = None) -> bool:
+    """Point pycyphal at the generated package, compiling it only if stale.
+
+    Must be called from the repository root before importing pycyphal.
+
+    Parameters
+    ----------
+    force : bool, optional
+        Recompile even if the hash matches, by default False.
+    logger : logging.Logger | None, optional
+        Logger warned before compiling, by default None.
+
+    Returns
+    -------
+    bool
+        Whether the package was compiled.
+    """
+    os.environ['CYPHAL_PATH'] = DSDL_PATH
+    os.environ['PYCYPHAL_PATH'] = GENERATED_PATH
+    if (generated:=os.path.abspath(GENERATED_PATH)) not in sys.path:
+        sys.path.append(generated)
+
+    digest = source_hash()
+    if not force and digest == compiled_hash():
+        return False
+    if logger is not None:
+        logger.warning("Generating UAVCAN files, please wait...")
+    generate(digest)
+    importlib.invalidate_caches()
+    return True
+
+
+def check_imports() -> None:
+    """Import every module in IMPORTS, raising if one is missing."""
+    for module in IMPORTS:
+        importlib.import_module(module)
+
+
+if __name__=='__main__':
+    os.chdir(os.path.dirname(os.path.realpath(__file__)) + '/..')
+    start = time.perf_counter()
+    compiled = prepare(force='-f' in sys.argv)
+    check_imports()
+    print(f"{'Compiled' if compiled else 'Up to date'} in {time.perf_counter()-start:.2f} s ({compiled_hash()[:12]})")
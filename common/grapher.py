@@ -16,6 +16,7 @@ class Grapher:
         """Inits the grpah."""
         self.fig,self.ax,self.line = Grapher.init_plot(name=name)
         self.data = deque(maxlen=deque_len)
+        self._xy = None
 
     @staticmethod
     def init_plot(name: str = "Output") -> tuple:
@@ -33,10 +34,17 @@ class Grapher:
         except KeyboardInterrupt:
             self.close()
     
+    def set(self, x, y) -> None:
+        """Replace the data with arrays to be graphed against each other."""
+        self._xy = (x, y)
+
     def graph(self) -> None:
         """Graphs the deque of data (data added with \'Grapher.add()\')."""
         try:
-            self.line.set_data(range(len(self.data)), self.data)
+            if self._xy is not None:
+                self.line.set_data(*self._xy)
+            else:
+                self.line.set_data(range(len(self.data)), self.data)
             self.ax.relim()
             self.ax.autoscale_view()
             plt.pause(0.001)
@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class History:
+    """Fixed-size ring buffer of timestamped samples.
+
+    Samples are NumPy structured records with one float64 field per
+    name. Every sample is written twice, size records apart, so the last
+    n samples are always one contiguous slice and last() can return a
+    view instead of a copy. Memory use is fixed at 2*size records.
+
+    Parameters
+    ----------
+    fields : tuple[str, ...]
+        Field names of a sample, conventionally starting with 'time'.
+    size : int, optional
+        Number of samples kept, by default 256.
+
+    Attributes
+    ----------
+    count : int
+        Number of samples appended since the last reset.
+    """
+
+    def __init__(self, fields: tuple[str, ...], size: int = 256) -> None:
+        """Inits an empty buffer."""
+        assert size > 0, "History size must be positive"
+        self.fields = tuple(fields)
+        self.size = size
+        self.count = 0
+
+        self._data = np.zeros(2*size, dtype=np.dtype([(field, np.float64) for field in self.fields]))
+        self._head = 0 # Next write position
+
+    def append(self, sample: tuple[float, ...]) -> None:
+        """Add a sample with a value for every field, in order."""
+        head = self._head
+        self._data[head] = sample
+        self._data[head+self.size] = sample
+        self._head = (head + 1) % self.size
+        self.count += 1
+
+    def last(self, n: int | None = None) -> np.ndarray:
+        """Return a read-only view of the last n samples, oldest first (all by default)."""
+        available = min(self.count, self.size)
+        n = available if n is None else min(n, available)
+        end = self._head + self.size
+        view = self._data[end-n:end]
+        view.flags.writeable = False
+        return view
+
+    def latest(self) -> np.void:
+        """Return the most recent sample."""
+        return self._data[self._head+self.size-1]
+
+    def reset(self) -> None:
+        """Drop all samples."""
+        self._data.fill(0)
+        self._head = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+
+def _tests() -> bool:
+    history = History(('time', 'value'), size=4)
+    assert len(history) == 0 and history.last().size == 0
+
+    for i in range(3):
+        history.append((i*10.0, i*1.0))
+    assert len(history) == 3
+    assert history.last()['value'].tolist() == [0.0, 1.0, 2.0]
+
+    for i in range(3, 7):
+        history.append((i*10.0, i*1.0))
+    assert len(history) == 4
+    assert history.last()['value'].tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert history.last(2)['time'].tolist() == [50.0, 60.0]
+    assert history.latest()['value'] == 6.0
+
+    # Views share memory with the buffer
+    assert np.shares_memory(history.last(), history._data)
+    try:
+        history.last()['value'][0] = 0.0
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("History view is writeable")
+
+    history.reset()
+    assert len(history) == 0 and history.last().size == 0
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
@@ -1,3 +1,8 @@
+import math
+
+import numpy as np
+
+
 class PID:
     """A PID controller."""
     def __init__(
@@ -87,3 +92,280 @@ class PID:
 
         self.output = output
         return self.output
+
+
+class RateGroup:
+    """Runs a group of controllers at a divided rate.
+
+    Each key (usually a sensor) keeps its own count and accumulated
+    time step, so a group can be fed by sensors arriving at different
+    rates. tick() returns the time step accumulated since the group last
+    ran for that key, or 0.0 while the group should be skipped.
+    """
+    def __init__(self, divider: int = 1) -> None:
+        """Inits the group with the desired rate divider."""
+        assert isinstance(divider, int) and divider >= 1, "RateGroup divider must be a positive integer"
+        self.divider = divider
+
+        self._counts: dict[str, int] = {}
+        self._time_steps: dict[str, float] = {}
+
+    def reset(self) -> None:
+        """Discards all accumulated time steps."""
+        self._counts.clear()
+        self._time_steps.clear()
+
+    def tick(self, key: str, time_step: float) -> float:
+        """Accumulate a time step, returning it when the group is due."""
+        if self.divider == 1:
+            return time_step
+
+        count = self._counts.get(key, 0) + 1
+        time_step += self._time_steps.get(key, 0.0)
+
+        if count >= self.divider:
+            self._counts[key] = 0
+            self._time_steps[key] = 0.0
+            return time_step
+
+        self._counts[key] = count
+        self._time_steps[key] = time_step
+        return 0.0
+
+
+class PIDBank:
+    """A bank of PID controllers stored in contiguous arrays.
+
+    Controllers are added with add(), which returns a view exposing the
+    same interface as PID, so a bank member can replace a PID object
+    directly. step() cycles any subset of the bank in one vectorized call
+    with the same semantics as PID.cycle (time steps in microseconds).
+    Limits of None are stored as infinities.
+
+    Each controller also has a kp multiplier, scale (1 by default),
+    applied when it is cycled. Gain schedules set scale, so a kp set
+    through set() is kept as the tuned value and never overwritten.
+    """
+    PARAMETERS = ('kp', 'ti', 'td', 'integral_limit', 'minimum', 'maximum')
+    STATES = ('_proportional', '_integral', '_derivative', '_error', 'output')
+    UNBOUNDED = {'integral_limit': np.inf, 'minimum': -np.inf, 'maximum': np.inf}
+
+    def __init__(self) -> None:
+        """Inits an empty bank."""
+        self.size = 0
+        for field in PIDBank.PARAMETERS + PIDBank.STATES:
+            setattr(self, field, np.zeros(0, dtype=np.float64))
+        self.scale = np.zeros(0, dtype=np.float64)
+
+    def add(
+            self, 
+            kp: float=0.0, 
+            ti: float=0.0, 
+            td: float=0.0, 
+            integral_limit: float = None, 
+            minimum: float = None, 
+            maximum: float = None) -> 'PIDView':
+        """Adds a controller and returns a PID-compatible view of it."""
+        for field in PIDBank.PARAMETERS + PIDBank.STATES:
+            setattr(self, field, np.append(getattr(self, field), PIDBank.UNBOUNDED.get(field, 0.0)))
+        self.scale = np.append(self.scale, 1.0)
+
+        view = PIDView(self, self.size)
+        self.size += 1
+        view.set(kp, ti, td, integral_limit, minimum, maximum)
+        return view
+
+    def reset(self) -> None:
+        """Resets all outputs, does not change parameters."""
+        for field in PIDBank.STATES:
+            getattr(self, field).fill(0.0)
+
+    def step(
+            self, 
+            index: np.ndarray, 
+            value: np.ndarray, 
+            setpoint: np.ndarray, 
+            time_step: np.ndarray | float, 
+            mask: np.ndarray = None) -> np.ndarray:
+        """Cycle the selected controllers, returning their outputs.
+
+        Controllers where mask is False keep their state and return
+        their previous output.
+        """
+        index = np.asarray(index, dtype=np.intp)
+        value = np.asarray(value, dtype=np.float64)
+        setpoint = np.asarray(setpoint, dtype=np.float64)
+        time_step = np.asarray(time_step, dtype=np.float64)
+
+        active = index
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool)
+            active = index[mask]
+            value = value[mask]
+            setpoint = setpoint[mask]
+            if time_step.ndim:
+                time_step = time_step[mask]
+
+        kp = self.kp[active] * self.scale[active]
+        ti = self.ti[active]
+        ki = np.divide(kp, ti, out=np.zeros_like(kp), where=(ti != 0.0))
+
+        time_step = np.maximum(time_step / 1e6, 1e-6)
+
+        error = setpoint - value
+
+        integral = self._integral[active] + ki * error * time_step
+        limit = np.abs(self.integral_limit[active])
+        integral = np.maximum(np.minimum(integral, limit), -limit)
+
+        derivative = self.td[active] * (error - self._error[active]) / time_step
+
+        output = (error + integral + derivative) * kp
+        output = np.minimum(np.maximum(output, self.minimum[active]), self.maximum[active])
+
+        self._proportional[active] = error
+        self._integral[active] = integral
+        self._derivative[active] = derivative
+        self._error[active] = error
+        self.output[active] = output
+
+        return self.output[index]
+
+
+class PIDView:
+    """A single controller of a PIDBank with the interface of PID."""
+    def __init__(self, bank: PIDBank, index: int) -> None:
+        """Inits the view on a controller of the bank."""
+        self.bank = bank
+        self.index = index
+
+    def set(
+            self, 
+            kp: float = None, 
+            ti: float = None, 
+            td: float = None, 
+            integral_limit: float = None, 
+            minimum: float = None, 
+            maximum: float = None) -> None:
+        """Updates PID parameters."""
+        if kp is not None:
+            self.kp = kp
+        if ti is not None:
+            self.ti = ti
+        if td is not None:
+            self.td = td
+
+        if integral_limit is not None:
+            self.integral_limit = integral_limit
+        if minimum is not None:
+            self.minimum = minimum
+        if maximum is not None:
+            self.maximum = maximum
+
+    def reset(self) -> None:
+        """Resets PID outputs, does not change parameters."""
+        for field in PIDBank.STATES:
+            getattr(self.bank, field)[self.index] = 0.0
+
+    def cycle(self, value: float, setpoint: float, time_step: float) -> float:
+        """Calculate the next PID cycle."""
+        bank = self.bank
+        i = self.index
+        kp = bank.kp[i] * bank.scale[i]
+        ki = (kp / bank.ti[i]) if (bank.ti[i] != 0.0) else 0.0
+
+        time_step /= 1e6
+        time_step = max(1e-6, time_step)
+
+        error = setpoint - value
+
+        integral = bank._integral[i] + (ki * error * time_step)
+        limit = abs(bank.integral_limit[i])
+        integral = max(min(integral, limit), -limit)
+
+        derivative = bank.td[i] * (error - bank._error[i]) / time_step
+
+        output = (error + integral + derivative) * kp
+        output = min(max(output, bank.minimum[i]), bank.maximum[i])
+
+        bank._proportional[i] = error
+        bank._integral[i] = integral
+        bank._derivative[i] = derivative
+        bank._error[i] = error
+        bank.output[i] = output
+        return float(output)
+
+
+def _view_property(field: str) -> property:
+    unbounded = PIDBank.UNBOUNDED.get(field)
+
+    def getter(self: PIDView) -> float:
+        value = float(getattr(self.bank, field)[self.index])
+        return None if (unbounded is not None and value == unbounded) else value
+
+    def setter(self: PIDView, value: float) -> None:
+        getattr(self.bank, field)[self.index] = unbounded if value is None else value
+
+    return property(getter, setter)
+
+for _field in PIDBank.PARAMETERS + PIDBank.STATES + ('scale',):
+    setattr(PIDView, _field, _view_property(_field))
+
+
+def _tests() -> bool:
+    import random
+
+    random.seed(0)
+    parameters = [
+        dict(kp=0.007, ti=0.006, td=0.1, integral_limit=0.05, maximum=0.15, minimum=-0.2),
+        dict(kp=-0.10, ti=-0.008, td=0.02, integral_limit=2.5, maximum=0.2, minimum=-0.2),
+        dict(kp=0.33, ti=3.0, td=0.6, integral_limit=None, minimum=None, maximum=None),
+        dict(kp=0.3, ti=0.0, td=0.0, integral_limit=None, minimum=None, maximum=None),
+        dict(kp=0.18, ti=0.4, td=0.001, integral_limit=5.0, minimum=0.0, maximum=0.68),
+    ]
+
+    pids = [PID(**p) for p in parameters]
+    bank = PIDBank()
+    views = [bank.add(**p) for p in parameters]
+    stepped = PIDBank()
+    for p in parameters:
+        stepped.add(**p)
+    index = np.arange(len(parameters))
+
+    for _ in range(1000):
+        values = [random.uniform(-10, 10) for _ in parameters]
+        setpoints = [random.uniform(-10, 10) for _ in parameters]
+        time_steps = [random.choice([0.0, 1e3, 2e4, 1e5]) for _ in parameters]
+        mask = [random.random() > 0.3 for _ in parameters]
+
+        outputs = stepped.step(index, values, setpoints, time_steps, mask)
+        for pid, view, value, setpoint, time_step, active, output in zip(pids, views, values, setpoints, time_steps, mask, outputs):
+            if active:
+                assert math.isclose(pid.cycle(value, setpoint, time_step), view.cycle(value, setpoint, time_step), rel_tol=1e-12, abs_tol=1e-12)
+            assert math.isclose(pid.output, output, rel_tol=1e-12, abs_tol=1e-12)
+            assert math.isclose(pid._integral, view._integral, rel_tol=1e-12, abs_tol=1e-12)
+
+    views[0]._integral = 0.5
+    assert views[0]._integral==0.5 and bank._integral[0]==0.5
+    assert views[2].maximum is None and views[1].maximum==0.2
+    views[4].minimum = 0.5
+    assert bank.minimum[4]==0.5
+
+    # A scaled controller cycles like one with kp*scale, and keeps its kp
+    pid = PID(**dict(parameters[0], kp=0.007*3))
+    view = PIDBank().add(**parameters[0])
+    stepped = PIDBank()
+    stepped.add(**parameters[0])
+    view.scale = stepped.scale[0] = 3.0
+    for value in (1.0, -2.0, 0.5):
+        output = pid.cycle(value, 0.0, 2e4)
+        assert math.isclose(output, view.cycle(value, 0.0, 2e4), rel_tol=1e-12)
+        assert math.isclose(output, stepped.step([0], [value], [0.0], 2e4)[0], rel_tol=1e-12)
+    assert view.kp == 0.007
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
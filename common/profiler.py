@@ -0,0 +1,140 @@
+import time
+
+import numpy as np
+
+
+class StageProfiler:
+    """Time the stages of a loop into fixed-size ring buffers.
+
+    Each cycle is bracketed by start() and end(), with lap() called at
+    the end of every stage in order. Durations are kept in nanoseconds
+    from time.perf_counter_ns for the last size cycles, plus the whole
+    cycle as the 'cycle' stage, so recording costs one clock read and one
+    array write per stage. Percentiles are only computed when reported.
+
+    Parameters
+    ----------
+    stages : tuple[str, ...]
+        Stage names in the order they are lapped.
+    size : int, optional
+        Number of cycles kept, by default 1000.
+
+    Attributes
+    ----------
+    cycles : int
+        Number of completed cycles.
+    """
+
+    PERCENTILES = (50, 99, 100)
+
+    def __init__(self, stages: tuple[str, ...], size: int = 1000) -> None:
+        """Inits empty ring buffers for each stage."""
+        assert size > 0, "StageProfiler size must be positive"
+        self.stages = tuple(stages) + ('cycle',)
+        self.size = size
+        self.cycles = 0
+
+        self._index = {stage: i for i, stage in enumerate(self.stages)}
+        self._samples = np.zeros((len(self.stages), size), dtype=np.int64)
+        self._head = 0
+        self._start = 0
+        self._last = 0
+
+    def start(self) -> None:
+        """Mark the start of a cycle."""
+        self._start = self._last = time.perf_counter_ns()
+
+    def lap(self, stage: str) -> None:
+        """Mark the end of a stage."""
+        now = time.perf_counter_ns()
+        self._samples[self._index[stage], self._head] = now - self._last
+        self._last = now
+
+    def end(self) -> None:
+        """Mark the end of a cycle."""
+        self._samples[-1, self._head] = time.perf_counter_ns() - self._start
+        self._head = (self._head + 1) % self.size
+        self.cycles += 1
+
+    def reset(self) -> None:
+        """Clear all samples."""
+        self._samples.fill(0)
+        self._head = 0
+        self.cycles = 0
+
+    def stats(self) -> np.ndarray:
+        """Return p50, p99 and max of each stage in microseconds (stages x 3)."""
+        filled = min(self.cycles, self.size)
+        if not filled:
+            return np.zeros((len(self.stages), len(StageProfiler.PERCENTILES)), dtype=np.float64)
+        return np.percentile(self._samples[:, :filled], StageProfiler.PERCENTILES, axis=1).T / 1e3
+
+    def __str__(self) -> str:
+        stats = self.stats()
+        return ', '.join(f"{stage} {p50:.0f}/{p99:.0f}/{peak:.0f}" for stage, (p50, p99, peak) in zip(self.stages, stats)) + " us (p50/p99/max)"
+
+
+class StartupTimer:
+    """Record how long each step of a process startup takes.
+
+    Parameters
+    ----------
+    start : float | None, optional
+        time.perf_counter value the startup began at, by default now.
+    """
+
+    def __init__(self, start: float | None = None) -> None:
+        """Inits the timer with no steps."""
+        self._start = self._last = time.perf_counter() if start is None else start
+        self.steps: list[tuple[str, float]] = []
+
+    def mark(self, step: str) -> None:
+        """Mark the end of a step."""
+        now = time.perf_counter()
+        self.steps.append((step, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self._start
+
+    def __str__(self) -> str:
+        return ', '.join(f"{step} {duration:.2f} s" for step, duration in self.steps) + f", total {self.total:.2f} s"
+
+
+def _tests() -> bool:
+    profiler = StageProfiler(('a', 'b'), size=4)
+    assert not profiler.stats().any()
+
+    for i in range(6):
+        profiler.start()
+        time.sleep(0.001)
+        profiler.lap('a')
+        profiler.lap('b')
+        profiler.end()
+
+    assert profiler.cycles == 6
+    stats = profiler.stats()
+    assert stats.shape == (3, 3)
+    assert stats[0, 0] >= 1e3 and stats[1, 2] < stats[0, 0]
+    assert np.all(stats[2] >= stats[0])
+    assert np.all(stats[:, 0] <= stats[:, 2])
+    print(profiler)
+
+    profiler.reset()
+    assert profiler.cycles == 0 and not profiler.stats().any()
+
+    startup = StartupTimer()
+    time.sleep(0.01)
+    startup.mark('a')
+    startup.mark('b')
+    assert [step for step, _ in startup.steps] == ['a', 'b']
+    assert startup.steps[0][1] >= 0.01 and abs(startup.total - sum(d for _, d in startup.steps)) < 1e-9
+    print(startup)
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
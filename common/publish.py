@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+
+
+class PublishPolicy:
+    """Decide when a periodically offered message is worth publishing.
+
+    A value is published when any element has moved more than deadband
+    from the last published value, or when keepalive seconds have passed
+    since the last publish. With min_interval set, publishes are also
+    held back until that long after the previous one; a held change is
+    sent on the first offer after the interval because it is compared
+    against the last published value, not the last offered one.
+
+    Parameters
+    ----------
+    deadband : float | np.ndarray, optional
+        Change needed to publish, per element, by default 0 (any change).
+    keepalive : float, optional
+        Longest time in seconds between publishes, by default 0.1.
+    min_interval : float, optional
+        Shortest time in seconds between publishes, by default 0.
+
+    Attributes
+    ----------
+    sent : int
+        Number of offers that were published.
+    suppressed : int
+        Number of offers that were not.
+    """
+
+    def __init__(self, deadband: float | np.ndarray = 0.0, keepalive: float = 0.1, min_interval: float = 0.0) -> None:
+        """Inits a policy that publishes the first offer."""
+        assert keepalive >= min_interval >= 0, "PublishPolicy needs keepalive >= min_interval >= 0"
+        self.deadband = deadband
+        self.keepalive = keepalive
+        self.min_interval = min_interval
+
+        self.sent = 0
+        self.suppressed = 0
+
+        self._last = None
+        self._diff = None
+        self._time = -float('inf')
+
+    def check(self, value: float | np.ndarray, now: float | None = None) -> bool:
+        """Return whether to publish value now, recording it if so."""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._time
+
+        if self._last is None:
+            self._last = np.array(value, dtype=np.float64, ndmin=1)
+            self._diff = np.zeros_like(self._last)
+        elif elapsed < self.min_interval:
+            self.suppressed += 1
+            return False
+        elif elapsed < self.keepalive:
+            np.abs(np.subtract(value, self._last, out=self._diff), out=self._diff)
+            if not np.greater(self._diff, self.deadband).any():
+                self.suppressed += 1
+                return False
+
+        self._last[:] = value
+        self._time = now
+        self.sent += 1
+        return True
+
+    @property
+    def offered(self) -> int:
+        return self.sent + self.suppressed
+
+    def __str__(self) -> str:
+        return f"{self.sent}/{self.offered} sent"
+
+
+def _tests() -> bool:
+    policy = PublishPolicy(deadband=0.5, keepalive=1.0)
+    assert policy.check(0.0, now=0.0)
+    assert not policy.check(0.4, now=0.1)
+    assert not policy.check(-0.4, now=0.2)
+    assert policy.check(0.6, now=0.3)
+    assert not policy.check(0.6, now=0.4)
+    assert policy.check(0.6, now=1.3) # Keepalive
+    assert (policy.sent, policy.suppressed) == (3, 3)
+
+    # Rate cap holds a change back until the interval has passed
+    policy = PublishPolicy(keepalive=1.0, min_interval=0.1)
+    assert policy.check(1.0, now=0.0)
+    assert not policy.check(2.0, now=0.05)
+    assert policy.check(2.0, now=0.1)
+
+    # Per-element deadbands
+    policy = PublishPolicy(deadband=np.array([0.1, 10.0]), keepalive=1.0)
+    assert policy.check(np.array([0.0, 0.0]), now=0.0)
+    assert not policy.check(np.array([0.05, 5.0]), now=0.1)
+    assert policy.check(np.array([0.2, 5.0]), now=0.2)
+    assert not policy.check(np.array([0.2, 14.0]), now=0.3)
+    assert policy.check(np.array([0.2, 16.0]), now=0.4)
+    assert str(policy) == "3/5 sent"
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
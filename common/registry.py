@@ -0,0 +1,94 @@
+"""Persistent node registries
+
+Each UAVCAN node keeps its registers in a database file (db_files in
+config.ini) that survives restarts, so node-IDs, port-IDs and the
+node's unique-ID stay the same from one boot to the next. open_registry
+compares the registers a node wants (normally built from
+_db_config.ini) against a digest stored in the file and only writes the
+registers that differ, so an unchanged configuration opens without any
+writes.
+
+Environment variables are not read, so nodes sharing a process cannot
+leak configuration into each other.
+
+Must be imported after common.dsdl.prepare().
+"""
+
+import hashlib
+import logging
+
+import pycyphal.application
+import pycyphal.application.register as register
+
+# Bump when the meaning of existing registers changes to rewrite every file
+REGISTRY_VERSION = 1
+DIGEST_REGISTER = 'fmuas.registry.digest'
+
+DIAGNOSTIC_SEVERITY = 2 # uavcan.diagnostic.Severity INFO
+
+# Registers under these prefixes are removed when no longer configured
+PORT_PREFIXES = ('uavcan.pub.', 'uavcan.sub.', 'uavcan.cln.', 'uavcan.srv.')
+
+logger = logging.getLogger(__name__)
+
+
+def digest(registers: dict[str, int | str]) -> str:
+    """Return the digest of a register configuration."""
+    text = repr((REGISTRY_VERSION, sorted(registers.items())))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def open_registry(path: str, registers: dict[str, int | str]) -> register.Registry:
+    """Open a node's registry file, applying only the registers that changed.
+
+    Parameters
+    ----------
+    path : str
+        Registry database file, created if missing.
+    registers : dict[str, int | str]
+        Register values by name, e.g. {'uavcan.node.id': 60}. Integers
+        are stored as natural16 and strings as strings.
+
+    Returns
+    -------
+    register.Registry
+        The registry, ready for pycyphal.application.make_node.
+    """
+    registry = pycyphal.application.make_registry(path, environment_variables={})
+
+    target = digest(registers)
+    if DIGEST_REGISTER in registry and str(registry[DIGEST_REGISTER]) == target:
+        logger.debug(f"Registry {path} is current")
+        return registry
+
+    changed = 0
+    for name, value in registers.items():
+        if name in registry and _matches(registry[name], value):
+            continue
+        try:
+            registry[name] = _value(value)
+        except register.ValueConversionError: # Stored with an incompatible type
+            del registry[name]
+            registry[name] = _value(value)
+        changed += 1
+
+    stale = [name for name in registry if name.startswith(PORT_PREFIXES) and name not in registers]
+    for name in stale:
+        del registry[name]
+
+    registry[DIGEST_REGISTER] = register.Value(string=register.String(target))
+    logger.info(f"Registry {path} updated: {changed} changed, {len(stale)} removed")
+    return registry
+
+
+def _matches(proxy: register.ValueProxy, value: int | str) -> bool:
+    try:
+        return (int(proxy) if isinstance(value, int) else str(proxy)) == value
+    except (register.ValueConversionError, TypeError, ValueError):
+        return False
+
+
+def _value(value: int | str) -> register.Value:
+    if isinstance(value, int):
+        return register.Value(natural16=register.Natural16([value]))
+    return register.Value(string=register.String(value))
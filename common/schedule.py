@@ -0,0 +1,164 @@
+"""Gain schedules
+
+Lookup tables for the AFCS keyed by indicated airspeed and VTOL ratio
+(1 is VTOL, 0 is wingborne). All tables share one grid of breakpoints,
+so a cycle locates its cell once and interpolates every table with a
+single bilinear blend of four corners into a preallocated buffer.
+
+Tables are loaded from a JSON file (common/gain_schedule.json):
+
+    {
+        "ias": [0.0, 26.0, 40.0],           # breakpoints, m/s
+        "vtol_ratio": [0.0, 1.0],           # breakpoints
+        "surface": [1.0, 1.0, 0.42],        # table over ias
+        "kp": {"pidf_aoa_out": [[...]]},    # kp multipliers, ias x vtol_ratio
+        "transit": {"pidf_aoa_out": 1.3}    # constant
+    }
+
+A table is a number (constant), a list over the ias breakpoints, or a
+list of lists over ias and vtol_ratio. Values outside the grid are held
+at the edge. Nested sections are named section/key, e.g. kp/pidf_aoa_out.
+"""
+
+import bisect
+import json
+
+import numpy as np
+
+
+class GainSchedule:
+    """Bilinear lookup tables on a shared airspeed and VTOL ratio grid.
+
+    Parameters
+    ----------
+    ias : list[float]
+        Airspeed breakpoints in ascending order.
+    vtol_ratio : list[float]
+        VTOL ratio breakpoints in ascending order.
+    tables : dict[str, float | list]
+        Tables by name, see module docstring.
+
+    Attributes
+    ----------
+    values : np.ndarray
+        Every table interpolated at the last update(), in the order of names.
+    names : list[str]
+        Table names.
+    """
+    def __init__(self, ias: list[float], vtol_ratio: list[float], tables: dict) -> None:
+        """Inits the schedule and stacks its tables."""
+        self._ias = [float(x) for x in ias]
+        self._ratio = [float(x) for x in vtol_ratio]
+        assert self._ias == sorted(self._ias) and self._ratio == sorted(self._ratio), "GainSchedule breakpoints must be ascending"
+        shape = (len(self._ias), len(self._ratio))
+
+        self.names = list(tables)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._tables = np.zeros((len(self.names),) + shape, dtype=np.float64)
+        for i, name in enumerate(self.names):
+            table = np.asarray(tables[name], dtype=np.float64)
+            if table.ndim == 1:
+                table = table[:, np.newaxis]
+            assert table.ndim == 0 or table.shape[0] == shape[0], f"GainSchedule table {name} does not match the ias breakpoints"
+            self._tables[i] = np.broadcast_to(table, shape)
+
+        self.values = np.zeros(len(self.names), dtype=np.float64)
+        self._scratch = np.zeros(len(self.names), dtype=np.float64)
+        self.update(self._ias[0], self._ratio[0])
+
+    @classmethod
+    def load(cls, path: str) -> 'GainSchedule':
+        """Load a schedule from a JSON file."""
+        with open(path, 'r') as file:
+            data = json.load(file)
+
+        tables = {}
+        for key, value in data.items():
+            if key in ('ias', 'vtol_ratio'):
+                continue
+            if isinstance(value, dict):
+                tables.update({f"{key}/{name}": table for name, table in value.items()})
+            else:
+                tables[key] = value
+        return cls(data['ias'], data['vtol_ratio'], tables)
+
+    def index(self, name: str) -> int:
+        """Return the position of a table in values."""
+        return self._index[name]
+
+    def section(self, section: str) -> dict[str, int]:
+        """Return the positions of the tables in a section, keyed by their name in it."""
+        prefix = section + '/'
+        return {name[len(prefix):]: i for name, i in self._index.items() if name.startswith(prefix)}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __getitem__(self, name: str) -> float:
+        return float(self.values[self._index[name]])
+
+    def update(self, ias: float, vtol_ratio: float) -> np.ndarray:
+        """Interpolate every table at a point, returning values."""
+        i, fx = GainSchedule._locate(self._ias, ias)
+        j, fy = GainSchedule._locate(self._ratio, vtol_ratio)
+        i1 = min(i+1, len(self._ias)-1)
+        j1 = min(j+1, len(self._ratio)-1)
+
+        tables = self._tables
+        np.multiply(tables[:, i, j], (1-fx)*(1-fy), out=self.values)
+        self.values += np.multiply(tables[:, i1, j], fx*(1-fy), out=self._scratch)
+        self.values += np.multiply(tables[:, i, j1], (1-fx)*fy, out=self._scratch)
+        self.values += np.multiply(tables[:, i1, j1], fx*fy, out=self._scratch)
+        return self.values
+
+    @staticmethod
+    def _locate(breakpoints: list[float], x: float) -> tuple[int, float]:
+        """Return the cell holding x and the fraction of the way across it."""
+        if len(breakpoints) == 1 or not x > breakpoints[0]: # Also catches nan
+            return 0, 0.0
+        if x >= breakpoints[-1]:
+            return len(breakpoints)-1, 0.0
+        i = bisect.bisect_right(breakpoints, x) - 1
+        return i, (x-breakpoints[i]) / (breakpoints[i+1]-breakpoints[i])
+
+
+def _tests() -> bool:
+    schedule = GainSchedule(
+        [0.0, 10.0, 20.0],
+        [0.0, 1.0],
+        {
+            'constant': 2.0,
+            'ias': [1.0, 2.0, 4.0],
+            'both': [[0.0, 1.0], [10.0, 11.0], [20.0, 21.0]],
+        }
+    )
+    values = schedule.values
+
+    schedule.update(5.0, 0.5)
+    assert np.allclose(values, [2.0, 1.5, 5.5])
+    schedule.update(15.0, 0.25)
+    assert np.allclose(values, [2.0, 3.0, 15.25])
+    assert schedule['both'] == values[schedule.index('both')]
+
+    # Held at the edges
+    schedule.update(-5.0, 2.0)
+    assert np.allclose(values, [2.0, 1.0, 1.0])
+    schedule.update(50.0, -1.0)
+    assert np.allclose(values, [2.0, 4.0, 20.0])
+    schedule.update(float('nan'), 1.0)
+    assert np.allclose(values, [2.0, 1.0, 1.0])
+    assert schedule.values is values
+
+    import os
+    schedule = GainSchedule.load(os.path.join(os.path.dirname(__file__), 'gain_schedule.json'))
+    assert 'surface' in schedule and 'transit/pidf_aoa_out' in schedule
+    for ias in [0.0, 20.0, 26.0, 30.0, 40.0, 60.0]:
+        schedule.update(ias, 0.5)
+        assert abs(schedule['surface'] - min(676 / max(ias, 1e-3)**2, 1.0)) < 0.05
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+
+class RateScheduler:
+    """Pace a loop at a fixed rate using absolute deadlines.
+
+    Deadlines are kept on time.monotonic and advance by exactly one
+    period per cycle, so sleep jitter does not accumulate into drift.
+    A cycle that ends after its deadline is counted as an overrun; if it
+    is late by more than a whole period the missed slots are dropped
+    instead of being run back-to-back.
+
+    Parameters
+    ----------
+    freq : float
+        Loop rate in Hz.
+    name : str, optional
+        Name used when reporting, by default ''.
+
+    Attributes
+    ----------
+    cycles : int
+        Number of completed cycles.
+    overruns : int
+        Number of cycles that finished after their deadline.
+    max_lateness : float
+        Largest deadline miss in seconds.
+    """
+
+    def __init__(self, freq: float, name: str = '') -> None:
+        """Inits the scheduler with the desired rate."""
+        assert freq > 0, "RateScheduler frequency must be positive"
+        self.name = name
+        self.period = 1 / freq
+
+        self.cycles = 0
+        self.overruns = 0
+        self.max_lateness = 0.0
+
+        self._deadline = None
+
+    @property
+    def freq(self) -> float:
+        return 1 / self.period
+
+    def reset(self) -> None:
+        """Re-anchors the schedule on the next call to wait()."""
+        self._deadline = None
+
+    async def wait(self) -> None:
+        """Sleep until the next deadline."""
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now
+
+        self._deadline += self.period
+        self.cycles += 1
+
+        delay = self._deadline - now
+        if delay > 0.0:
+            await asyncio.sleep(delay)
+        else:
+            self.overruns += 1
+            self.max_lateness = max(self.max_lateness, -delay)
+            if -delay > self.period:
+                self._deadline = now
+            await asyncio.sleep(0)
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.freq:.0f} Hz: {self.cycles} cycles, {self.overruns} overruns, max late {self.max_lateness*1e3:.1f} ms"
+
+
+def _tests() -> bool:
+    async def run() -> None:
+        # Deadlines do not drift with the time spent in each cycle
+        scheduler = RateScheduler(50, 'test')
+        period = scheduler.period
+        await scheduler.wait()
+        start = time.monotonic()
+        for _ in range(20):
+            time.sleep(period/4)
+            await scheduler.wait()
+        elapsed = time.monotonic() - start
+        assert abs(elapsed - 20*period) < period/2, f"Drifted {elapsed - 20*period:.4f} s"
+        assert scheduler.cycles == 21 and scheduler.overruns == 0
+
+        # A slightly late cycle is an overrun, and the next one catches up
+        time.sleep(1.5*period)
+        await scheduler.wait()
+        assert scheduler.overruns == 1 and period/2 <= scheduler.max_lateness < period
+        start = time.monotonic()
+        await scheduler.wait()
+        assert time.monotonic() - start < 3*period/4
+
+        # A cycle late by more than a period drops the missed slots
+        time.sleep(2.5*period)
+        await scheduler.wait()
+        assert scheduler.overruns == 2 and scheduler.max_lateness > period
+        start = time.monotonic()
+        await scheduler.wait()
+        assert time.monotonic() - start > 3*period/4, "Missed slots were run back-to-back"
+        print(scheduler)
+
+    asyncio.run(run())
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    _tests()
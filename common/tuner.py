@@ -0,0 +1,507 @@
+"""Offline PID tuner
+
+Sweeps gain sets for the AFCS controllers in parallel against a headless
+plant model and exports the best ones. Controllers are named and
+numbered as in utilities.pid_tune_map, so exported gains can be sent
+with the GCS PID tuner as they are.
+
+    python -m common.tuner hover pidv_alt_vsp pidv_vsp_out -n 2000
+
+The plant is a coarse rigid-body model of the aircraft in hover and in
+cruise, good enough to rank gain sets and narrow down a search; check
+the winners in the simulator before flying them.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import common.control as control
+from common.states import GlobalStates as g
+from utilities import pid_tune_map
+
+GRAVITY = 9.81
+
+
+class Plant:
+    """Headless rigid-body model of the aircraft.
+
+    Motor outputs are normalized (0 to 1) and servos are in radians as
+    produced by common.control. In hover the motors give lift and
+    attitude moments and the elevons give yaw; in cruise the motors give
+    thrust and the elevons give pitch and roll moments.
+
+    The constants are rough estimates, not measured from the aircraft,
+    except THRUST_ACCEL: pidf_ias_thr can only add kp*integral_limit
+    (0.08) of steady throttle to BASE_THROTTLE_PCT, so thrust is set for
+    cruise to trim inside that range.
+
+    Parameters
+    ----------
+    altitude : float, optional
+        Initial altitude in meters, by default 0.0.
+    ias : float, optional
+        Initial airspeed in m/s, by default 0.0 (hover).
+    aoa : float, optional
+        Initial angle of attack in radians, by default 0.0.
+    """
+    HOVER_THROTTLE = 0.58
+    ROLL_ACCEL = 60.0   # rad/s^2 per unit of differential throttle
+    PITCH_ACCEL = 40.0
+    YAW_ACCEL = 15.0    # rad/s^2 per radian of differential elevon
+    RATE_DAMPING = 2.0
+    HOVER_DRAG = 0.3
+
+    THRUST_ACCEL = 10.0 # m/s^2 at full throttle, level flight at 35 m/s trims at 0.43
+    PARASITE_DRAG = 0.0035
+    INDUCED_DRAG = 0.6
+    LIFT_SLOPE = 0.109  # per radian per (m/s)^2
+    ZERO_LIFT_AOA = -0.02
+    ELEVON_PITCH = 45.0 # rad/s^2 per radian at 30 m/s
+    ELEVON_ROLL = 60.0
+    PITCH_STABILITY = 30.0
+    TRIM_AOA = 0.05
+    PITCH_DAMPING = 4.0
+    ROLL_DAMPING = 5.0
+
+    def __init__(self, altitude: float = 0.0, ias: float = 0.0, aoa: float = 0.0) -> None:
+        """Inits the plant at rest in level attitude."""
+        self.altitude = altitude
+        self.vs = 0.0
+        self.ias = ias
+        self.aoa = aoa
+        self.pitch = aoa
+        self.roll = 0.0
+        self.yaw = 0.0
+        self.rollspeed = 0.0
+        self.pitchspeed = 0.0
+        self.yawspeed = 0.0
+        self.xspeed = 0.0 # Right
+        self.yspeed = 0.0 # Forward
+
+    def step(self, servos: np.ndarray, motors: np.ndarray, dt: float, flight: bool) -> None:
+        """Advance the plant by dt seconds."""
+        if flight:
+            self._flight(servos, motors, dt)
+        else:
+            self._hover(servos, motors, dt)
+
+        self.yaw = (self.yaw + math.pi) % (2*math.pi) - math.pi
+
+    def _hover(self, servos: np.ndarray, motors: np.ndarray, dt: float) -> None:
+        lift = GRAVITY * motors.mean() / Plant.HOVER_THROTTLE
+        accel = lift * math.cos(self.roll) * math.cos(self.pitch) - GRAVITY
+        if self.altitude <= 0.0 and accel < 0.0:
+            accel = 0.0
+            self.vs = 0.0
+
+        self.rollspeed += (Plant.ROLL_ACCEL*(motors[2]-motors[3]) - Plant.RATE_DAMPING*self.rollspeed) * dt
+        self.pitchspeed += (Plant.PITCH_ACCEL*(motors[0]+motors[1]-motors[2]-motors[3])/2 - Plant.RATE_DAMPING*self.pitchspeed) * dt
+        self.yawspeed += (Plant.YAW_ACCEL*(servos[1]-servos[0])/2 - Plant.RATE_DAMPING*self.yawspeed) * dt
+
+        self.roll += self.rollspeed * dt
+        self.pitch += self.pitchspeed * dt
+        self.yaw += self.yawspeed * dt
+
+        self.xspeed += (lift*math.sin(self.roll) - Plant.HOVER_DRAG*self.xspeed) * dt
+        self.yspeed += (-lift*math.sin(self.pitch) - Plant.HOVER_DRAG*self.yspeed) * dt
+        self.vs += accel * dt
+        self.altitude = max(self.altitude + self.vs*dt, 0.0)
+
+    def _flight(self, servos: np.ndarray, motors: np.ndarray, dt: float) -> None:
+        ias = max(self.ias, 1.0)
+        pressure = (ias/30)**2
+        vpath = self.pitch - self.aoa
+        lift = Plant.LIFT_SLOPE * (self.aoa-Plant.ZERO_LIFT_AOA) * ias**2
+        drag = Plant.PARASITE_DRAG*ias**2 + Plant.INDUCED_DRAG*lift**2/ias**2
+
+        elevator = (servos[0]+servos[1]) / 2
+        aileron = (servos[0]-servos[1]) / 2
+
+        vpath_rate = (lift*math.cos(self.roll) - GRAVITY*math.cos(vpath)) / ias
+        self.pitchspeed += (-Plant.ELEVON_PITCH*elevator*pressure
+                            - Plant.PITCH_STABILITY*(self.aoa-Plant.TRIM_AOA)*pressure
+                            - Plant.PITCH_DAMPING*self.pitchspeed) * dt
+        self.rollspeed += (Plant.ELEVON_ROLL*aileron*pressure - Plant.ROLL_DAMPING*self.rollspeed) * dt
+        self.yawspeed = lift*math.sin(self.roll) / (ias*math.cos(vpath))
+
+        self.ias += (Plant.THRUST_ACCEL*motors.mean() - drag - GRAVITY*math.sin(vpath)) * dt
+        self.pitch += self.pitchspeed * dt
+        self.aoa += (self.pitchspeed - vpath_rate) * dt
+        self.roll += self.rollspeed * dt
+        self.yaw += self.yawspeed * dt
+
+        self.vs = self.ias * math.sin(self.pitch - self.aoa)
+        self.altitude += self.vs * dt
+        self.yspeed = self.ias
+
+    def sense(self, sensors: control.Sensors) -> control.Sensors:
+        """Write the plant state to a set of sensors."""
+        sensors.att.roll = self.roll
+        sensors.att.pitch = self.pitch
+        sensors.att.yaw = self.yaw
+        sensors.att.rollspeed = self.rollspeed
+        sensors.att.pitchspeed = self.pitchspeed
+        sensors.att.yawspeed = self.yawspeed
+        sensors.att.xspeed = self.xspeed
+        sensors.att.yspeed = self.yspeed
+        sensors.att.zspeed = self.vs
+        sensors.alt.altitude = self.altitude
+        sensors.aoa.aoa = self.aoa
+        sensors.ias.ias = self.ias
+        return sensors
+
+
+class Scenario:
+    """A setpoint step flown from a trimmed initial condition.
+
+    Parameters
+    ----------
+    submode : int
+        Submode the control laws run in.
+    plant : dict
+        Arguments of the initial Plant.
+    setpoints : dict
+        Arguments of the commanded Setpoints.
+    tracked : tuple[str, ...]
+        Plant attributes scored against their setpoints.
+    duration : float, optional
+        Length of the run in seconds, by default 20.0.
+    freq : int, optional
+        Control rate in Hz, by default 100.
+    """
+    def __init__(
+            self,
+            submode: int,
+            plant: dict,
+            setpoints: dict,
+            tracked: tuple[str, ...],
+            duration: float = 20.0,
+            freq: int = 100) -> None:
+        self.submode = submode
+        self.plant = plant
+        self.setpoints = setpoints
+        self.tracked = tracked
+        self.duration = duration
+        self.freq = freq
+
+
+SCENARIOS = {
+    'hover': Scenario(
+        g.CUSTOM_SUBMODE_LANDING_HOVER,
+        plant={'altitude': 20.0},
+        setpoints={'altitude': 25.0, 'heading': 0.3, 'hover_alt': 20.0},
+        tracked=('altitude', 'yaw'),
+    ),
+    'cruise': Scenario(
+        g.CUSTOM_SUBMODE_FLIGHT_NORMAL,
+        plant={'altitude': 100.0, 'ias': 30.0, 'aoa': 0.08},
+        setpoints={'altitude': 110.0, 'heading': 0.3, 'ias': 35.0},
+        tracked=('altitude', 'yaw', 'ias'),
+        duration=40.0,
+    ),
+}
+
+# Setpoint matching each tracked plant attribute
+_TARGETS = {'altitude': 'altitude', 'yaw': 'heading', 'ias': 'ias'}
+
+# Tracked attributes each controller drives, the rest drive all of them
+CHANNELS = {
+    'pidf_alt_vpa': ('altitude',),
+    'pidf_vpa_aoa': ('altitude',),
+    'pidf_vpa_thr': ('altitude',),
+    'pidf_aoa_out': ('altitude',),
+    'pidf_dyw_rol': ('yaw',),
+    'pidf_rol_rls': ('yaw',),
+    'pidf_rls_out': ('yaw',),
+    'pidf_ias_thr': ('ias',),
+    'pidv_alt_vsp': ('altitude',),
+    'pidv_vsp_out': ('altitude',),
+    'pidv_dyw_yws': ('yaw',),
+    'pidv_yws_out': ('yaw',),
+}
+
+SETTLE_BAND = 0.05
+DIVERGED = 1e4
+
+
+class Result:
+    """Score of one gain set.
+
+    Attributes
+    ----------
+    gains : dict[str, tuple[float, float, float]]
+        kp, ti, td of each swept controller.
+    cost : float
+        Weighted sum of the metrics, inf if the run diverged.
+    overshoot : float
+        Worst overshoot of the scored channels as a fraction of the step.
+    settling : float
+        Worst time of the scored channels to stay within SETTLE_BAND of
+        the step, in seconds.
+    effort : float
+        Mean actuator travel per second.
+    channels : dict[str, tuple[float, float]]
+        Overshoot and settling time of every tracked attribute, scored
+        or not.
+    """
+    def __init__(self, gains: dict, cost: float, overshoot: float, settling: float, effort: float, channels: dict | None = None) -> None:
+        self.gains = gains
+        self.cost = cost
+        self.overshoot = overshoot
+        self.settling = settling
+        self.effort = effort
+        self.channels = channels if channels is not None else {}
+
+    def __str__(self) -> str:
+        channels = ', '.join(f"{name} {overshoot*100:.1f} %/{settling:.2f} s" for name, (overshoot, settling) in self.channels.items())
+        return f"cost {self.cost:.4f}: overshoot {self.overshoot*100:.1f} %, settling {self.settling:.2f} s, effort {self.effort:.3f}/s ({channels})"
+
+
+def driven(scenario: Scenario, names) -> tuple[str, ...]:
+    """Return the tracked attributes of a scenario that the named controllers drive."""
+    channels = set()
+    for name in names:
+        channels.update(CHANNELS.get(name, scenario.tracked))
+    return tuple(name for name in scenario.tracked if name in channels)
+
+
+def simulate(scenario: Scenario, gains: dict[str, tuple[float, float, float]]) -> tuple[np.ndarray, np.ndarray]:
+    """Fly a scenario with the given gains.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Tracked attributes (steps x tracked) and actuator outputs
+        (steps x 7, throttles normalized) at every control step.
+    """
+    state = control.ControlState()
+    for name, (kp, ti, td) in gains.items():
+        getattr(state, '_'+name).set(kp=kp, ti=ti, td=td)
+
+    plant = Plant(**scenario.plant)
+    sensors = plant.sense(control.Sensors())
+    setpoints = control.Setpoints(submode=scenario.submode, **scenario.setpoints)
+    flight = scenario.submode in control.FLIGHT_SUBMODES
+
+    steps = int(scenario.duration * scenario.freq)
+    dt = 1 / scenario.freq
+    tracked = np.zeros((steps, len(scenario.tracked)), dtype=np.float64)
+    actuators = np.zeros((steps, 7), dtype=np.float64)
+
+    for i in range(steps):
+        outputs, state = control.step(state, sensors, setpoints, dt=dt*1e6)
+        plant.step(outputs.servos, state._motors, dt, flight)
+        plant.sense(sensors)
+
+        for j, name in enumerate(scenario.tracked):
+            tracked[i, j] = getattr(plant, name)
+        actuators[i] = state._outputs
+
+        if not abs(plant.altitude) < DIVERGED:
+            tracked[i:] = np.nan
+            break
+
+    return tracked, actuators
+
+
+def score(
+        scenario: Scenario,
+        gains: dict[str, tuple[float, float, float]],
+        weights: tuple[float, float, float] = (1.0, 1.0, 0.1),
+        channels: tuple[str, ...] | None = None) -> Result:
+    """Fly a scenario and score the response.
+
+    Parameters
+    ----------
+    scenario : Scenario
+        Scenario to fly.
+    gains : dict[str, tuple[float, float, float]]
+        kp, ti, td of each controller to change, by pid_tune_map name.
+    weights : tuple[float, float, float], optional
+        Weights of overshoot, settling time (as a fraction of the
+        duration) and effort, by default (1.0, 1.0, 0.1).
+    channels : tuple[str, ...], optional
+        Tracked attributes to score, by default those driven by the
+        controllers in gains (all of them if gains is empty).
+
+    Returns
+    -------
+    Result
+        The metrics and their weighted cost.
+    """
+    if channels is None:
+        channels = driven(scenario, gains) if gains else scenario.tracked
+
+    tracked, actuators = simulate(scenario, gains)
+    if not np.all(np.isfinite(tracked)):
+        return Result(gains, math.inf, math.inf, math.inf, math.inf)
+
+    plant = Plant(**scenario.plant)
+    times = np.arange(1, tracked.shape[0]+1) / scenario.freq
+
+    results = {}
+    for j, name in enumerate(scenario.tracked):
+        initial = getattr(plant, name)
+        change = scenario.setpoints[_TARGETS[name]] - initial
+        if change == 0.0:
+            continue
+        response = (tracked[:, j] - initial) / change # 1 at the setpoint
+
+        outside = np.flatnonzero(np.abs(response - 1.0) > SETTLE_BAND)
+        results[name] = (max(response.max() - 1.0, 0.0), times[outside[-1]] if outside.size else 0.0)
+
+    scored = [results[name] for name in channels if name in results]
+    overshoot = max((overshoot for overshoot, _ in scored), default=0.0)
+    settling = max((settling for _, settling in scored), default=0.0)
+
+    effort = np.abs(np.diff(actuators, axis=0)).sum() / scenario.duration
+
+    cost = weights[0]*overshoot + weights[1]*settling/scenario.duration + weights[2]*effort
+    return Result(gains, cost, overshoot, settling, effort, results)
+
+
+def _evaluate(job: tuple[str, dict, tuple[float, float, float]]) -> Result:
+    scenario, gains, weights = job
+    return score(SCENARIOS[scenario], gains, weights)
+
+
+def default_gains(names: list[str]) -> dict[str, tuple[float, float, float]]:
+    """Return the current kp, ti, td of the named controllers."""
+    state = control.ControlState()
+    return {name: (getattr(state, '_'+name).kp, getattr(state, '_'+name).ti, getattr(state, '_'+name).td) for name in names}
+
+
+def candidates(names: list[str], samples: int, span: float = 3.0, seed: int | None = None) -> list[dict]:
+    """Draw gain sets log-uniformly within a factor of span of the current gains.
+
+    The current gains are always the first candidate. Gains that are
+    zero stay zero.
+    """
+    rng = np.random.default_rng(seed)
+    base = default_gains(names)
+    scales = np.exp(rng.uniform(-math.log(span), math.log(span), size=(samples, len(names), 3)))
+    sets = [base]
+    for scale in scales[:samples-1]:
+        sets.append({name: tuple(float(v) for v in np.multiply(base[name], scale[i])) for i, name in enumerate(names)})
+    return sets
+
+
+def sweep(
+        scenario: str,
+        names: list[str],
+        samples: int = 1000,
+        span: float = 3.0,
+        weights: tuple[float, float, float] = (1.0, 1.0, 0.1),
+        processes: int | None = None,
+        seed: int | None = None) -> list[Result]:
+    """Score random gain sets on all cores.
+
+    Parameters
+    ----------
+    scenario : str
+        Key of SCENARIOS to fly.
+    names : list[str]
+        Controllers to sweep, by pid_tune_map name.
+    samples : int, optional
+        Number of gain sets, by default 1000.
+    span : float, optional
+        Largest factor from the current gains, by default 3.0.
+    weights : tuple[float, float, float], optional
+        Weights of overshoot, settling and effort, by default (1.0, 1.0, 0.1).
+    processes : int, optional
+        Worker processes, by default None which uses every core.
+    seed : int, optional
+        Random seed, by default None.
+
+    Returns
+    -------
+    list[Result]
+        Results sorted from best to worst.
+    """
+    assert scenario in SCENARIOS, f"Unknown scenario {scenario}, expected one of {', '.join(SCENARIOS)}"
+    for name in names:
+        assert name in pid_tune_map and name != 'pid_any', f"Unknown controller {name}"
+
+    jobs = [(scenario, gains, weights) for gains in candidates(names, samples, span, seed)]
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = list(executor.map(_evaluate, jobs, chunksize=max(1, len(jobs)//(4*processes))))
+
+    return sorted(results, key=lambda result: result.cost)
+
+
+def export(result: Result, path: str) -> None:
+    """Write gains to a JSON file keyed by controller name, with their tuning IDs."""
+    gains = {name: {'id': pid_tune_map[name].id, 'kp': kp, 'ti': ti, 'td': td} for name, (kp, ti, td) in result.gains.items()}
+    with open(path, 'w') as file:
+        json.dump({'cost': result.cost, 'gains': gains}, file, indent=4)
+
+
+def _tests() -> bool:
+    # Default cruise heading gains oscillate on this plant. The channel is
+    # only scored, so sweeps can still rank gains that do settle.
+    unsettled = {('cruise', 'yaw')}
+    baseline = default_gains(['pidv_alt_vsp', 'pidf_ias_thr'])
+    for name, scenario in SCENARIOS.items():
+        result = score(scenario, baseline, channels=scenario.tracked)
+        assert math.isfinite(result.cost), f"Default gains diverged in {name}"
+        for channel, (_, settling) in result.channels.items():
+            if (name, channel) not in unsettled:
+                assert settling < scenario.duration, f"Default gains do not settle {channel} in {name}"
+        print(f"{name:<8} {result}")
+
+    # Only the channels a controller drives are scored
+    assert driven(SCENARIOS['cruise'], ['pidf_ias_thr', 'pidf_alt_vpa']) == ('altitude', 'ias')
+    assert driven(SCENARIOS['hover'], ['pidv_xsp_rol']) == SCENARIOS['hover'].tracked
+    result = score(SCENARIOS['cruise'], default_gains(['pidf_ias_thr']))
+    assert (result.overshoot, result.settling) == result.channels['ias']
+
+    # Zero derivative gains stay zero
+    sets = candidates(['pidv_vsp_out', 'pidf_vpa_thr'], 8, seed=0)
+    assert len(sets) == 8 and sets[0] == default_gains(['pidv_vsp_out', 'pidf_vpa_thr'])
+    assert all(gains['pidf_vpa_thr'][2] == 0.0 for gains in sets)
+
+    tstart = time.perf_counter()
+    results = sweep('hover', ['pidv_alt_vsp'], samples=8, processes=2, seed=0)
+    assert results[0].cost <= min(result.cost for result in results)
+    print(f"8 gain sets in {time.perf_counter()-tstart:.2f} s")
+
+    print("Tests passed!")
+    return True
+
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description="Sweep AFCS gains against a headless plant model")
+    parser.add_argument("scenario", nargs='?', choices=list(SCENARIOS), help="Scenario to fly")
+    parser.add_argument("pids", nargs='*', help="Controllers to sweep, by pid_tune_map name")
+    parser.add_argument("-n", "--samples", type=int, default=1000, help="Number of gain sets")
+    parser.add_argument("--span", type=float, default=3.0, help="Largest factor from the current gains")
+    parser.add_argument("-w", "--weights", type=float, nargs=3, default=(1.0, 1.0, 0.1), help="Weights of overshoot, settling and effort")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("-o", "--output", default='tuned_gains.json', help="JSON file for the best gains")
+    parser.add_argument("-t", "--test", action='store_true', help="Run self tests")
+    args = parser.parse_args()
+
+    if args.test:
+        _tests()
+    else:
+        assert args.scenario and args.pids, "Name a scenario and at least one controller to sweep"
+        tstart = time.perf_counter()
+        results = sweep(args.scenario, args.pids, args.samples, args.span, tuple(args.weights), args.processes, args.seed)
+        print(f"Scored {len(results)} gain sets in {time.perf_counter()-tstart:.1f} s")
+
+        baseline = next(result for result in results if result.gains == default_gains(args.pids))
+        print(f"Current: {baseline}")
+        print(f"Best:    {results[0]}")
+        for name, (kp, ti, td) in results[0].gains.items():
+            print(f"    {name:<14} (id {pid_tune_map[name].id:>2}) kp={kp:.5f} ti={ti:.5f} td={td:.5f}")
+
+        export(results[0], args.output)
+        print(f"Saved to {args.output}")
@@ -45,25 +45,13 @@ try:
     for var in os.environ:
         if var.startswith('UAVCAN__'):
             os.environ.pop(var)
-    os.environ['CYPHAL_PATH'] = './common/public_regulated_data_types'
-    os.environ['PYCYPHAL_PATH'] = './common/pycyphal_generated'
     os.environ['UAVCAN__DIAGNOSTIC__SEVERITY'] = '2'
+    import common.dsdl as dsdl
+    dsdl.prepare(force=True)
     import pycyphal
-    import reg.udral.service.actuator.common
-    import reg.udral.service.common
-    import reg.udral.physics.electricity
-    import reg.udral.physics.dynamics.rotation
-    import reg.udral.physics.kinematics.rotation
-    import reg.udral.physics.kinematics.cartesian
-    import reg.udral.physics.kinematics.translation
-    import reg.udral.physics.kinematics.geodetic
-    import uavcan.node
-    import uavcan.time
-    import uavcan.si.unit.angle
-    import uavcan.si.unit.length
-    import uavcan.si.unit.angular_velocity
     import pycyphal.application
     import pycyphal.application.node_tracker
+    dsdl.check_imports()
 except Exception as e:
     error(f"Could not compile DSDL files in submodule ({e})")
 
@@ -2,10 +2,14 @@
 
 Simulate powering on components of UAV. Initilaizes onboard computer,
 clock, sensor hub, motor hub, and GPS unit.
+
+With -m, the onboard computer and the simulated components run in
+separate processes, so each gets its own core. They talk over UAVCAN.
 """
 
 import argparse
 import asyncio
+import multiprocessing
 
 import uav
 import xpio
@@ -18,11 +22,39 @@ async def main(graph: str | bool = False, print_: str | bool = False) -> None:
 
     await asyncio.gather(*tasks)
 
+def run_uav(graph: str | bool, print_: str | bool, skip: int) -> None:
+    uav.DEBUG_SKIP = skip # Not inherited by spawned processes
+    try:
+        asyncio.run(uav.main(graph=graph, print_=print_))
+    except KeyboardInterrupt:
+        pass
+
+def run_xpio() -> None:
+    try:
+        asyncio.run(xpio.main())
+    except KeyboardInterrupt:
+        pass
+
+def main_processes(graph: str | bool = False, print_: str | bool = False, skip: int = -1) -> None:
+    processes = [
+        multiprocessing.Process(target=run_xpio, name='xpio'),
+        multiprocessing.Process(target=run_uav, args=(graph, print_, skip), name='uav'),
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt: # Also delivered to the children, wait for them to close
+        for process in processes:
+            process.join()
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("-g", "--graph", nargs='?', default=False, const='rxdata.att.rollspeed', help="Attribute to graph")
-    parser.add_argument("-p", "--print", nargs='?', default=False, const='afcs._throttles', help="Attribute to print")
+    parser.add_argument("-p", "--print", nargs='?', default=False, const='afcs.control._throttles', help="Attribute to print")
     parser.add_argument("-s", "--skip", nargs='?', default='-1', const='0', help="Skip number of modes on startup")
+    parser.add_argument("-m", "--multiprocess", action='store_true', help="Run the UAV and simulator in separate processes")
     args = parser.parse_args()
 
     whitelisted = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._-[]")
@@ -36,7 +68,10 @@ if __name__ == '__main__':
     uav.DEBUG_SKIP = int(args.skip)
 
     try:
-        asyncio.run(main(args.graph, args.print))
+        if args.multiprocess:
+            main_processes(args.graph, args.print, uav.DEBUG_SKIP)
+        else:
+            asyncio.run(main(args.graph, args.print))
     except KeyboardInterrupt:
         pass
     except:
@@ -17,18 +17,19 @@ import logging
 import math
 import os
 import sys
+import time
 from configparser import ConfigParser
+from typing import Callable
 
 import numpy as np
 
+
 os.chdir(os.path.dirname(os.path.realpath(__file__)) + '/..')
 sys.path.append(os.getcwd())
-for var in os.environ:
-    if var.startswith('UAVCAN__'):
-        os.environ.pop(var)
-os.environ['CYPHAL_PATH'] = './common/public_regulated_data_types'
-os.environ['PYCYPHAL_PATH'] = './common/pycyphal_generated'
-os.environ['UAVCAN__DIAGNOSTIC__SEVERITY'] = '2'
+
+from common.profiler import StartupTimer
+startup = StartupTimer()
+
 os.environ['MAVLINK20'] = '1'
 os.environ['MAVLINK_DIALECT'] = 'common'
 
@@ -48,10 +49,13 @@ MAVLOG_TX = logging.DEBUG - 2
 MAVLOG_RX = logging.DEBUG - 1
 MAVLOG_LOG = logging.INFO + 1
 
-logger.warning("Generating UAVCAN files, please wait...")
+import common.dsdl as dsdl
+dsdl.prepare(logger=logger)
+startup.mark('dsdl')
 
 import pycyphal
 import reg.udral.service.actuator.common
+import reg.udral.service.actuator.common.sp
 import reg.udral.service.common
 import reg.udral.physics.electricity
 import reg.udral.physics.dynamics.rotation
@@ -70,11 +74,17 @@ from pymavlink import mavutil
 
 import common.grapher as grapher
 import common.image_processor as img
+import common.control as control
 from common.decorators import async_loop_decorator
-from common.pid import PID
+from common.history import History
+from common.profiler import StageProfiler
+from common.publish import PublishPolicy
+from common.registry import DIAGNOSTIC_SEVERITY, open_registry
+from common.schedule import GainSchedule
 from common.states import GlobalStates as g
 from common.states import NodeCommands
 from common.angles import quaternion_to_euler, euler_to_quaternion, gps_angles, calc_dyaw
+startup.mark('imports')
 
 m = mavutil.mavlink
 
@@ -86,7 +96,11 @@ db_config = ConfigParser()
 db_config.read('./common/_db_config.ini')
 
 DEFAULT_FREQ = 50
+AFCS_FREQ = 100
+NAVIGATOR_FREQ = 10
 HEARTBEAT_TIMEOUT = 2.0
+NODE_SWEEP_FREQ = 4
+HISTORY_SIZE = 256
 
 RPM_TO_RADS = math.pi/30
 KT_TO_MS = 0.514444
@@ -201,23 +215,47 @@ class StateManager:
 
 
 class RxBuffer:
-    """Store sensor data."""
+    """Store sensor data.
+
+    Each sensor keeps its latest sample as attributes and its last
+    samples in a History ring buffer (sensor.history) of FIELDS.
+
+    UAVCAN callbacks write into the back buffer of UAVCANManager, which
+    the AFCS takes whole at the top of each cycle (see
+    UAVCANManager.swap()), so a control cycle sees every sensor as of one
+    instant, with dt greater than zero only for sensors that have had a
+    new sample since the previous cycle.
+
+    Parameters
+    ----------
+    history : int, optional
+        Number of samples kept per sensor, by default HISTORY_SIZE. A
+        buffer with no history (0) only holds spare sensor records.
+    """
     class Time:
         """Store clock data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', '_last_time', 'dt', 'history')
+        FIELDS = ('time',)
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self._last_time = 0.0
             self.dt = 0.0
+            self.history = History(RxBuffer.Time.FIELDS, history) if history else None
         
         def dump(self, msg: uavcan.time.SynchronizedTimestamp_1) -> None:
             """Store data from a message."""
             self._last_time = self.time
             self.time = msg.microsecond
             self.dt = self.time - self._last_time
+            self.history.append((self.time,))
 
     class Att:
         """Store attitude data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'roll', 'pitch', 'yaw', 'rollspeed', 'pitchspeed', 'yawspeed', 'xspeed', 'yspeed', 'zspeed', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'roll', 'pitch', 'yaw', 'rollspeed', 'pitchspeed', 'yawspeed', 'xspeed', 'yspeed', 'zspeed')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.pitch = 0.0
             self.pitchspeed = 0.0
@@ -225,24 +263,16 @@ class RxBuffer:
             self.rollspeed = 0.0
             self.yaw = 0.0
             self.yawspeed = 0.0
+            self.xspeed = 0.0
+            self.yspeed = 0.0
+            self.zspeed = 0.0
             self._last_time = 0.0
             self.dt = 0.0
-            # self._last_pitch = 0.0
-            # self._last_pitchspeed = 0.0
-            # self._last_roll = 0.0
-            # self._last_rollspeed = 0.0
-            # self._last_yaw = 0.0
-            # self._last_yawspeed = 0.0
+            self.history = History(RxBuffer.Att.FIELDS, history) if history else None
 
         def dump(self, msg: reg.udral.physics.kinematics.cartesian.StateVarTs_0) -> None:
             """Store data from a message."""
             self._last_time = self.time
-            # self._last_pitch = self.pitch
-            # self._last_pitchspeed = self.pitchspeed
-            # self._last_roll = self.roll
-            # self._last_rollspeed = self.rollspeed
-            # self._last_yaw = self.yaw
-            # self._last_yawspeed = self.yawspeed
 
             self.time = msg.timestamp.microsecond
             self.roll, self.pitch, self.yaw = quaternion_to_euler(msg.value.pose.value.orientation.wxyz)
@@ -257,31 +287,37 @@ class RxBuffer:
             self.xspeed = -_nspeed*math.sin(self.yaw) + _espeed*math.cos(self.yaw)
             self.zspeed = -1*_dspeed
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.roll, self.pitch, self.yaw, self.rollspeed, self.pitchspeed, self.yawspeed, self.xspeed, self.yspeed, self.zspeed))
 
     class Alt:
         """Store altimeter data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'altitude', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'altitude')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.altitude = 0.0
 
             self._last_time = 0.0
             self.dt = 0.0
-            self._last_altitude = 0.0
-            self._last_vs = 0.0
+            self.history = History(RxBuffer.Alt.FIELDS, history) if history else None
 
         def dump(self, msg: uavcan.si.unit.length.WideScalar_1, time: 'RxBuffer.Time.time') -> None:
             """Store data from a message."""
             self._last_time = self.time
-            self._last_altitude = self.altitude
 
             self.time = time
             self.altitude = msg.meter
 
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.altitude))
 
     class Gps:
         """Store GPS data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'latitude', 'longitude', 'altitude', 'nspeed', 'espeed', 'dspeed', 'xspeed', 'yspeed', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'latitude', 'longitude', 'altitude', 'nspeed', 'espeed', 'dspeed', 'xspeed', 'yspeed')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.latitude = 41.688306
             self.longitude = -83.716114
@@ -295,22 +331,11 @@ class RxBuffer:
 
             self._last_time = 0.0
             self.dt = 0.0
-            # self._last_latitude = 0.0
-            # self._last_longitude = 0.0
-            # self._last_altitude = 0.0
-            # self._last_nspeed = 0.0
-            # self._last_espeed = 0.0
-            # self._last_dspeed = 0.0
+            self.history = History(RxBuffer.Gps.FIELDS, history) if history else None
 
         def dump(self, msg: reg.udral.physics.kinematics.geodetic.PointStateVarTs_0, heading: 'RxBuffer.Att.yaw') -> None:
             """Store data from a message."""
             self._last_time = self.time
-            # self._last_latitude = self.latitude
-            # self._last_longitude = self.longitude
-            # self._last_altitude = self.altitude
-            # self._last_nspeed = self.nspeed
-            # self._last_espeed = self.espeed
-            # self._last_dspeed = self.dspeed
 
             self.time = msg.timestamp.microsecond
             self.latitude = math.degrees(msg.value.position.value.latitude)
@@ -322,82 +347,106 @@ class RxBuffer:
             self.xspeed = self.nspeed*math.sin(heading) + self.espeed*math.cos(heading)
 
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.latitude, self.longitude, self.altitude, self.nspeed, self.espeed, self.dspeed, self.xspeed, self.yspeed))
 
     class Ias:
         """Store airspeed data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'ias', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'ias')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.ias = 0.0
 
             self._last_time = 0.0
             self.dt = 0.0
-            # self._last_ias = 0.0
+            self.history = History(RxBuffer.Ias.FIELDS, history) if history else None
 
         def dump(self, msg: reg.udral.physics.kinematics.translation.LinearTs_0) -> None:
             """Store data from a message."""
             self._last_time = self.time
-            # self._last_ias = self.ias
             
             self.time = msg.timestamp.microsecond
             self.ias = msg.value.velocity.meter_per_second
 
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.ias))
 
     class Aoa:
         """Store AOA data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'aoa', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'aoa')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.aoa = 0.0
 
             self._last_time = 0.0
             self.dt = 0.0
-            # self._last_aoa = 0.0
+            self.history = History(RxBuffer.Aoa.FIELDS, history) if history else None
 
         def dump(self, msg: uavcan.si.unit.angle.Scalar_1, time: 'RxBuffer.Time.time') -> None:
             """Store data from a message."""
             self._last_time = self.time
-            # self._last_aoa = self.aoa
             
             self.time = time
             self.aoa = msg.radian
 
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.aoa))
 
     class Cam:
         """Store CAM data."""
-        def __init__(self) -> None:
+        __slots__ = ('time', 'xdp', 'ydp', '_last_time', 'dt', 'history')
+        FIELDS = ('time', 'xdp', 'ydp')
+
+        def __init__(self, history: int = HISTORY_SIZE) -> None:
             self.time = 0.0
             self.xdp = 0.0
             self.ydp = 0.0
 
             self._last_time = 0.0
             self.dt = 0.0
-            # self._last_xdp = 0.0
-            # self._last_ydp = 0.0
+            self.history = History(RxBuffer.Cam.FIELDS, history) if history else None
 
         def dump(self, xdp: float, ydp: float, time: 'RxBuffer.Time.time') -> None:
             """Store data from a message."""
             self._last_time = self.time
-            # self._last_aoa = self.aoa
             
             self.time = time
             self.xdp = xdp
             self.ydp = ydp
 
             self.dt = self.time - self._last_time
+            self.history.append((self.time, self.xdp, self.ydp))
 
-    def __init__(self) -> None:
-        self.time = RxBuffer.Time()
-        self.att =  RxBuffer.Att()
-        self.alt =  RxBuffer.Alt()
-        self.gps =  RxBuffer.Gps()
-        self.ias =  RxBuffer.Ias()
-        self.aoa =  RxBuffer.Aoa()
-        self.cam =  RxBuffer.Cam()
+    __slots__ = ('time', 'att', 'alt', 'gps', 'ias', 'aoa', 'cam')
+    SENSORS = ('time', 'att', 'alt', 'gps', 'ias', 'aoa', 'cam')
+
+    def __init__(self, history: int = HISTORY_SIZE) -> None:
+        self.time = RxBuffer.Time(history)
+        self.att =  RxBuffer.Att(history)
+        self.alt =  RxBuffer.Alt(history)
+        self.gps =  RxBuffer.Gps(history)
+        self.ias =  RxBuffer.Ias(history)
+        self.aoa =  RxBuffer.Aoa(history)
+        self.cam =  RxBuffer.Cam(history)
 
 
 class TxBuffer:
-    """Store control data before publishing."""
+    """Store control data before publishing.
+
+    Each actuator has one preallocated message. Setters only update the
+    scalar at the bottom of it in place, so assigning setpoints every
+    AFCS cycle does not allocate new DSDL objects.
+
+    The same setpoints are also kept in one UDRAL Vector8 setpoint
+    (actuators), in the order of ACTUATORS, for publishing every
+    actuator in a single transfer. Values are in rad and rad/s like the
+    per-actuator messages, but the vector holds them as float16.
+    """
+    ACTUATORS = ('elevon1', 'elevon2', 'tilt', 'esc1', 'esc2', 'esc3', 'esc4')
+
     def __init__(self) -> None:
         self._servo_readiness = reg.udral.service.common.Readiness_0(
             reg.udral.service.common.Readiness_0.ENGAGED
@@ -407,52 +456,50 @@ class TxBuffer:
             reg.udral.service.common.Readiness_0.ENGAGED
         )
 
+        # Leaf scalars updated by the setters
+        self._elevon1_angle = uavcan.si.unit.angle.Scalar_1(0.0)
+        self._elevon2_angle = uavcan.si.unit.angle.Scalar_1(0.0)
+        self._tilt_angle = uavcan.si.unit.angle.Scalar_1(0.0)
+        self._esc1_speed = uavcan.si.unit.angular_velocity.Scalar_1(0.0)
+        self._esc2_speed = uavcan.si.unit.angular_velocity.Scalar_1(0.0)
+        self._esc3_speed = uavcan.si.unit.angular_velocity.Scalar_1(0.0)
+        self._esc4_speed = uavcan.si.unit.angular_velocity.Scalar_1(0.0)
+
+        self._actuators = reg.udral.service.actuator.common.sp.Vector8_0()
+        self._actuator_values = self._actuators.value
+
         self._elevon1 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(self._elevon1_angle),
             # torque
         )
 
         self._elevon2 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(self._elevon2_angle),
             # torque
         )
         
         self._tilt = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(self._tilt_angle),
             # torque
         )
         
         self._esc1 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(angular_velocity=self._esc1_speed),
             # torque
         )
         
         self._esc2 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(angular_velocity=self._esc2_speed),
             # torque
         )
         
         self._esc3 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(angular_velocity=self._esc3_speed),
             # torque
         )
         
         self._esc4 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(0.0)
-            ),
+            reg.udral.physics.kinematics.rotation.Planar_0(angular_velocity=self._esc4_speed),
             # torque
         )
 
@@ -465,6 +512,10 @@ class TxBuffer:
     def esc_readiness(self) -> reg.udral.service.common.Readiness_0:
         return self._servo_readiness
     
+    @property
+    def actuators(self) -> reg.udral.service.actuator.common.sp.Vector8_0:
+        return self._actuators
+
     @property
     def elevon1(self) -> reg.udral.physics.dynamics.rotation.Planar_0:
         return self._elevon1
@@ -500,7 +551,7 @@ class TxBuffer:
             reg.udral.service.common.Readiness_0.STANDBY,
             reg.udral.service.common.Readiness_0.SLEEP
         ]
-        self._servo_readiness = reg.udral.service.common.Readiness_0(value)
+        self._servo_readiness.value = value
     
     @esc_readiness.setter
     def esc_readiness(self, value: int) -> None:
@@ -509,75 +560,46 @@ class TxBuffer:
             reg.udral.service.common.Readiness_0.STANDBY,
             reg.udral.service.common.Readiness_0.SLEEP
         ]
-        self._esc_readiness = reg.udral.service.common.Readiness_0(value)
+        self._esc_readiness.value = value
 
     @elevon1.setter
     def elevon1(self, value: float) -> None:
-        self._elevon1 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(value)
-            )
-        )
+        self._elevon1_angle.radian = value
+        self._actuator_values[0] = value
 
     @elevon2.setter
     def elevon2(self, value: float) -> None:
-        self._elevon2 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(value)
-            )
-        )
+        self._elevon2_angle.radian = value
+        self._actuator_values[1] = value
 
     @tilt.setter
     def tilt(self, value: float) -> None:
-        self._tilt = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                uavcan.si.unit.angle.Scalar_1(value)
-            )
-        )
+        self._tilt_angle.radian = value
+        self._actuator_values[2] = value
 
     @esc1.setter
     def esc1(self, value: float) -> None:
         """Set ESC setpoint in RPM."""
-        self._esc1 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(
-                    value * RPM_TO_RADS
-                )
-            )
-        )
+        self._esc1_speed.radian_per_second = value * RPM_TO_RADS
+        self._actuator_values[3] = self._esc1_speed.radian_per_second
 
     @esc2.setter
     def esc2(self, value: float) -> None:
         """Set ESC setpoint in RPM."""
-        self._esc2 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(
-                    value * RPM_TO_RADS
-                )
-            )
-        )
+        self._esc2_speed.radian_per_second = value * RPM_TO_RADS
+        self._actuator_values[4] = self._esc2_speed.radian_per_second
 
     @esc3.setter
     def esc3(self, value: float) -> None:
         """Set ESC setpoint in RPM."""
-        self._esc3 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(
-                    value * RPM_TO_RADS
-                )
-            )
-        )
+        self._esc3_speed.radian_per_second = value * RPM_TO_RADS
+        self._actuator_values[5] = self._esc3_speed.radian_per_second
 
     @esc4.setter
     def esc4(self, value: float) -> None:
         """Set ESC setpoint in RPM."""
-        self._esc4 = reg.udral.physics.dynamics.rotation.Planar_0(
-            reg.udral.physics.kinematics.rotation.Planar_0(
-                angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(
-                    value * RPM_TO_RADS
-                )
-            )
-        )
+        self._esc4_speed.radian_per_second = value * RPM_TO_RADS
+        self._actuator_values[6] = self._esc4_speed.radian_per_second
 
 
 class UAVCANManager:
@@ -607,10 +629,45 @@ class UAVCANManager:
         Execute control logic and handle UAVCAN communication.
     close()
         Close the UAVCANManager node and release resources.
+    subscribe(name, handler)
+        Start receiving a port from PORTS.
+    publisher(name)
+        Get the publisher for a port from PORTS.
     """
 
+    # Subject name: (direction, type). The registry is built from this table,
+    # but a port is only opened by subscribe() or on its first publish.
+    PORTS = {
+        'clock_sync_time':      ('sub', uavcan.time.SynchronizedTimestamp_1),
+        'gps_sync_time':        ('sub', uavcan.time.SynchronizedTimestamp_1),
+        'inertial':             ('sub', reg.udral.physics.kinematics.cartesian.StateVarTs_0),
+        'altitude':             ('sub', uavcan.si.unit.length.WideScalar_1),
+        'ias':                  ('sub', reg.udral.physics.kinematics.translation.LinearTs_0),
+        'aoa':                  ('sub', uavcan.si.unit.angle.Scalar_1),
+        'gps':                  ('sub', reg.udral.physics.kinematics.geodetic.PointStateVarTs_0),
+
+        'servo_readiness':      ('pub', reg.udral.service.common.Readiness_0),
+        'esc_readiness':        ('pub', reg.udral.service.common.Readiness_0),
+        'actuator_sp':          ('pub', reg.udral.service.actuator.common.sp.Vector8_0),
+    }
+    for _actuator in TxBuffer.ACTUATORS:
+        PORTS.update({
+            f'{_actuator}_sp':          ('pub', reg.udral.physics.dynamics.rotation.Planar_0),
+            f'{_actuator}_feedback':    ('sub', reg.udral.service.actuator.common.Feedback_0),
+            f'{_actuator}_status':      ('sub', reg.udral.service.actuator.common.Status_0),
+            f'{_actuator}_power':       ('sub', reg.udral.physics.electricity.PowerTs_0),
+            f'{_actuator}_dynamics':    ('sub', reg.udral.physics.dynamics.rotation.PlanarTs_0),
+        })
+    del _actuator
+
     class NodeManager:
-        """Find node ids corresponding with critical components."""
+        """Find node ids corresponding with critical components.
+
+        Nodes are indexed by node-ID and by name, so routing a heartbeat
+        or a NodeTracker update is one dict lookup however many nodes are
+        on the bus. Nodes that stop sending heartbeats are marked stale by
+        sweep() without waiting for NodeTracker to drop them.
+        """
         MOTORHUB_NAME = 'fmuas.motorhub'
         SENSORHUB_NAME = 'fmuas.sensorhub'
         GPS_NAME = 'fmuas.gps'
@@ -618,15 +675,18 @@ class UAVCANManager:
 
         class Node:
             defaults = (0, pycyphal.application.node_tracker.Entry(uavcan.node.Heartbeat_1(), None).heartbeat)
-            def __init__(self) -> None:
+            def __init__(self, name: str = '') -> None:
                 self.id: int
                 self.heartbeat: uavcan.node.Heartbeat_1
+                self.name = name
                 self.active = asyncio.Event()
+                self.last_seen = 0.0 # time.monotonic of the last heartbeat
                 self.id, self.heartbeat = UAVCANManager.NodeManager.Node.defaults
 
             def set(self, heartbeat: uavcan.node.Heartbeat_1, id: int = None,) -> None:
                 self.id = id if id is not None else self.id
                 self.heartbeat = heartbeat
+                self.last_seen = time.monotonic()
                 self.active.set()
 
             def reset(self) -> None:
@@ -635,30 +695,32 @@ class UAVCANManager:
 
         def __init__(self, node: pycyphal.application.Node, config: ConfigParser | None = None) -> None:
             # If a config is passed, fixed node ids will be used.
-            self.clock = UAVCANManager.NodeManager.Node()
-            self.sensorhub = UAVCANManager.NodeManager.Node()
-            self.motorhub = UAVCANManager.NodeManager.Node()
-            self.gps = UAVCANManager.NodeManager.Node()
-            
+            self.clock = UAVCANManager.NodeManager.Node(UAVCANManager.NodeManager.CLOCK_NAME)
+            self.sensorhub = UAVCANManager.NodeManager.Node(UAVCANManager.NodeManager.SENSORHUB_NAME)
+            self.motorhub = UAVCANManager.NodeManager.Node(UAVCANManager.NodeManager.MOTORHUB_NAME)
+            self.gps = UAVCANManager.NodeManager.Node(UAVCANManager.NodeManager.GPS_NAME)
+
+            # Every component node by name, for iterating over all of them
+            self.nodes = {
+                'clock': self.clock,
+                'sensorhub': self.sensorhub,
+                'motorhub': self.motorhub,
+                'gps': self.gps,
+            }
+            self._by_name = {node.name.encode(): node for node in self.nodes.values()}
+            self._by_id: dict[int, UAVCANManager.NodeManager.Node] = {}
+
             if config:
-                self.clock.id = config.getint('node_ids', 'clock')
-                self.sensorhub.id = config.getint('node_ids', 'sensorhub')
-                self.motorhub.id = config.getint('node_ids', 'motorhub')
-                self.gps.id = config.getint('node_ids', 'gps')
-            
+                for name, component in self.nodes.items():
+                    self._assign(component, config.getint('node_ids', name))
+
             self.node = node
 
             self._sub_heartbeat = self.node.make_subscriber(uavcan.node.Heartbeat_1)
 
             def update_heartbeat(msg: uavcan.node.Heartbeat_1, info: pycyphal.transport.TransferFrom) -> None:
-                if info.source_node_id == self.clock.id:
-                    self.clock.set(msg)
-                elif info.source_node_id == self.sensorhub.id:
-                    self.sensorhub.set(msg)
-                elif info.source_node_id == self.motorhub.id:
-                    self.motorhub.set(msg)
-                elif info.source_node_id == self.gps.id:
-                    self.gps.set(msg)
+                if (node:=self._by_id.get(info.source_node_id)) is not None:
+                    node.set(msg)
             self._sub_heartbeat.receive_in_background(update_heartbeat)
 
         def update(self, id: int, old: pycyphal.application.node_tracker.Entry | None, new: pycyphal.application.node_tracker.Entry | None) -> None:
@@ -667,26 +729,104 @@ class UAVCANManager:
             elif new.info is not None: # node has info
                 self._update_values(id, new)
 
+        def sweep(self, timeout: float = HEARTBEAT_TIMEOUT) -> list[str]:
+            """Mark nodes without a heartbeat for timeout seconds inactive, returning the names newly marked."""
+            now = time.monotonic()
+            stale = []
+            for name, node in self.nodes.items():
+                if node.active.is_set() and now - node.last_seen > timeout:
+                    node.active.clear() # Keeps its id so a returning heartbeat reactivates it
+                    stale.append(name)
+            return stale
+
+        def _assign(self, node: 'UAVCANManager.NodeManager.Node', id: int) -> None:
+            if self._by_id.get(node.id) is node:
+                del self._by_id[node.id]
+            node.id = id
+            self._by_id[id] = node
+
         def _update_values(self, id: int, entry: pycyphal.application.node_tracker.Entry) -> None:
-            name = ''.join(chr(c) for c in entry.info.name)
-            if id==self.clock.id or name==UAVCANManager.NodeManager.CLOCK_NAME:
-                self.clock.set(entry.heartbeat, id)
-            elif id==self.sensorhub.id or name==UAVCANManager.NodeManager.SENSORHUB_NAME:
-                self.sensorhub.set(entry.heartbeat, id)
-            elif id==self.motorhub.id or name==UAVCANManager.NodeManager.MOTORHUB_NAME:
-                self.motorhub.set(entry.heartbeat, id)
-            elif id==self.gps.id or name==UAVCANManager.NodeManager.GPS_NAME:
-                self.gps.set(entry.heartbeat, id)
-        
+            node = self._by_id.get(id)
+            if node is None and (node:=self._by_name.get(entry.info.name.tobytes())) is None:
+                return
+            if node.id != id:
+                self._assign(node, id)
+            node.set(entry.heartbeat)
+
         def _destroy_values(self, id: int) -> None:
-            if id==self.clock.id:
-                self.clock.reset()
-            elif id==self.sensorhub.id:
-                self.sensorhub.reset()
-            elif id==self.motorhub.id:
-                self.motorhub.reset()
-            elif id==self.gps.id:
-                self.gps.reset()
+            if (node:=self._by_id.pop(id, None)) is not None:
+                node.reset()
+
+    class LifecycleManager:
+        """Send commands to every component node at once.
+
+        Commands go out to all nodes in a NodeManager together, so a
+        boot or shutdown takes as long as the slowest node instead of the
+        sum of all of them. Each request times out on its own and is
+        retried, and the outcome for every node is kept in a health table.
+
+        Parameters
+        ----------
+        node_manager : UAVCANManager.NodeManager
+            Nodes to command.
+        timeout : float, optional
+            Response timeout of each attempt in seconds, by default 1.0.
+        retries : int, optional
+            Attempts after the first one, by default 2.
+        """
+
+        class Health:
+            """Outcome of the last command sent to a node."""
+            __slots__ = ('command', 'status', 'attempts', 'latency')
+
+            def __init__(self) -> None:
+                self.command = ''
+                self.status = 'unknown' # 'ok', 'rejected' or 'timeout'
+                self.attempts = 0
+                self.latency = 0.0
+
+            def __str__(self) -> str:
+                return f"{self.command} {self.status} ({self.attempts} attempts, {self.latency*1e3:.0f} ms)"
+
+        def __init__(self, node_manager: 'UAVCANManager.NodeManager', timeout: float = 1.0, retries: int = 2) -> None:
+            self.node_manager = node_manager
+            self.timeout = timeout
+            self.retries = retries
+            self.health = {name: UAVCANManager.LifecycleManager.Health() for name in node_manager.nodes}
+
+        async def command(self, command: int, label: str, names: list[str] | None = None) -> bool:
+            """Send a command to the named nodes (all by default), returning whether all succeeded."""
+            names = list(self.node_manager.nodes) if names is None else names
+            results = await asyncio.gather(*(self._command(name, command, label) for name in names))
+            return all(results)
+
+        async def _command(self, name: str, command: int, label: str) -> bool:
+            health = self.health.setdefault(name, UAVCANManager.LifecycleManager.Health())
+            health.command, health.status, health.attempts = label, 'timeout', 0
+            start = time.monotonic()
+
+            client = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.nodes[name].id)
+            client.response_timeout = self.timeout
+            try:
+                for _ in range(self.retries + 1):
+                    health.attempts += 1
+                    response = await client.call(uavcan.node.ExecuteCommand_1.Request(command))
+                    if response is not None:
+                        success = response[0].status == uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS
+                        health.status = 'ok' if success else 'rejected'
+                        break
+            finally:
+                client.close()
+                health.latency = time.monotonic() - start
+
+            if health.status == 'ok':
+                logger.debug(f"{name.upper()} accepted {label} command")
+                return True
+            logger.error(f"{name.upper()} failed to respond to {label} command ({health.status})")
+            return False
+
+        def __str__(self) -> str:
+            return ', '.join(f"{name} {health}" for name, health in self.health.items())
 
     def __init__(self, main: 'Main', freq: int = DEFAULT_FREQ) -> None:
         """Initialize the UAVCANManager class.
@@ -704,82 +844,43 @@ class UAVCANManager:
         """
 
         self.main = main
-
-        if os.path.exists(f:='./'+self.main.config.get('db_files', 'uavmain')):
-            os.remove(f)
-            logger.debug(f"Removing preexisting {f}")
-        logger.debug(f"Compiling {f}")
-
-        _registry = pycyphal.application.make_registry(environment_variables={
-            'UAVCAN__NODE__ID'                      :db_config.get('node_ids', 'uavmain'),
-            'UAVCAN__UDP__IFACE'                    :db_config.get('main', 'udp'),
-
-            'UAVCAN__PUB__SERVO_READINESS__ID'      :db_config.get('subject_ids', 'servo_readiness'),
-            'UAVCAN__PUB__ESC_READINESS__ID'        :db_config.get('subject_ids', 'esc_readiness'),
-
-            'UAVCAN__PUB__ELEVON1_SP__ID'           :db_config.get('subject_ids', 'elevon1_sp'),
-            'UAVCAN__SUB__ELEVON1_FEEDBACK__ID'     :db_config.get('subject_ids', 'elevon1_feedback'),
-            'UAVCAN__SUB__ELEVON1_STATUS__ID'       :db_config.get('subject_ids', 'elevon1_status'),
-            'UAVCAN__SUB__ELEVON1_POWER__ID'        :db_config.get('subject_ids', 'elevon1_power'),
-            'UAVCAN__SUB__ELEVON1_DYNAMICS__ID'     :db_config.get('subject_ids', 'elevon1_dynamics'),
-
-            'UAVCAN__PUB__ELEVON2_SP__ID'           :db_config.get('subject_ids', 'elevon2_sp'),
-            'UAVCAN__SUB__ELEVON2_FEEDBACK__ID'     :db_config.get('subject_ids', 'elevon2_feedback'),
-            'UAVCAN__SUB__ELEVON2_STATUS__ID'       :db_config.get('subject_ids', 'elevon2_status'),
-            'UAVCAN__SUB__ELEVON2_POWER__ID'        :db_config.get('subject_ids', 'elevon2_power'),
-            'UAVCAN__SUB__ELEVON2_DYNAMICS__ID'     :db_config.get('subject_ids', 'elevon2_dynamics'),
-
-            'UAVCAN__PUB__TILT_SP__ID'              :db_config.get('subject_ids', 'tilt_sp'),
-            'UAVCAN__SUB__TILT_FEEDBACK__ID'        :db_config.get('subject_ids', 'tilt_feedback'),
-            'UAVCAN__SUB__TILT_STATUS__ID'          :db_config.get('subject_ids', 'tilt_status'),
-            'UAVCAN__SUB__TILT_POWER__ID'           :db_config.get('subject_ids', 'tilt_power'),
-            'UAVCAN__SUB__TILT_DYNAMICS__ID'        :db_config.get('subject_ids', 'tilt_dynamics'),
-
-            'UAVCAN__PUB__ESC1_SP__ID'              :db_config.get('subject_ids', 'esc1_sp'),
-            'UAVCAN__SUB__ESC1_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc1_feedback'),
-            'UAVCAN__SUB__ESC1_STATUS__ID'          :db_config.get('subject_ids', 'esc1_status'),
-            'UAVCAN__SUB__ESC1_POWER__ID'           :db_config.get('subject_ids', 'esc1_power'),
-            'UAVCAN__SUB__ESC1_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc1_dynamics'),
-
-            'UAVCAN__PUB__ESC2_SP__ID'              :db_config.get('subject_ids', 'esc2_sp'),
-            'UAVCAN__SUB__ESC2_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc2_feedback'),
-            'UAVCAN__SUB__ESC2_STATUS__ID'          :db_config.get('subject_ids', 'esc2_status'),
-            'UAVCAN__SUB__ESC2_POWER__ID'           :db_config.get('subject_ids', 'esc2_power'),
-            'UAVCAN__SUB__ESC2_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc2_dynamics'),
-
-            'UAVCAN__PUB__ESC3_SP__ID'              :db_config.get('subject_ids', 'esc3_sp'),
-            'UAVCAN__SUB__ESC3_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc3_feedback'),
-            'UAVCAN__SUB__ESC3_STATUS__ID'          :db_config.get('subject_ids', 'esc3_status'),
-            'UAVCAN__SUB__ESC3_POWER__ID'           :db_config.get('subject_ids', 'esc3_power'),
-            'UAVCAN__SUB__ESC3_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc3_dynamics'),
-
-            'UAVCAN__PUB__ESC4_SP__ID'              :db_config.get('subject_ids', 'esc4_sp'),
-            'UAVCAN__SUB__ESC4_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc4_feedback'),
-            'UAVCAN__SUB__ESC4_STATUS__ID'          :db_config.get('subject_ids', 'esc4_status'),
-            'UAVCAN__SUB__ESC4_POWER__ID'           :db_config.get('subject_ids', 'esc4_power'),
-            'UAVCAN__SUB__ESC4_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc4_dynamics'),
-
-            'UAVCAN__SUB__INERTIAL__ID'             :db_config.get('subject_ids', 'inertial'),
-            'UAVCAN__SUB__ALTITUDE__ID'             :db_config.get('subject_ids', 'altitude'),
-            'UAVCAN__SUB__IAS__ID'                  :db_config.get('subject_ids', 'ias'),
-            'UAVCAN__SUB__AOA__ID'                  :db_config.get('subject_ids', 'aoa'),
-            'UAVCAN__SUB__GPS__ID'                  :db_config.get('subject_ids', 'gps'),
-
-            'UAVCAN__SUB__CLOCK_SYNC_TIME__ID'      :db_config.get('subject_ids', 'clock_sync_time'),
-            'UAVCAN__SUB__GPS_SYNC_TIME__ID'        :db_config.get('subject_ids', 'gps_sync_time'),
-        })
-        
-        for var in os.environ:
-            if var.startswith('UAVCAN__'):
-                os.environ.pop(var)
-        for var, value in _registry.environment_variables.items():
-            assert isinstance(value, bytes)
-            os.environ[var] = value.decode('utf-8')
-
-
         self._freq = freq
         self._use_gps_time = False
+
+        self._vector_sp = self.main.config.get('uavcan', 'actuator_setpoints', fallback='planar') == 'vector'
+        if self._vector_sp:
+            logger.info("Publishing actuator setpoints as one vector")
+
+        # Unchanged readiness and setpoints are only republished as a keepalive
+        keepalive = self.main.config.getfloat('uavcan', 'publish_keepalive', fallback=0.1)
+        min_interval = self.main.config.getfloat('uavcan', 'publish_min_interval', fallback=0.0)
+        angle_deadband = self.main.config.getfloat('uavcan', 'angle_deadband', fallback=0.0005)
+        speed_deadband = self.main.config.getfloat('uavcan', 'speed_deadband', fallback=1.0)
+        self._policies = {
+            'servo_readiness':  PublishPolicy(0.0, keepalive, min_interval),
+            'esc_readiness':    PublishPolicy(0.0, keepalive, min_interval),
+            'actuator_sp':      PublishPolicy(np.array([angle_deadband]*3 + [speed_deadband]*4 + [0.0]), keepalive, min_interval),
+            'elevon1_sp':       PublishPolicy(angle_deadband, keepalive, min_interval),
+            'elevon2_sp':       PublishPolicy(angle_deadband, keepalive, min_interval),
+            'tilt_sp':          PublishPolicy(angle_deadband, keepalive, min_interval),
+            'esc1_sp':          PublishPolicy(speed_deadband, keepalive, min_interval),
+            'esc2_sp':          PublishPolicy(speed_deadband, keepalive, min_interval),
+            'esc3_sp':          PublishPolicy(speed_deadband, keepalive, min_interval),
+            'esc4_sp':          PublishPolicy(speed_deadband, keepalive, min_interval),
+        }
+
         self.boot = asyncio.Event()
+        self.sensor_update = asyncio.Event() # Set whenever a sensor the AFCS consumes delivers a sample
+
+        # Callbacks write into the back buffer (rxdata) and swap() publishes it to the AFCS.
+        # Both start out sharing every sensor record, each sensor has one spare record
+        self.rxdata = RxBuffer()
+        self._front = RxBuffer(history=0)
+        self._spares = RxBuffer(history=0)
+        for name in RxBuffer.SENSORS:
+            sensor = getattr(self.rxdata, name)
+            setattr(self._front, name, sensor)
+            getattr(self._spares, name).history = sensor.history
         
         logger.info("Initializing UAVCAN Node...")
 
@@ -788,115 +889,49 @@ class UAVCANManager:
             name=f'fmuas.uavmain{self.main.systemid}',
         )
 
-        self._registry = pycyphal.application.make_registry(self.main.config.get('db_files', 'uavmain'))
+        self._registry = open_registry(self.main.config.get('db_files', 'uavmain'), {
+            'uavcan.node.id'                        :db_config.getint('node_ids', 'uavmain'),
+            'uavcan.udp.iface'                      :db_config.get('main', 'udp'),
+            'uavcan.diagnostic.severity'            :DIAGNOSTIC_SEVERITY,
+        } | {
+            f'uavcan.{direction}.{name}.id': db_config.getint('subject_ids', name)
+            for name, (direction, _) in UAVCANManager.PORTS.items()
+        })
         self._node = pycyphal.application.make_node(node_info, self._registry)
 
         self.node_manager = UAVCANManager.NodeManager(self._node) # add config for fixed node ids
         self._tracker = pycyphal.application.node_tracker.NodeTracker(self._node)
         self._tracker.add_update_handler(self.node_manager.update)
+        self.lifecycle = UAVCANManager.LifecycleManager(
+            self.node_manager,
+            timeout=self.main.config.getfloat('uavcan', 'command_timeout', fallback=1.0),
+            retries=self.main.config.getint('uavcan', 'command_retries', fallback=2),
+        )
 
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.INITIALIZATION
         self._node.heartbeat_publisher.vendor_specific_status_code = os.getpid() % 100
         
-        self._sub_ins = self._node.make_subscriber(reg.udral.physics.kinematics.cartesian.StateVarTs_0, 'inertial')
-        self._sub_alt = self._node.make_subscriber(uavcan.si.unit.length.WideScalar_1, 'altitude')
-        self._sub_ias = self._node.make_subscriber(reg.udral.physics.kinematics.translation.LinearTs_0, 'ias')
-        self._sub_aoa = self._node.make_subscriber(uavcan.si.unit.angle.Scalar_1, 'aoa')
-        self._sub_gps = self._node.make_subscriber(reg.udral.physics.kinematics.geodetic.PointStateVarTs_0, 'gps')
-
-        self._pub_servo_readiness = self._node.make_publisher(reg.udral.service.common.Readiness_0, 'servo_readiness')
-        self._pub_esc_readiness = self._node.make_publisher(reg.udral.service.common.Readiness_0, 'esc_readiness')
-
-        self._pub_elevon1_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'elevon1_sp')
-        self._sub_elevon1_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'elevon1_feedback')
-        self._sub_elevon1_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'elevon1_status')
-        self._sub_elevon1_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'elevon1_power')
-        self._sub_elevon1_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'elevon1_dynamics')
-
-        self._pub_elevon2_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'elevon2_sp')
-        self._sub_elevon2_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'elevon2_feedback')
-        self._sub_elevon2_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'elevon2_status')
-        self._sub_elevon2_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'elevon2_power')
-        self._sub_elevon2_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'elevon2_dynamics')
-
-        self._pub_tilt_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'tilt_sp')
-        self._sub_tilt_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'tilt_feedback')
-        self._sub_tilt_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'tilt_status')
-        self._sub_tilt_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'tilt_power')
-        self._sub_tilt_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'tilt_dynamics')
-
-        self._pub_esc1_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'esc1_sp')
-        self._sub_esc1_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'esc1_feedback')
-        self._sub_esc1_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'esc1_status')
-        self._sub_esc1_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'esc1_power')
-        self._sub_esc1_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'esc1_dynamics')
-
-        self._pub_esc2_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'esc2_sp')
-        self._sub_esc2_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'esc2_feedback')
-        self._sub_esc2_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'esc2_status')
-        self._sub_esc2_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'esc2_power')
-        self._sub_esc2_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'esc2_dynamics')
-
-        self._pub_esc3_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'esc3_sp')
-        self._sub_esc3_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'esc3_feedback')
-        self._sub_esc3_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'esc3_status')
-        self._sub_esc3_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'esc3_power')
-        self._sub_esc3_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'esc3_dynamics')
-
-        self._pub_esc4_sp = self._node.make_publisher(reg.udral.physics.dynamics.rotation.Planar_0, 'esc4_sp')
-        self._sub_esc4_feedback = self._node.make_subscriber(reg.udral.service.actuator.common.Feedback_0, 'esc4_feedback')
-        self._sub_esc4_status = self._node.make_subscriber(reg.udral.service.actuator.common.Status_0, 'esc4_status')
-        self._sub_esc4_power = self._node.make_subscriber(reg.udral.physics.electricity.PowerTs_0, 'esc4_power')
-        self._sub_esc4_dynamics = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.PlanarTs_0, 'esc4_dynamics')
-
-        self._sub_clock_sync_time = self._node.make_subscriber(uavcan.time.SynchronizedTimestamp_1, 'clock_sync_time')
-        self._sub_clock_sync_time_last = self._node.make_subscriber(uavcan.time.Synchronization_1)
-
-        self._sub_gps_sync_time = self._node.make_subscriber(uavcan.time.SynchronizedTimestamp_1, 'gps_sync_time')
-        self._sub_gps_sync_time_last = self._node.make_subscriber(uavcan.time.Synchronization_1)
-
         self._srv_exec_cmd = self._node.get_server(uavcan.node.ExecuteCommand_1)
 
-        # TODO: Only DECLARE (DECLARING SEPERATELY CAUSES MEM LEAK!!!) and start subs at boot
-        self._sub_clock_sync_time.receive_in_background(self._on_time)
-        self._sub_gps_sync_time.receive_in_background(self._on_gps_time)
-        self._sub_ins.receive_in_background(self._on_att)
-        self._sub_alt.receive_in_background(self._on_alt)
-        self._sub_gps.receive_in_background(self._on_gps)
-        self._sub_ias.receive_in_background(self._on_ias)
-        self._sub_aoa.receive_in_background(self._on_aoa)
-
-        self._sub_elevon1_status.receive_in_background(self._on_srv_status)
-        self._sub_elevon2_status.receive_in_background(self._on_srv_status)
-        self._sub_tilt_status.receive_in_background(self._on_esc_status)
-        self._sub_esc1_status.receive_in_background(self._on_esc_status)
-        self._sub_esc2_status.receive_in_background(self._on_esc_status)
-        self._sub_esc3_status.receive_in_background(self._on_esc_status)
-        self._sub_esc4_status.receive_in_background(self._on_esc_status)
-        
-        self._sub_elevon1_feedback.receive_in_background(self._void_handler)
-        self._sub_elevon1_power.receive_in_background(self._void_handler)
-        self._sub_elevon1_dynamics.receive_in_background(self._void_handler)
-        self._sub_elevon2_feedback.receive_in_background(self._void_handler)
-        self._sub_elevon2_power.receive_in_background(self._void_handler)
-        self._sub_elevon2_dynamics.receive_in_background(self._void_handler)
-        self._sub_tilt_feedback.receive_in_background(self._void_handler)
-        self._sub_tilt_power.receive_in_background(self._void_handler)
-        self._sub_tilt_dynamics.receive_in_background(self._void_handler)
-        self._sub_esc1_feedback.receive_in_background(self._void_handler)
-        self._sub_esc1_power.receive_in_background(self._void_handler)
-        self._sub_esc1_dynamics.receive_in_background(self._void_handler)
-        self._sub_esc2_feedback.receive_in_background(self._void_handler)
-        self._sub_esc2_power.receive_in_background(self._void_handler)
-        self._sub_esc2_dynamics.receive_in_background(self._void_handler)
-        self._sub_esc3_feedback.receive_in_background(self._void_handler)
-        self._sub_esc3_power.receive_in_background(self._void_handler)
-        self._sub_esc3_dynamics.receive_in_background(self._void_handler)
-        self._sub_esc4_feedback.receive_in_background(self._void_handler)
-        self._sub_esc4_power.receive_in_background(self._void_handler)
-        self._sub_esc4_dynamics.receive_in_background(self._void_handler)
-        self._sub_clock_sync_time_last.receive_in_background(self._void_handler)
-        self._sub_gps_sync_time_last.receive_in_background(self._void_handler)
+        self._publishers: dict[str, pycyphal.presentation.Publisher] = {}
+        self._subscribers: dict[str, pycyphal.presentation.Subscriber] = {}
+
+        # Feedback, power and dynamics have no consumer, so those ports stay closed
+        self.subscribe('clock_sync_time', self._on_time)
+        self.subscribe('gps_sync_time', self._on_gps_time)
+        self.subscribe('inertial', self._on_att)
+        self.subscribe('altitude', self._on_alt)
+        self.subscribe('gps', self._on_gps)
+        self.subscribe('ias', self._on_ias)
+        self.subscribe('aoa', self._on_aoa)
+
+        self.subscribe('elevon1_status', self._on_srv_status)
+        self.subscribe('elevon2_status', self._on_srv_status)
+        self.subscribe('tilt_status', self._on_esc_status)
+        self.subscribe('esc1_status', self._on_esc_status)
+        self.subscribe('esc2_status', self._on_esc_status)
+        self.subscribe('esc3_status', self._on_esc_status)
+        self.subscribe('esc4_status', self._on_esc_status)
 
         self._srv_exec_cmd.serve_in_background(self._serve_exec_cmd)
 
@@ -904,6 +939,22 @@ class UAVCANManager:
 
         logger.info("UAVCANManager initialized")
 
+    def subscribe(self, name: str, handler: Callable) -> None:
+        """Open the subscriber for a port in PORTS and pass its messages to handler."""
+        direction, dtype = UAVCANManager.PORTS[name]
+        assert direction == 'sub', f"{name} is not a subscription"
+        assert name not in self._subscribers, f"{name} already has a handler"
+        self._subscribers[name] = self._node.make_subscriber(dtype, name)
+        self._subscribers[name].receive_in_background(handler)
+
+    def publisher(self, name: str) -> pycyphal.presentation.Publisher:
+        """Return the publisher for a port in PORTS, opening it on first use."""
+        if (publisher:=self._publishers.get(name)) is None:
+            direction, dtype = UAVCANManager.PORTS[name]
+            assert direction == 'pub', f"{name} is not a publication"
+            publisher = self._publishers[name] = self._node.make_publisher(dtype, name)
+        return publisher
+
     async def _serve_exec_cmd(
             self,
             request: uavcan.node.ExecuteCommand_1.Request, 
@@ -944,97 +995,119 @@ class UAVCANManager:
         """Perform boot-related tasks."""
         # TODO: do boot stuff here, maybe read a different .ini?
         logger.info("Waiting for components...")
-        tasks = [
-            asyncio.create_task(self.node_manager.clock.active.wait()),
-            asyncio.create_task(self.node_manager.sensorhub.active.wait()),
-            asyncio.create_task(self.node_manager.motorhub.active.wait()),
-            asyncio.create_task(self.node_manager.gps.active.wait()),
-        ]
-        await asyncio.gather(*tasks)
+        await asyncio.gather(*(node.active.wait() for node in self.node_manager.nodes.values()))
         logger.info("All components discovered")
 
-        cln_clock_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.clock.id)
-        clock_response = await cln_clock_cmd.call(uavcan.node.ExecuteCommand_1.Request(NodeCommands.BOOT))
-        if clock_response is None:
-            logger.error("CLOCK failed to respond to boot command")
-        elif clock_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("CLOCK failed to respond to boot command")
-        else:
-            logger.debug("CLOCK powered off")
-
-        cln_sensorhub_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.sensorhub.id)
-        sensorhub_response = await cln_sensorhub_cmd.call(uavcan.node.ExecuteCommand_1.Request(NodeCommands.BOOT))
-        if sensorhub_response is None:
-            logger.error("SENSORHUB failed to respond to boot command")
-        elif sensorhub_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("SENSORHUB failed to respond to boot command")
-        else:
-            logger.debug("SENSORHUB powered off")
-
-        cln_motorhub_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.motorhub.id)
-        motorhub_response = await cln_motorhub_cmd.call(uavcan.node.ExecuteCommand_1.Request(NodeCommands.BOOT))
-        if motorhub_response is None:
-            logger.error("MOTORHUB failed to respond to boot command")
-        elif motorhub_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("MOTORHUB failed to respond to boot command")
-        else:
-            logger.debug("MOTORHUB powered off")
-
-        cln_gps_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.gps.id)
-        gps_response = await cln_gps_cmd.call(uavcan.node.ExecuteCommand_1.Request(NodeCommands.BOOT))
-        if gps_response is None:
-            logger.error("GPS failed to respond to boot command")
-        elif gps_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("GPS failed to respond to boot command")
-        else:
-            logger.debug("GPS powered off")
+        await self.lifecycle.command(NodeCommands.BOOT, 'boot')
+        logger.info(f"Component boot: {self.lifecycle}")
 
         self.boot.set()
 
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _mainio_run_loop(self) -> None:
+        now = time.monotonic()
+        tx = self.main.txdata
         try:
-            await self._pub_servo_readiness.publish(self.main.txdata.servo_readiness)
-            await self._pub_esc_readiness.publish(self.main.txdata.esc_readiness)
+            await self._publish('servo_readiness', tx.servo_readiness, tx.servo_readiness.value, now)
+            await self._publish('esc_readiness', tx.esc_readiness, tx.esc_readiness.value, now)
 
-            await self._pub_elevon1_sp.publish(self.main.txdata.elevon1)
-            await self._pub_elevon2_sp.publish(self.main.txdata.elevon2)
-            await self._pub_tilt_sp.publish(self.main.txdata.tilt)
-
-            await self._pub_esc1_sp.publish(self.main.txdata.esc1)
-            await self._pub_esc2_sp.publish(self.main.txdata.esc2)
-            await self._pub_esc3_sp.publish(self.main.txdata.esc3)
-            await self._pub_esc4_sp.publish(self.main.txdata.esc4)
+            if self._vector_sp:
+                # One transfer, so every actuator gets the same cycle's setpoints
+                await self._publish('actuator_sp', tx.actuators, tx.actuators.value, now)
+            else:
+                await self._publish('elevon1_sp', tx.elevon1, tx.elevon1.kinematics.angular_position.radian, now)
+                await self._publish('elevon2_sp', tx.elevon2, tx.elevon2.kinematics.angular_position.radian, now)
+                await self._publish('tilt_sp', tx.tilt, tx.tilt.kinematics.angular_position.radian, now)
+
+                await self._publish('esc1_sp', tx.esc1, tx.esc1.kinematics.angular_velocity.radian_per_second, now)
+                await self._publish('esc2_sp', tx.esc2, tx.esc2.kinematics.angular_velocity.radian_per_second, now)
+                await self._publish('esc3_sp', tx.esc3, tx.esc3.kinematics.angular_velocity.radian_per_second, now)
+                await self._publish('esc4_sp', tx.esc4, tx.esc4.kinematics.angular_velocity.radian_per_second, now)
         except pycyphal.presentation._port._error.PortClosedError:
             pass
 
-        await asyncio.sleep(1 / self._freq)
+    @async_loop_decorator(freq=NODE_SWEEP_FREQ)
+    async def _node_sweep_loop(self) -> None:
+        for name in self.node_manager.sweep():
+            logger.warning(f"{name.upper()} heartbeat timed out")
+
+    async def _publish(self, subject: str, msg, value: float | np.ndarray, now: float) -> None:
+        """Publish msg if the subject's PublishPolicy passes value."""
+        if self._policies[subject].check(value, now):
+            await self.publisher(subject).publish(msg)
+
+    def bus_load(self) -> str:
+        """Summarize published and suppressed transfers per subject."""
+        sent = sum(policy.sent for policy in self._policies.values())
+        offered = sum(policy.offered for policy in self._policies.values())
+        subjects = ', '.join(f"{subject} {policy}" for subject, policy in self._policies.items() if policy.offered)
+        return f"{sent}/{offered} transfers sent ({subjects})"
+
+    def sensor(self, name: str) -> object:
+        """Get the back buffer record of a sensor to dump a new sample into.
+
+        A record still shared with the buffer published to the AFCS is
+        never written. It is replaced in the back buffer by the spare
+        record of that sensor, which takes the new sample.
+        """
+        sensor = getattr(self.rxdata, name)
+        if sensor is getattr(self._front, name):
+            spare = getattr(self._spares, name)
+            spare.time = sensor.time # dump() measures dt from the previous sample
+            setattr(self.rxdata, name, spare)
+            return spare
+        return sensor
+
+    def swap(self) -> RxBuffer:
+        """Publish the back buffer to the AFCS and start the next one.
+
+        The published buffer is not written again. Sensors that have had
+        no new sample since the previous swap are published with dt 0.
+        The new back buffer shares every sensor record with the published
+        one until a callback writes to it (see sensor()), so no sample is
+        copied.
+        """
+        front, back = self.rxdata, self._front
+        for name in RxBuffer.SENSORS:
+            sensor = getattr(front, name)
+            previous = getattr(back, name)
+            if sensor is previous:
+                sensor.dt = 0.0
+            else:
+                setattr(self._spares, name, previous) # The AFCS is done with it
+            setattr(back, name, sensor)
+        self._front, self.rxdata = front, back
+        return front
 
     #region Subscriptions
     def _on_time(self, msg: uavcan.time.SynchronizedTimestamp_1, _: pycyphal.transport.TransferFrom) -> None:
-        self.main.rxdata.time.dump(msg)
+        self.sensor('time').dump(msg)
 
     def _on_gps_time(self, msg: uavcan.time.SynchronizedTimestamp_1, _: pycyphal.transport.TransferFrom) -> None:
         # TODO: gps time transition
         if self._use_gps_time:
-            self.main.rxdata.time.dump(msg)
+            self.sensor('time').dump(msg)
     
     def _on_att(self, msg: reg.udral.physics.kinematics.cartesian.StateVarTs_0, _: pycyphal.transport.TransferFrom) -> None:
-        self.main.rxdata.att.dump(msg)
+        self.sensor('att').dump(msg)
+        self.sensor_update.set()
 
     def _on_alt(self, msg: uavcan.si.unit.length.WideScalar_1, _: pycyphal.transport.TransferFrom) -> None:
-        t = self.main.rxdata.time.time
-        self.main.rxdata.alt.dump(msg, t)
+        t = self.rxdata.time.time
+        self.sensor('alt').dump(msg, t)
+        self.sensor_update.set()
 
     def _on_gps(self, msg: reg.udral.physics.kinematics.geodetic.PointStateVarTs_0, _: pycyphal.transport.TransferFrom) -> None:
-        self.main.rxdata.gps.dump(msg, self.main.rxdata.att.yaw)
+        self.sensor('gps').dump(msg, self.rxdata.att.yaw)
 
     def _on_ias(self, msg: reg.udral.physics.kinematics.translation.LinearTs_0, _: pycyphal.transport.TransferFrom) -> None:
-        self.main.rxdata.ias.dump(msg)
+        self.sensor('ias').dump(msg)
+        self.sensor_update.set()
 
     def _on_aoa(self, msg: uavcan.si.unit.angle.Scalar_1, _: pycyphal.transport.TransferFrom) -> None:
-        t = self.main.rxdata.time.time
-        self.main.rxdata.aoa.dump(msg, t)
+        t = self.rxdata.time.time
+        self.sensor('aoa').dump(msg, t)
+        self.sensor_update.set()
 
     def _on_srv_status(self, msg: reg.udral.service.actuator.common.Status_0, _: pycyphal.transport.TransferFrom) -> None:
         if any(
@@ -1073,8 +1146,6 @@ class UAVCANManager:
 
     
     # TODO: other subscribers
-    def _void_handler(self, msg, _: pycyphal.transport.TransferFrom) -> None:
-        pass
     #endregion
         
     async def run(self) -> None:
@@ -1082,48 +1153,19 @@ class UAVCANManager:
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.OPERATIONAL
         logger.warning("UAVCAN Node Running...\n----- Ctrl-C to exit -----")
 
-        await self._mainio_run_loop()
+        await asyncio.gather(
+            self._mainio_run_loop(),
+            self._node_sweep_loop(),
+        )
 
     async def close(self) -> None:
         """Close the instance."""
         logger.info("Closing UAVCANManager...") # TODO: Change to logger.debug()
 
-        cln_clock_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.clock.id)
-        clock_response = await cln_clock_cmd.call(uavcan.node.ExecuteCommand_1.Request(uavcan.node.ExecuteCommand_1.Request.COMMAND_POWER_OFF))
-        if clock_response is None:
-            logger.error("CLOCK failed to respond to power off request")
-        elif clock_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("CLOCK failed to respond to power off request")
-        else:
-            logger.debug("CLOCK powered off")
-
-        cln_sensorhub_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.sensorhub.id)
-        sensorhub_response = await cln_sensorhub_cmd.call(uavcan.node.ExecuteCommand_1.Request(uavcan.node.ExecuteCommand_1.Request.COMMAND_POWER_OFF))
-        if sensorhub_response is None:
-            logger.error("SENSORHUB failed to respond to power off request")
-        elif sensorhub_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("SENSORHUB failed to respond to power off request")
-        else:
-            logger.debug("SENSORHUB powered off")
-
-        cln_motorhub_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.motorhub.id)
-        motorhub_response = await cln_motorhub_cmd.call(uavcan.node.ExecuteCommand_1.Request(uavcan.node.ExecuteCommand_1.Request.COMMAND_POWER_OFF))
-        if motorhub_response is None:
-            logger.error("MOTORHUB failed to respond to power off request")
-        elif motorhub_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("MOTORHUB failed to respond to power off request")
-        else:
-            logger.debug("MOTORHUB powered off")
-
-        cln_gps_cmd = self.node_manager.node.make_client(uavcan.node.ExecuteCommand_1, self.node_manager.gps.id)
-        gps_response = await cln_gps_cmd.call(uavcan.node.ExecuteCommand_1.Request(uavcan.node.ExecuteCommand_1.Request.COMMAND_POWER_OFF))
-        if gps_response is None:
-            logger.error("GPS failed to respond to power off request")
-        elif gps_response[0].status != uavcan.node.ExecuteCommand_1.Response.STATUS_SUCCESS:
-            logger.error("GPS failed to respond to power off request")
-        else:
-            logger.debug("GPS powered off")
+        await self.lifecycle.command(uavcan.node.ExecuteCommand_1.Request.COMMAND_POWER_OFF, 'power off')
+        logger.info(f"Component shutdown: {self.lifecycle}")
 
+        logger.info(f"UAVCAN publish: {self.bus_load()}")
         self._node.close()
 
 
@@ -1140,19 +1182,22 @@ class Navigator:
             Navigator.Waypoint.count += 1
             self.name = name if name is not None else f"Waypoint {Navigator.Waypoint.count}"
 
-    def __init__(self, main: 'Main') -> None:
+    def __init__(self, main: 'Main', freq: int = NAVIGATOR_FREQ) -> None:
         """Initializes the Navigator class.
 
         Parameters
         ----------
         main : 'Main'
             The main object.
+        freq : int, optional
+            Navigation update rate in Hz, by default NAVIGATOR_FREQ.
         """
 
         self.main = main
+        self._freq = freq
         self._waypoint_list: list[Navigator.Waypoint] = [] # Navigating from waypoint 0 to waypoint 1
         self.commanded_heading = 0.0 # DEGREES
-        self.commanded_altitude = self.main.afcs._sp_altitude
+        self.commanded_altitude = self.main.afcs.setpoints.altitude
         self.distance = 0.0
 
         self.boot = asyncio.Event()
@@ -1200,7 +1245,7 @@ class Navigator:
     def _calc_altitude(self) -> float:
         """Determine the desired altitude from the next waypoint."""
         if len(self._waypoint_list)>1:
-            self.commanded_altitude = self._waypoint_list[1].altitude if self._waypoint_list[1].altitude is not None else self.main.afcs._sp_altitude
+            self.commanded_altitude = self._waypoint_list[1].altitude if self._waypoint_list[1].altitude is not None else self.main.afcs.setpoints.altitude
         else:
             # TODO
             pass
@@ -1210,7 +1255,7 @@ class Navigator:
         if self.distance<100 and self.main.state.custom_submode==g.CUSTOM_SUBMODE_FLIGHT_NORMAL:
             self.next_wpt()
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq='_freq')
     async def _navigator_run_loop(self) -> None:
         """Set afcs setpoints based on flight plan."""
         # TODO: navigator modes, safety checks
@@ -1225,7 +1270,6 @@ class Navigator:
         self.commanded_heading = math.radians(hdg)
         self._calc_altitude()
         self._detect_change()
-        await asyncio.sleep(0.1)
 
     async def run(self) -> None:
         """Calculate desired heading from flight plan."""
@@ -1236,449 +1280,162 @@ class Navigator:
 class AFCS:
     """Manages various calculations and controls for the system.
 
-    This class handles the calculation of servo commands and throttle 
-    outputs based on sensor data and control setpoints.
+    This class runs the control laws of common.control on live sensor
+    data, fills their setpoints from the Navigator, applies the mode
+    changes they request and writes their outputs to the TxBuffer.
 
     Attributes
     ----------
     main : 'Main'
         The main object representing the core of the system.
-    spf_altitude : float
-        Setpoint for altitude in meters.
-    spf_heading : float
-        Setpoint for heading in radians.
-    spf_ias : float
-        Setpoint for indicated airspeed.
+    control : ControlState
+        Controllers and internal variables of the control laws.
+    setpoints : Setpoints
+        Altitude (m), heading (rad) and indicated airspeed setpoints.
 
     Methods
     -------
     boot(self)
         Initialize and perform boot-related tasks.
-    _flight_servos(self)
-        Calculate flight servo commands.
-    _vtol_servos(self)
-        Calculate VTOL servo commands.
-    _flight_throttles(self)
-        Calculate flight throttle outputs.
-    _vtol_throttles(self)
-        Calculate VTOL throttle outputs.
     run(self)
         Run the AFCS and execute control logic.
     """
 
-    MAX_THROTTLE = 14000
-    BASE_THROTTLE_PCT = 0.4
+    MAX_THROTTLE = control.MAX_THROTTLE
 
-    def __init__(self, main: 'Main') -> None:
+    def __init__(self, main: 'Main', freq: int = AFCS_FREQ) -> None:
         """Initialize the AFCS class.
 
         Parameters
         ----------
         main : 'Main'
             The main object.
+        freq : int, optional
+            Control loop rate in Hz, by default AFCS_FREQ.
         """
 
         self.main = main
         self.boot = asyncio.Event()
+        self._freq = freq
 
-        self._vpath = 0.0
-        self._dyaw = 0.0
-        self._ias_scalar = 1.0
-        self._vtol_ratio = 1.0
-
-        self._servos: np.ndarray = np.zeros(3, dtype=np.float16)
-        self._throttles: np.ndarray = np.zeros(4, dtype=np.float16)
+        # 'timer' runs at a fixed rate, 'sensor' runs once per fresh sample
+        self._trigger = self.main.config.get('afcs', 'trigger', fallback='timer')
+        self._sensor_timeout = self.main.config.getfloat('afcs', 'sensor_timeout', fallback=2/freq)
+        self.sensor_timeouts = 0
+        assert self._trigger in ('timer', 'sensor'), "AFCS trigger in config file must be 'timer' or 'sensor'"
 
-        self._fservos = np.zeros(3, dtype=np.float16) # elevons*2, rudder, wingtilt
-        self._vservos = np.zeros(3, dtype=np.float16)
+        self.rxdata = None # Sensor data the last cycle used, published by UAVCANManager.swap()
 
-        self._fthrottles = np.zeros(4, dtype=np.float16) # throttles*4
-        self._vthrottles = np.zeros(4, dtype=np.float16)
+        self.control = control.ControlState(
+            inner_divider=self.main.config.getint('afcs', 'inner_divider', fallback=1),
+            outer_divider=self.main.config.getint('afcs', 'outer_divider', fallback=2),
+            schedule=GainSchedule.load(self.main.config.get('afcs', 'gain_schedule', fallback=control.GAIN_SCHEDULE))
+        )
+        self.setpoints = control.Setpoints()
 
         self.auto_alt = True
         self.auto_ias = True
 
-        self._spf_ias = 40.0
-        self._sp_altitude = 100.0
-        self._sp_heading = 0.0
-
-        self._spf_vpath = 0.0
-        self._spf_aoa = 0.1
-        self._spf_roll = 0.0
-        self._spf_rollspeed = 0.0
-
-        self._spv_xspeed = 0.0
-        self._spv_yspeed = 0.0
-        self._spv_pitchspeed = 0.0
-        self._spv_rollspeed = 0.0
-        self._spv_pitch = 0.0
-        self._spv_roll = 0.0
-        self._spv_yawspeed = 0.0
-        self._spv_vs = 0.0
-
-        self._outf_pitch = 0.0
-        self._outf_roll = 0.0
-        self._outf_throttle_ias = 0.0
-        self._throttle_roll_corr = 0.0
-        self._throttle_vpa_corr = 0.0
-
-        self._outv_pitch = 0.0
-        self._outv_roll = 0.0
-        self._outv_yaw = 0.0
-        self._outv_throttle = 0.0
-        self._outv_thr_mode = 0 # 0-settle 1-hover 2-launch
-
-        self._ftilt = math.pi/2
-        self._rtilt = math.pi/2
-        self._last_tilt = 0.0
-        self._outt_pitch = 0.0
-
-        # self._pid{f or v}_{from}_{to}
-
-        self._pidf_alt_vpa = PID(kp=0.007, ti=0.006, td=0.1, integral_limit=0.05, maximum=0.15, minimum=-0.2)
-        self._pidf_vpa_aoa = PID(kp=0.7, ti=3.0, td=0.05, integral_limit=0.3, maximum=math.pi/6, minimum=0.02)
-        self._pidf_vpa_thr = PID(kp=0.15, ti=0.003, td=0.0, integral_limit=0.5, maximum=0.25, minimum=0.0)
-        self._pidf_aoa_out = PID(kp=-0.10, ti=-0.008, td=0.02, integral_limit=2.5, maximum=0.2, minimum=-0.2)
-        self._pidf_dyw_rol = PID(kp=-0.75, ti=-8.0, td=0.002, integral_limit=0.1, maximum=math.pi/6, minimum=-math.pi/6)
-        self._pidf_rol_rls = PID(kp=1.5, ti=6.0, td=0.02, integral_limit=0.2, maximum=2.0, minimum=-2.0)
-        self._pidf_rls_out = PID(kp=0.005, ti=0.003, td=0.005, integral_limit=0.1, maximum=0.1, minimum=-0.1)
-        self._pidf_ias_thr = PID(kp=0.08, ti=4.0, td=0.1, integral_limit=1.0, maximum=(1-AFCS.BASE_THROTTLE_PCT), minimum=0.0) # TODO
-
-        self._pidv_xdp_xsp = PID(kp=0.0, ti=0.0, td=0.0, integral_limit=None, minimum=-5.0, maximum=5.0)
-        self._pidv_xsp_rol = PID(kp=0.1, ti=0.9, td=0.1, integral_limit=0.3, minimum=-math.pi/12, maximum=math.pi/12) # TODO
-        self._pidv_rol_rls = PID(kp=1.0, ti=1.0, td=0.05, integral_limit=0.08, minimum=-math.pi/6, maximum=math.pi/6)
-        self._pidv_rls_out = PID(kp=0.021, ti=0.05, td=0.04, integral_limit=0.3, minimum=-0.08, maximum=0.08)
-
-        self._pidv_ydp_ysp = PID(kp=0.0, ti=0.0, td=0.0, integral_limit=None, minimum=-5.0, maximum=5.0)
-        self._pidv_ysp_pit = PID(kp=-0.13, ti=-1.5, td=0.1, integral_limit=3.0, minimum=-math.pi/8-0.3, maximum=math.pi/12+0.3)
-        self._pidv_pit_pts = PID(kp=0.7, ti=0.8, td=0.0, integral_limit=0.1, minimum=-math.pi/6, maximum=math.pi/6)
-        self._pidv_pts_out = PID(kp=0.027, ti=0.03, td=0.06, integral_limit=1.0, minimum=-0.1, maximum=0.1)
-
-        self._pidv_alt_vsp = PID(kp=0.5, ti=1.0, td=0.05, integral_limit=0.5, minimum=-1.5, maximum=2.0)
-        self._pidv_vsp_out = PID(kp=0.18, ti=0.4, td=0.001, integral_limit=5.0, minimum=0.0, maximum=0.68)
-
-        self._pidv_dyw_yws = PID(kp=-0.9, ti=1.0, td=0.0, integral_limit=0.2, minimum=-math.pi/6, maximum=math.pi/6)
-        self._pidv_yws_out = PID(kp=0.2, ti=0.3, td=0.01, integral_limit=0.15, minimum=-math.pi/24, maximum=math.pi/24)
-
-        self._pidt_dep_out = PID(kp=0.33, ti=3.0, td=0.6, integral_limit=None, minimum=None, maximum=None)
-        self._pidt_arr_out = PID(kp=0.3, ti=0.0, td=0.0, integral_limit=None, minimum=None, maximum=None)
-        # TODO: arrival needs to bleed off energy first
+        # Opt-in stage timings, logged every profile_report seconds and sent to the GCS
+        self.profiler = None
+        if self.main.config.getboolean('afcs', 'profile', fallback=False):
+            self.profiler = StageProfiler(control.PROFILE_STAGES, size=self.main.config.getint('afcs', 'profile_window', fallback=1000))
+            self._profile_report = max(1, int(self.main.config.getfloat('afcs', 'profile_report', fallback=10.0) * freq))
 
     async def boot_proc(self) -> None:
         """Perform boot-related tasks."""
         await self.main.navigator.boot.wait()
 
-    #region Calculations
-    def _flight_calc(self, wipe: bool = True) -> np.ndarray:
-        """Calculate flight servo commands from sensors."""
+    @async_loop_decorator(freq='_freq')
+    async def _afcs_run_loop(self) -> None:
+        self._afcs_step()
 
-        if (alt:=self.main.rxdata.alt).dt > 0.0:
-            self._spf_vpath = self._pidf_alt_vpa.cycle(alt.altitude, self._sp_altitude, alt.dt)
-            self.main.rxdata.alt.dt = 0.0 if wipe else alt.dt
+    @async_loop_decorator()
+    async def _afcs_sensor_loop(self) -> None:
+        update = self.main.io.sensor_update
+        try:
+            await asyncio.wait_for(update.wait(), self._sensor_timeout)
+        except asyncio.TimeoutError:
+            # No fresh data, still cycle so mode logic and safing keep running
+            self.sensor_timeouts += 1
+        update.clear()
 
-        if any([(att:=self.main.rxdata.att).dt > 0.0, (aoa:=self.main.rxdata.aoa).dt > 0.0]):
-            if not aoa.dt > 0.0:
-                dt = att.dt
-            elif not att.dt > 0.0:
-                dt = aoa.dt
-            else:
-                dt = (att.dt + aoa.dt) / 2
-
-            self._vpath = att.pitch - math.cos(att.roll) * aoa.aoa
-            if self.main.state.custom_submode==g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                self._spf_vpath = 0.0
-            self._spf_aoa = self._pidf_vpa_aoa.cycle(self._vpath, self._spf_vpath, dt)
-            self._throttle_vpa_corr = self._pidf_vpa_thr.cycle(self._vpath, self._spf_vpath, dt)
-
-        if (att:=self.main.rxdata.att).dt > 0.0:
-            self._dyaw = calc_dyaw(att.yaw, self._sp_heading)
-
-            self._spf_roll = self._pidf_dyw_rol.cycle(self._dyaw, 0.0, att.dt)
-            self._spf_rollspeed = self._pidf_rol_rls.cycle(att.roll, self._spf_roll, att.dt)
-            self._outf_roll = self._pidf_rls_out.cycle(att.rollspeed, self._spf_rollspeed, att.dt)
-
-            self._throttle_roll_corr = abs(math.sin(att.roll)) if abs(att.roll)>math.pi/24 else 0.0
-
-            self.main.rxdata.att.dt = 0.0 if wipe else att.dt
-
-        if (aoa:=self.main.rxdata.aoa).dt > 0.0:
-            self._outf_pitch = self._pidf_aoa_out.cycle(aoa.aoa, self._spf_aoa, aoa.dt)
-            if self.main.state.custom_submode==g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                self._pidf_aoa_out._integral = 1.3
-                self._pidf_vpa_aoa._integral = 0.248
-                self._pidf_ias_thr._integral = 0.8
-                self._pidf_vpa_thr._integral = 0.3
-                self._outf_pitch = -0.2
-            self.main.rxdata.aoa.dt = 0.0 if wipe else aoa.dt
-
-        if (ias:=self.main.rxdata.ias).dt > 0.0:
-            self._outf_throttle_ias = AFCS.BASE_THROTTLE_PCT+(1+3*self._throttle_roll_corr)*self._pidf_ias_thr.cycle(ias.ias, self._spf_ias, ias.dt)
-            self.main.rxdata.ias.dt = 0.0 if wipe else ias.dt
-
-        self._fservos[0] = self._outf_pitch + self._outf_roll
-        self._fservos[1] = self._outf_pitch - self._outf_roll
-        self._fservos[2] = 0.0
-        self._fservos = self._fservos.clip(-10.0, 10.0) # overflow protection (not servo limits)
-
-        self._throttle_roll_corr = min(self._throttle_roll_corr, 1.0)
-        self._throttle_vpa_corr = min(self._throttle_vpa_corr, 1.0)
-
-        self._fthrottles.fill(self._outf_throttle_ias + 0*self._throttle_vpa_corr)
-        self._fthrottles = self._fthrottles.clip(0.0, 1.0)
-        self._fthrottles *= AFCS.MAX_THROTTLE
-
-        if wipe:
-            self._outt_pitch = 0.0
-            self._ftilt = 0.0
-            self._rtilt = 0.0
-
-        return self._fservos, self._fthrottles
-
-    def _vtol_calc(self) -> np.ndarray:
-        """Calculate VTOL throttle commands from sensors."""
-        if (alt:=self.main.rxdata.alt).dt > 0.0:
-            self._spv_vs = self._pidv_alt_vsp.cycle(alt.altitude, self._sp_altitude, alt.dt)
-            self._outv_thr_mode = 1
-            if alt.altitude < 0.5:
-                if self.main.state.custom_submode == g.CUSTOM_SUBMODE_TAKEOFF_ASCENT:
-                    self._outv_thr_mode = 2
-                elif alt.altitude < 0.1:
-                    self._outv_thr_mode = 0
-
-            if alt.altitude < 0.05:
-                self._pidv_pts_out._integral = 0.55
-                self._pidv_xdp_xsp._integral = 0.0
-                self._pidv_xsp_rol._integral = 0.0
-                self._pidv_rol_rls._integral = 0.0
-                self._pidv_rls_out._integral = 0.0
-                self._pidv_ydp_ysp._integral = 0.0
-                self._pidv_ysp_pit._integral = 0.8
-                self._pidv_pit_pts._integral = 0.0
-                self._pidv_alt_vsp._integral = 0.0
-                self._pidv_vsp_out._integral = 0.0
-                self._pidv_dyw_yws._integral = 0.0
-                self._pidv_yws_out._integral = 0.0
-                self._pidv_vsp_out.minimum = 0.0
-            else:
-                self._pidv_vsp_out.minimum = 0.50
-            self.main.rxdata.alt.dt = 0.0
-
-        if (cam:=self.main.rxdata.cam).dt > 0.0:
-            # self._spv_xspeed = self._pidv_xdp_xsp.cycle(cam.xdp, 0.0, cam.dt)
-            # self._spv_yspeed = self._pidv_ydp_ysp.cycle(cam.ydp, 0.0, cam.dt)
-            self.main.rxdata.cam.dt = 0.0
-
-        if (gps:=self.main.rxdata.gps).dt > 0.0:
-            self.main.rxdata.gps.dt = 0.0
-
-        if (att:=self.main.rxdata.att).dt > 0.0:
-            if self.main.state.custom_submode == g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                # Move both tilts by a base rate
-                if self._ftilt > -self.main.rxdata.aoa.aoa+0.02:
-                    self._ftilt -= att.dt*1e-7
-                self._rtilt -= att.dt*1e-7
-
-                # Calculate desired pitch adjustment with PID
-                self._outt_pitch = self._pidt_dep_out.cycle(att.pitchspeed, self._spv_pitchspeed, att.dt) * att.dt * 1e-6
-
-                # Put the nose up (lower rear wing a little)!
-                if self._outt_pitch>0.0:
-                    self._rtilt -= self._outt_pitch  
-                # OR put the nose down (lower front wing a little), but don't put the front wing at negative AOA!
-                elif self._ftilt > -self.main.rxdata.aoa.aoa+0.02:
-                    self._ftilt += 1.9*self._outt_pitch # Front wing has to move more because it's smaller
-                
-                # One more protection against negative AOA on front wing
-                self._ftilt = max(self._ftilt, -self.main.rxdata.aoa.aoa+0.02)
-            elif self.main.state.custom_submode == g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
-                self._outt_pitch = 0.0
-                self._ftilt = math.pi/2
-                self._rtilt = math.pi/2
-            elif self.main.state.custom_submode == g.CUSTOM_SUBMODE_LANDING_TRANSIT:
-                self._spf_ias = 0
-
-                # Move both tilts by a base rate
-                if self._ftilt > -self.main.rxdata.aoa.aoa+0.02:
-                    self._ftilt += att.dt*1e-7
-                self._rtilt += att.dt*1e-7
-
-                # Calculate desired pitch adjustment with PID
-                self._outt_pitch = self._pidt_dep_out.cycle(att.pitchspeed, self._spv_pitchspeed, att.dt) * att.dt * 1e-6
-
-                # Put the nose up (raise front wing a little), but don't put the front wing at negative AOA!
-                if self._outt_pitch>0.0:
-                    if self._ftilt > -self.main.rxdata.aoa.aoa+0.02:
-                        self._ftilt += 1.9*self._outt_pitch # Front wing has to move more because it's smaller
-                # OR put the nose down (raise rear wing a little)!
-                else:
-                    self._rtilt -= self._outt_pitch
+        self._afcs_step()
 
-                # One more protection against negative AOA on front wing
-                self._ftilt = max(self._ftilt, -self.main.rxdata.aoa.aoa+0.02)
-            else:
-                self._outt_pitch = 0.0
-                self._ftilt = 0.0
-                self._rtilt = 0.0
-    
-            self._outv_throttle = self._pidv_vsp_out.cycle(att.zspeed, self._spv_vs, att.dt)
-            self._spv_roll = self._pidv_xsp_rol.cycle(att.xspeed, self._spv_xspeed, att.dt)
-            self._spv_pitch = self._pidv_ysp_pit.cycle(att.yspeed, self._spv_yspeed, att.dt)
-            if self.main.state.custom_submode == g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                self._spv_pitch = -0.4*self._vtol_ratio
-            elif self.main.state.custom_submode == g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
-                self._spv_pitch = -0.4
-            self._spv_rollspeed = self._pidv_rol_rls.cycle(att.roll, self._spv_roll, att.dt)
-            self._spv_pitchspeed = self._pidv_pit_pts.cycle(att.pitch, self._spv_pitch, att.dt)
-            self._outv_roll = self._pidv_rls_out.cycle(att.rollspeed, self._spv_rollspeed, att.dt)
-            self._outv_pitch = self._pidv_pts_out.cycle(att.pitchspeed, self._spv_pitchspeed, att.dt)
-
-            self._dyaw = calc_dyaw(att.yaw, self._sp_heading) if self.main.rxdata.alt.altitude>3 else 0.0
-            self._spv_yawspeed = self._pidv_dyw_yws.cycle(self._dyaw, 0.0, att.dt)
-            self._outv_yaw = self._pidv_yws_out.cycle(att.yawspeed, self._spv_yawspeed, att.dt)
-            self.main.rxdata.att.dt = 0.0
-
-        match self._outv_thr_mode:
-            case 0:
-                self._outv_throttle = 0.0
-                self.main.state.set_mode(m.MAV_MODE_GUIDED_ARMED, g.CUSTOM_MODE_GROUND, g.CUSTOM_SUBMODE_GROUND_DISARMED)
-            case 1:
-                pass
-            case 2:
-                self._outv_throttle = 0.55
-                self._pidv_vsp_out._integral = 3.2
-
-        t1 = self._outv_pitch + self._outv_throttle
-        t2 = self._outv_pitch + self._outv_throttle
-        t3 = -self._outv_pitch + self._outv_roll + self._outv_throttle
-        t4 = -self._outv_pitch - self._outv_roll + self._outv_throttle
-        self._vthrottles = np.array([t1, t2, t3, t4], dtype=np.float16)
-        self._vthrottles *= AFCS.MAX_THROTTLE
-
-        self._rtilt = max(min(self._rtilt, math.pi/2), 0.0)
-        self._ftilt = max(min(self._ftilt, math.pi/2), 0.0)
-
-        self._vservos[0] = math.pi/2 - self._outv_yaw
-        self._vservos[1] = math.pi/2 + self._outv_yaw
-        self._vservos[2] = math.pi/2
-
-        return self._vservos, self._vthrottles
-    #endregion
+    def _afcs_step(self) -> None:
+        """Run a single control cycle on the latest sensor data."""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
 
-    @async_loop_decorator()
-    async def _afcs_run_loop(self) -> None:
-        self._vtol_ratio = 2*self._rtilt / (math.pi)#1 - min(self.main.rxdata.ias.ias/20, 1) # 1 is VTOL
-        try:
-            self._ias_scalar = min(676 / (self.main.rxdata.ias.ias**2), 1.0) # ~26**2 / ias**2
-        except ZeroDivisionError:
-            self._ias_scalar = 1.0
+        # Take the back buffer the callbacks filled since the last cycle
+        rxdata = self.rxdata = self.main.io.swap()
 
-        self._vtol_ratio = max(min(self._vtol_ratio, 1.0), 0.0)
-        self._ias_scalar = min(self._ias_scalar, 10.0)
+        setpoints = self.setpoints
+        setpoints.submode = self.main.state.custom_submode
 
         # Setpoints
-        match self.main.state.custom_submode:
+        match setpoints.submode:
             case g.CUSTOM_SUBMODE_LANDING_DESCENT:
-                self._sp_altitude = 0.0
-                self._sp_heading = self.main.navigator.commanded_heading
+                setpoints.altitude = 0.0
+                setpoints.heading = self.main.navigator.commanded_heading
             case g.CUSTOM_SUBMODE_TAKEOFF_ASCENT | g.CUSTOM_SUBMODE_TAKEOFF_DEPART | g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT | g.CUSTOM_SUBMODE_LANDING_TRANSIT | g.CUSTOM_SUBMODE_LANDING_HOVER:
-                self._sp_altitude = self.main.navigator.hover_alt
-                self._spf_ias = self.main.navigator.cruise_ias
+                setpoints.altitude = self.main.navigator.hover_alt
+                setpoints.hover_alt = self.main.navigator.hover_alt
+                setpoints.ias = self.main.navigator.cruise_ias
 
-                self._sp_heading = self.main.navigator.commanded_heading
+                setpoints.heading = self.main.navigator.commanded_heading
             case g.CUSTOM_SUBMODE_FLIGHT_NORMAL:
                 if self.auto_alt:
-                    self._sp_altitude = self.main.navigator.commanded_altitude
+                    setpoints.altitude = self.main.navigator.commanded_altitude
                 if self.auto_ias:
-                    self._spf_ias = self.main.navigator.cruise_ias
+                    setpoints.ias = self.main.navigator.cruise_ias
 
-                self._sp_heading = self.main.navigator.commanded_heading
+                setpoints.heading = self.main.navigator.commanded_heading
             case _:
-                self._sp_altitude = 0.0
-
-        # Controls
-        match self.main.state.custom_submode:
-            case g.CUSTOM_SUBMODE_TAKEOFF_ASCENT | g.CUSTOM_SUBMODE_TAKEOFF_DEPART | g.CUSTOM_SUBMODE_LANDING_DESCENT | g.CUSTOM_SUBMODE_LANDING_HOVER:
-                # VTOL
-                self._servos, self._throttles = self._vtol_calc()
-            case g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                # Departure transition
-                fservos, fthrottles = self._flight_calc(wipe=False)
-                _, vthrottles = self._vtol_calc()
-                self._servos[2] = self._ftilt
-                self._servos[:2] = (1-self._vtol_ratio)*fservos[:2] + self._rtilt
-                self._throttles = (1-self._vtol_ratio)*fthrottles + self._vtol_ratio*vthrottles
-            case g.CUSTOM_SUBMODE_LANDING_TRANSIT:
-                # Arrival transition
-                fservos, fthrottles = self._flight_calc(wipe=False)
-                _, vthrottles = self._vtol_calc()
-                self._servos[2] = self._ftilt
-                self._vtol_ratio = math.sin(self._servos[2])
-                self._servos[:2] = (1-self._vtol_ratio)*fservos[:2] + self._rtilt
-                self._throttles = (1-self._vtol_ratio)*fthrottles + self._vtol_ratio*vthrottles
-            case g.CUSTOM_SUBMODE_FLIGHT_NORMAL | g.CUSTOM_SUBMODE_FLIGHT_TERRAIN_AVOIDANCE:
-                # Normal flight
-                self._servos, self._throttles = self._flight_calc()
-                self._servos *= self._ias_scalar
-            case g.CUSTOM_SUBMODE_FLIGHT_MANUAL:
-                # Manual flight via GCS
-                # TODO switch from lua to GCS
-                pass
-            case _:
-                # Safed
-                self._servos = np.array([math.pi/2, math.pi/2, math.pi/2, math.pi/2], dtype=np.float16)
-                self._throttles = np.zeros(4, dtype=np.float16)
-
-        # Mode increments
-        match self.main.state.custom_submode:
-            case g.CUSTOM_SUBMODE_TAKEOFF_ASCENT:
-                if self.main.rxdata.alt.altitude > self.main.navigator.hover_alt-3:
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_TAKEOFF_DEPART:
-                if self.main.rxdata.ias.ias > 4.5:
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT:
-                if self._vtol_ratio==0 and self._ftilt==0 and self._rtilt==0:
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_LANDING_TRANSIT:
-                # TODO
-                if self.main.rxdata.ias.ias<10 and self._ftilt==math.pi/2:
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_LANDING_HOVER:
-                # TODO
-                if self.main.rxdata.alt.altitude < self.main.navigator.hover_alt-3: # and over H
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_LANDING_DESCENT:
-                # TODO
-                if False:
-                    self.main.state.inc_mode()
-            case g.CUSTOM_SUBMODE_FLIGHT_NORMAL | g.CUSTOM_SUBMODE_FLIGHT_TERRAIN_AVOIDANCE:
-                pass # TODO: terr avoidance check
-
-        self._servos[:2] = np.clip(self._servos[:2], -math.pi/12, 7*math.pi/12)
-        self._servos[2] = np.clip(self._servos[2], 0.0, math.pi/2)
-        self._throttles = np.clip(self._throttles, 0, 14000)
-        self._servos = np.nan_to_num(self._servos)
-        self._throttles = np.nan_to_num(self._throttles)
-
-        self.main.txdata.elevon1 = self._servos[0]
-        self.main.txdata.elevon2 = self._servos[1]
-        self.main.txdata.tilt = self._servos[2]
+                setpoints.altitude = 0.0
+
+        outputs, _ = control.step(self.control, rxdata, setpoints, profiler=profiler)
+
+        # Mode changes
+        if outputs.disarm:
+            self.main.state.set_mode(m.MAV_MODE_GUIDED_ARMED, g.CUSTOM_MODE_GROUND, g.CUSTOM_SUBMODE_GROUND_DISARMED)
+        elif outputs.inc_mode:
+            self.main.state.inc_mode()
+        if profiler is not None:
+            profiler.lap('mode')
+
+        self.main.txdata.elevon1 = outputs.servos[0]
+        self.main.txdata.elevon2 = outputs.servos[1]
+        self.main.txdata.tilt = outputs.servos[2]
         
-        self.main.txdata.esc1 = self._throttles[0]
-        self.main.txdata.esc2 = self._throttles[1]
-        self.main.txdata.esc3 = self._throttles[2]
-        self.main.txdata.esc4 = self._throttles[3]
+        self.main.txdata.esc1 = outputs.throttles[0]
+        self.main.txdata.esc2 = outputs.throttles[1]
+        self.main.txdata.esc3 = outputs.throttles[2]
+        self.main.txdata.esc4 = outputs.throttles[3]
 
-        await asyncio.sleep(0)
+        if profiler is not None:
+            profiler.lap('tx')
+            profiler.end()
+            if not profiler.cycles % self._profile_report:
+                logger.info(f"AFCS timing: {profiler}")
 
     async def run(self) -> None:
         """Calculate desired control positions."""
-        logger.info("Starting AFCS")
-        await self._afcs_run_loop()
+        logger.info(f"Starting AFCS ({self._trigger} triggered)")
+        if self._trigger == 'sensor':
+            await self._afcs_sensor_loop()
+        else:
+            await self._afcs_run_loop()
 
     async def close(self) -> None:
         logger.info("Closing AFCS")
-        pass
+        for scheduler in getattr(self, '_schedulers', {}).values():
+            logger.info(f"AFCS loop {scheduler}")
+        if self._trigger == 'sensor':
+            logger.info(f"AFCS sensor timeouts: {self.sensor_timeouts}")
+        if self.profiler is not None:
+            logger.info(f"AFCS timing: {self.profiler}")
 
 
 class CommManager:
@@ -1690,6 +1447,8 @@ class CommManager:
         The Main instance to which this controller is associated.
     _txfreq : int, optional
         The transmission frequency (default is DEFAULT_FREQ).
+    _rxfreq : int, optional
+        The rate at which incoming messages are drained (default is DEFAULT_FREQ).
     _heartbeatfreq : int, optional
         The heartbeat message transmission frequency (default is 1).
     _gcs_id : None
@@ -1714,8 +1473,9 @@ class CommManager:
     }
 
     MAX_FLUSH_BUFFER = int(1e6)
+    MAX_RX_PER_CYCLE = 100
 
-    def __init__(self, main: 'Main', tx_freq: int = DEFAULT_FREQ, heartbeat_freq: int = 1) -> None:
+    def __init__(self, main: 'Main', tx_freq: int = DEFAULT_FREQ, rx_freq: int = DEFAULT_FREQ, heartbeat_freq: int = 1) -> None:
         """Initialize a CommManager instance.
 
         Parameters
@@ -1724,6 +1484,8 @@ class CommManager:
             The Main instance to which this controller is associated.
         tx_freq : int, optional
             The transmission frequency (default is DEFAULT_FREQ).
+        rx_freq : int, optional
+            The rate at which incoming messages are drained (default is DEFAULT_FREQ).
         heartbeat_freq : int, optional
             The heartbeat message transmission frequency (default is 1).
         """
@@ -1731,6 +1493,7 @@ class CommManager:
         self.main = main
 
         self._txfreq = tx_freq
+        self._rxfreq = rx_freq
         self._heartbeatfreq = heartbeat_freq
 
         self._last_cam_beat = False
@@ -1874,7 +1637,7 @@ class CommManager:
                     try:
                         if msg.param1 >= 0:
                             self.main.afcs.auto_alt = False
-                            self.main.afcs._sp_altitude = msg.param1 # TODO add checks!
+                            self.main.afcs.setpoints.altitude = msg.param1 # TODO add checks!
                             self._mavlogger.log(MAVLOG_RX, f"GCS commanded altitude setpoint to {msg.param1}")
                         else:
                             self.main.afcs.auto_alt = True
@@ -1887,7 +1650,7 @@ class CommManager:
                     try:
                         if msg.param2 >= 0:
                             self.main.afcs.auto_ias = False
-                            self.main.afcs._spf_ias = msg.param2 # TODO add checks!
+                            self.main.afcs.setpoints.ias = msg.param2 # TODO add checks!
                             self._mavlogger.log(MAVLOG_RX, f"GCS commanded speed setpoint to {msg.param2}")
                         else:
                             self.main.afcs.auto_ias = True
@@ -1946,15 +1709,18 @@ class CommManager:
                     # PID TUNER GOTO
                     if msg.x==0:
                         # Wildcard
-                        self.main.afcs._pidf_ias_thr.set(kp=msg.param1, ti=msg.param2, td=msg.param3)
-                        self.main.afcs._pidf_ias_thr.reset()
-                        # self.main.afcs._spv_vs=msg.param4
+                        self.main.afcs.control._pidf_ias_thr.set(kp=msg.param1, ti=msg.param2, td=msg.param3)
+                        self.main.afcs.control._pidf_ias_thr.reset()
+                        # self.main.afcs.control._spv_vs=msg.param4
                     else:
                         from utilities import pid_tune_map_names as p, pid_tune_map_sps as s
-                        getattr(self.main.afcs, '_'+p[msg.x]).set(kp=msg.param1, ti=msg.param2, td=msg.param3)
+                        getattr(self.main.afcs.control, '_'+p[msg.x]).set(kp=msg.param1, ti=msg.param2, td=msg.param3)
                         logger.info(f"Setting PID {'_'+p[msg.x]}")
-                        if s[msg.x]:
-                            setattr(self.main.afcs, s[msg.x], msg.param4)
+                        if s[msg.x] in control.SETPOINT_NAMES:
+                            setattr(self.main.afcs.setpoints, control.SETPOINT_NAMES[s[msg.x]], msg.param4)
+                            logger.info(f"Setting SP {s[msg.x]}")
+                        elif s[msg.x]:
+                            setattr(self.main.afcs.control, s[msg.x], msg.param4)
                             logger.info(f"Setting SP {s[msg.x]}")
                     logger.info(f"PID state: {msg.param1:.4f}, {msg.param2:.4f}, {msg.param3:.4f} @ {msg.param4:.4f}")
                 # IMAGE
@@ -2007,9 +1773,9 @@ class CommManager:
                     self._mav_conn_gcs.mav.command_ack_send(msg.command, m.MAV_RESULT_UNSUPPORTED, 255, 0, 0, 0)
     #endregion
     
-    @async_loop_decorator()
+    @async_loop_decorator(freq=1)
     async def _manager_loop(self) -> None:
-        await asyncio.sleep(0)
+        pass
 
     async def manager(self) -> None:
         """Manage the comm's various operations."""
@@ -2022,22 +1788,20 @@ class CommManager:
 
         await self._manager_loop()
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq='_rxfreq')
     async def _comm_rx_loop(self) -> None:
         """Recieve messages from GCS over mavlink."""
-        try:
-            msg = self._mav_conn_gcs.recv_msg()
-        except (ConnectionError, OSError):
+        # Drain everything that arrived since the last cycle
+        for _ in range(CommManager.MAX_RX_PER_CYCLE):
             try:
+                msg = self._mav_conn_gcs.recv_msg()
+            except (ConnectionError, OSError):
                 self._mavlogger.log(MAVLOG_DEBUG, "CommManager (rx) connection refused")
-                await asyncio.sleep(0)
-            except asyncio.exceptions.CancelledError:
-                self.main.stop.set()
-                raise
-            finally:
                 return
 
-        if msg is not None:
+            if msg is None:
+                break
+
             type_ = msg.get_type()
             if type_ in CommManager.type_handlers:
                 handler = getattr(self, CommManager.type_handlers[type_])
@@ -2045,34 +1809,35 @@ class CommManager:
             else:
                 self._mavlogger.log(MAVLOG_RX, f"Unknown message type: {type_}")
 
-        await asyncio.sleep(0)
-
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq='_rxfreq')
     async def _comm_rxcam_loop(self) -> None:
         """Recieve messages from GCS over mavlink."""
-        try:
-            msg = self._cam_conn.recv_msg()
-        except (ConnectionError, OSError, AttributeError):
-            self._mavlogger.log(MAVLOG_DEBUG, "No connection to listen to.")
-            return
-
         target = self.main.config.getint('mavlink_ids', 'cam_id')
 
-        if msg is not None:
+        for _ in range(CommManager.MAX_RX_PER_CYCLE):
+            try:
+                msg = self._cam_conn.recv_msg()
+            except (ConnectionError, OSError, AttributeError):
+                self._mavlogger.log(MAVLOG_DEBUG, "No connection to listen to.")
+                return
+
+            if msg is None:
+                break
+
             if msg.get_type() == 'HEARTBEAT' and msg.get_srcSystem()==target:
                 self._mavlogger.log(MAVLOG_DEBUG, f"Heartbeat message from camera #{msg.get_srcSystem()}")
                 self._last_cam_beat = self.main.rxdata.time.time
             elif msg.get_type() == 'CAMERA_IMAGE_CAPTURED' and msg.get_srcSystem()==self._cam_id:
-                return
+                continue
                 logger.debug(f"Procesing image {msg.file_url}")
 
                 if out := await asyncio.to_thread(img.sync_proc, msg.file_url):
                     dx, dy, confidence, image = out
                     logger.info(f"'H' detected in {msg.file_url} at ({dx},{dy}) with a confidence of {confidence:.2f}.")
-                    self.main.rxdata.cam.dump(dx, dy, self.main.rxdata.time.time)
+                    self.main.io.sensor('cam').dump(dx, dy, self.main.rxdata.time.time)
                     # await grapher.imshow(image)
                 else:
-                    self.main.rxdata.cam.dump(0.0, 0.0, self.main.rxdata.time.time)
+                    self.main.io.sensor('cam').dump(0.0, 0.0, self.main.rxdata.time.time)
                     logger.debug(f"None detected in {msg.file_url}.")
 
                 self._mav_conn_gcs.mav.camera_image_captured_send(
@@ -2101,8 +1866,6 @@ class CommManager:
                 import common.key as key
                 asyncio.create_task(self._establish_cam(key=key.CAMKEY.encode('utf-8')))
 
-        await asyncio.sleep(0)
-
     async def _rx(self) -> None:
         """Recieve messages from GCS over mavlink."""
         logger.debug("Starting CommManager (RX)")
@@ -2113,10 +1876,10 @@ class CommManager:
         logger.debug("Starting camera (RX)")
         await self._comm_rxcam_loop()
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq='_txfreq')
     async def _comm_tx_loop(self) -> None:
         """Transmit continuous messages."""
-        await asyncio.sleep(0)
+        pass
 
     async def _tx(self) -> None:
         """Transmit continuous messages."""
@@ -2154,7 +1917,7 @@ class CommManager:
         finally:
             logger.info("Closing ROI cycle")
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq='_heartbeatfreq')
     async def _comm_heartbeat_loop(self) -> None:
         msg = [
             m.MAV_TYPE_VTOL_RESERVED4, # 24
@@ -2180,16 +1943,16 @@ class CommManager:
             int(self.main.rxdata.gps.latitude * 1e7),
             int(self.main.rxdata.gps.longitude * 1e7),
             int(self.main.rxdata.gps.altitude),
-            int(self.main.afcs._sp_altitude),
+            int(self.main.afcs.control._sp_altitude),
             uint8(math.degrees(self.main.rxdata.att.yaw) * 0.5),
-            uint8(math.degrees(self.main.afcs._sp_heading) * 0.5),
+            uint8(math.degrees(self.main.afcs.control._sp_heading) * 0.5),
             int(min(self.main.navigator.distance * 1e-1, 65535)),
             uint8(2.387324 * self.main.txdata.esc1.kinematics.angular_velocity.radian_per_second
                                + self.main.txdata.esc2.kinematics.angular_velocity.radian_per_second
                                + self.main.txdata.esc3.kinematics.angular_velocity.radian_per_second
                                + self.main.txdata.esc4.kinematics.angular_velocity.radian_per_second / self.main.afcs.MAX_THROTTLE),
             uint8(self.main.rxdata.ias.ias * 5),
-            uint8(self.main.afcs._spf_ias * 5),
+            uint8(self.main.afcs.control._spf_ias * 5),
             uint8(self.main.rxdata.gps.yspeed * 5),
             0, # windspeed
             0, # wind heading
@@ -2228,8 +1991,17 @@ class CommManager:
         except AttributeError:
             pass
 
+        if (profiler:=self.main.afcs.profiler) is not None:
+            # p50, p99, max in microseconds for each stage in profiler.stages
+            stats = profiler.stats().ravel()
+            self._mav_conn_gcs.mav.debug_float_array_send(
+                int(self.main.rxdata.time.time),
+                b'AFCS_PROF',
+                0,
+                np.pad(stats[:58], (0, max(0, 58-stats.size))).tolist()
+            )
+
         self._mavlogger.log(MAVLOG_DEBUG, "TX Heartbeat")
-        await asyncio.sleep(1 / self._heartbeatfreq)
 
     async def _heartbeat(self) -> None:
         """Periodically publish a heartbeat message."""
@@ -2268,7 +2040,7 @@ class Main:
     stop : asyncio.Event
         An event to signal the system to stop.
     rxdata : RxBuffer
-        Global receive data.
+        Latest sensor data, the back buffer of UAVCANManager.
     txdata : TxBuffer
         Global transmit data.
     state : g
@@ -2305,11 +2077,15 @@ class Main:
         self.boot = asyncio.Event()
         self.stop = asyncio.Event()
 
-        self.rxdata = RxBuffer()
         self.txdata = TxBuffer()
 
         self.state = StateManager(m.MAV_STATE_UNINIT, m.MAV_MODE_PREFLIGHT, g.CUSTOM_MODE_UNINIT, g.CUSTOM_SUBMODE_UNINIT, self.boot)
 
+    @property
+    def rxdata(self) -> RxBuffer:
+        """Latest sensor data, see UAVCANManager.swap()."""
+        return self.io.rxdata
+
     async def _graph(self, name: str = '0.0', freq: int = 10) -> None:
         """Asynchronously collect and graph data.
 
@@ -2323,10 +2099,20 @@ class Main:
 
         self._grapher = grapher.Grapher(deque_len=300)
 
+        # Sensor fields are graphed straight from their history against time
+        sensor, _, field = name.rpartition('.')
+        history = getattr(eval('self.' + sensor), 'history', None) if sensor else None
+        if history is not None and field not in history.fields:
+            history = None
+
         try:
             while not self.stop.is_set():
                 try:
-                    self._grapher.add(eval('self.' + name))
+                    if history is not None:
+                        samples = history.last()
+                        self._grapher.set(samples['time'] / 1e6, samples[field])
+                    else:
+                        self._grapher.add(eval('self.' + name))
                     self._grapher.graph()
 
                     try:
@@ -2385,6 +2171,7 @@ class Main:
         self.io = UAVCANManager(self)
         self.afcs = AFCS(self)
         self.navigator = Navigator(self)
+        startup.mark('init')
 
         comm_manager = asyncio.create_task(self.comm.manager())
         await asyncio.sleep(0)
@@ -2396,6 +2183,7 @@ class Main:
                 self.boot.set()
                 self.state.inc_mode()
             await self.boot.wait()
+            startup.mark('gcs')
         except asyncio.exceptions.CancelledError:
             comm_manager.cancel()
             await asyncio.sleep(0)
@@ -2421,6 +2209,8 @@ class Main:
             return
 
         logger.warning(f"Boot successful on #{self.systemid}")
+        startup.mark('boot')
+        logger.info(f"Startup timing: {startup}")
 
         for _ in range(DEBUG_SKIP):
             self.state.inc_mode()
@@ -2467,7 +2257,7 @@ async def main(graph: str | bool = False, print_: str | bool = False) -> None:
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("-g", "--graph", nargs='?', default=False, const='rxdata.att.rollspeed', help="Attribute to graph")
-    parser.add_argument("-p", "--print", nargs='?', default=False, const='afcs._throttles', help="Attribute to print")
+    parser.add_argument("-p", "--print", nargs='?', default=False, const='afcs.control._throttles', help="Attribute to print")
     parser.add_argument("-s", "--skip", nargs='?', default='-1', const='0', help="Skip number of modes on startup")
     args = parser.parse_args()
 
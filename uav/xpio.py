@@ -10,14 +10,14 @@ import sys
 import time
 from configparser import ConfigParser
 
+import numpy as np
+
 os.chdir(os.path.dirname(os.path.realpath(__file__)) + '/..')
 sys.path.append(os.getcwd())
-for var in os.environ:
-    if var.startswith('UAVCAN__'):
-        os.environ.pop(var)
-os.environ['CYPHAL_PATH']='./common/public_regulated_data_types'
-os.environ['PYCYPHAL_PATH']='./common/pycyphal_generated'
-os.environ['UAVCAN__DIAGNOSTIC__SEVERITY'] = '2'
+
+from common.profiler import StartupTimer
+startup = StartupTimer()
+
 os.environ['MAVLINK20'] = '1'
 os.environ['MAVLINK_DIALECT'] = 'common'
 
@@ -37,10 +37,13 @@ MAVLOG_TX = logging.DEBUG - 2
 MAVLOG_RX = logging.DEBUG - 1
 MAVLOG_LOG = logging.INFO + 1
 
-logger.warning("Generating UAVCAN files, please wait...")
+import common.dsdl as dsdl
+dsdl.prepare(logger=logger)
+startup.mark('dsdl')
 
 import pycyphal
 import reg.udral.service.actuator.common
+import reg.udral.service.actuator.common.sp
 import reg.udral.service.common
 import reg.udral.physics.electricity
 import reg.udral.physics.dynamics.rotation
@@ -58,9 +61,12 @@ import pycyphal.application
 from pymavlink import mavutil
 
 import common.find_xp as find_xp
+from common.datarefs import DatarefTable
 from common.decorators import async_loop_decorator
+from common.registry import DIAGNOSTIC_SEVERITY, open_registry
 from common.states import NodeCommands
 from common.angles import quaternion_to_euler, py_to_rp
+startup.mark('imports')
 
 m = mavutil.mavlink
 
@@ -74,11 +80,11 @@ config.read('./common/config.ini')
 db_config = ConfigParser()
 db_config.read('./common/_db_config.ini')
 
-rx_data = {
-    b'fmuas/att/attitude_quaternion_x': 0.0, # 0
+rx_data = DatarefTable({
+    b'fmuas/att/attitude_quaternion_w': 0.0, # 0
+    b'fmuas/att/attitude_quaternion_x': 0.0,
     b'fmuas/att/attitude_quaternion_y': 0.0,
     b'fmuas/att/attitude_quaternion_z': 0.0,
-    b'fmuas/att/attitude_quaternion_w': 0.0,
     b'fmuas/att/rollrate': 0.0,
     b'fmuas/att/pitchrate': 0.0,
     b'fmuas/att/yawrate': 0.0,
@@ -102,9 +108,14 @@ rx_data = {
 
     b'fmuas/camera/pitch_actual': 0.0,
     b'fmuas/camera/roll_actual': 0.0,
-}
-
-tx_data = {
+}, groups={
+    'quaternion': (b'fmuas/att/attitude_quaternion_w', b'fmuas/att/attitude_quaternion_x', b'fmuas/att/attitude_quaternion_y', b'fmuas/att/attitude_quaternion_z'),
+    'rates': (b'fmuas/att/rollrate', b'fmuas/att/pitchrate', b'fmuas/att/yawrate'),
+    'gps_position': (b'fmuas/gps/latitude', b'fmuas/gps/longitude', b'fmuas/gps/altitude'),
+    'gps_velocity': (b'fmuas/gps/vn', b'fmuas/gps/ve', b'fmuas/gps/vd'),
+})
+
+tx_data = DatarefTable({
     b'fmuas/afcs/output/elevon1': 90.0,
     b'fmuas/afcs/output/elevon2': 90.0,
     b'fmuas/afcs/output/wing_tilt': 90.0,
@@ -115,11 +126,39 @@ tx_data = {
     b'fmuas/camera/roll': 0.0,
     b'fmuas/camera/pitch': 180.0,
     b'fmuas/python_running': 1.0
+}, groups={
+    'actuators': (b'fmuas/afcs/output/elevon1', b'fmuas/afcs/output/elevon2', b'fmuas/afcs/output/wing_tilt',
+                  b'fmuas/afcs/output/rpm1', b'fmuas/afcs/output/rpm2', b'fmuas/afcs/output/rpm3', b'fmuas/afcs/output/rpm4'),
+    'camera': (b'fmuas/camera/roll', b'fmuas/camera/pitch'),
+})
+
+# Change needed before a tx dataref is resent, any change for the rest
+TX_TOLERANCE = {
+    b'fmuas/afcs/output/elevon1': 0.01, # deg
+    b'fmuas/afcs/output/elevon2': 0.01,
+    b'fmuas/afcs/output/wing_tilt': 0.01,
+    b'fmuas/afcs/output/rpm1': 1.0, # rpm
+    b'fmuas/afcs/output/rpm2': 1.0,
+    b'fmuas/afcs/output/rpm3': 1.0,
+    b'fmuas/afcs/output/rpm4': 1.0,
+    b'fmuas/camera/roll': 0.1, # deg
+    b'fmuas/camera/pitch': 0.1,
 }
 
 XP_FIND_TIMEOUT = 1
+XP_TIMEOUT = 1.0 # Seconds without data before the connection is considered lost
+XP_RECONNECT_TIMEOUT = 0.1
+XP_QUEUE_SIZE = 64
+XP_REFRESH = 1.0 # Seconds between resending every tx dataref
+RREF_HEADER = 5 # b'RREF' and a null byte
+RREF_DTYPE = np.dtype([('idx', '<i4'), ('val', '<f4')])
+RREF_REQUEST = struct.Struct('<4sxii400s')
+DREF = struct.Struct('<4sxf500s')
+DREF_VALUE = struct.Struct('<f')
+DREF_VALUE_OFFSET = 5
 XP_FREQ = 50
 FREQ = 50
+CLOCK_FREQ = 200
 FT_TO_M = 3.048e-1
 KT_TO_MS = 5.14444e-1
 RADS_TO_RPM = 30/math.pi
@@ -148,6 +187,31 @@ get_xp_time._last_time = time.monotonic()
 get_xp_time._last_real = 0.0
 
 
+class XPProtocol(asyncio.DatagramProtocol):
+    """Queue datagrams from X-Plane for XPConnect.
+
+    Datagrams are received by the event loop, so waiting for X-Plane
+    never blocks the other nodes. If the consumer falls behind, the
+    oldest datagrams are dropped.
+    """
+    def __init__(self, maxsize: int = XP_QUEUE_SIZE) -> None:
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize)
+        self.transport: asyncio.DatagramTransport | None = None
+        self.dropped = 0
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc: Exception) -> None:
+        logger.debug(f"X-Plane socket error: {exc}")
+
+
 class XPConnect:
     def __init__(self, freq: int = XP_FREQ) -> None:
         self._freq = freq
@@ -165,12 +229,32 @@ class XPConnect:
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind((self.X_PLANE_IP, 0))
-        self.sock.settimeout(1)
+        self.sock.setblocking(False)
         self.conn_open = True
 
-        for index, dref in enumerate(rx_data.keys()):
-            msg = struct.pack('<4sxii400s', b'RREF', self._freq, index, dref)
-            self.sock.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
+        self._protocol = XPProtocol()
+        self._transport: asyncio.DatagramTransport | None = None
+
+        # RREF index -> rx_data slot, so packets are decoded without any key lookups
+        self._slots = np.array([rx_data.slot(dref) for dref in rx_data.names], dtype=np.intp)
+
+        # One DREF packet per tx dataref, built once; only the value is packed per send
+        self._dref_packets = [bytearray(DREF.pack(b'DREF', value, dref)) for dref, value in tx_data.items()]
+        self._tolerance = np.array([TX_TOLERANCE.get(dref, 0.0) for dref in tx_data.names], dtype=np.float64)
+        self._sent_values = tx_data.snapshot()
+        self._diff = np.zeros_like(self._sent_values)
+        self._refresh_time = -float('inf')
+        self.drefs_sent = 0
+        self.drefs_offered = 0
+
+    async def _connect(self) -> None:
+        """Attach the socket to the event loop and subscribe to every dataref."""
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: self._protocol, sock=self.sock)
+
+        for index, dref in enumerate(rx_data.names):
+            msg = RREF_REQUEST.pack(b'RREF', self._freq, index, dref)
+            self._transport.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
 
     @async_loop_decorator(close=False)
     async def _xpconnect_reconnect_loop(self):
@@ -181,56 +265,77 @@ class XPConnect:
 
     @async_loop_decorator()
     async def _xpconnect_run_loop(self) -> None:
-        global rx_data
-        if self.conn_open:
-            try:
-                data, _ = self.sock.recvfrom(2048)
-            except socket.timeout:
+        try:
+            data = await asyncio.wait_for(self._protocol.queue.get(), XP_TIMEOUT if self.conn_open else XP_RECONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            if self.conn_open:
                 logger.info("Socket timeout")
                 self.conn_open = False
-            else:
-                header = data[0:4]
+            return
 
-                if header == b'RREF':
-                    num_values = int(len(data[5:]) / 8)
-                    for i in range(num_values):
-                        dref_info = data[(5 + 8 * i):(5 + 8 * (i + 1))]
-                        (index, value) = struct.unpack('<if', dref_info)
-                        if index < len(rx_data):
-                            rx_data[list(rx_data.keys())[index]] = value
+        if not self.conn_open:
+            logger.info("Socket reestablished")
+            self.conn_open = True
+            self._refresh_time = -float('inf') # X-Plane may have restarted
 
-                for dref, value in tx_data.items():
-                    msg = struct.pack('<4sxf500s', b'DREF', value, dref)
-                    self.sock.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
+        # Use everything that arrived since the last cycle, then answer once
+        while True:
+            if data[0:4] == b'RREF':
+                self._decode(data)
+            if self._protocol.queue.empty():
+                break
+            data = self._protocol.queue.get_nowait()
 
-                await asyncio.sleep(1 / self._freq)
+        self._send_drefs()
+
+    def _send_drefs(self) -> None:
+        """Send the tx datarefs that changed by more than their tolerance, or all of them every XP_REFRESH."""
+        now = time.monotonic()
+        if now - self._refresh_time >= XP_REFRESH:
+            self._refresh_time = now
+            slots = range(len(tx_data))
         else:
-            self.sock.settimeout(0.1)
-            try:
-                self.sock.recvfrom(2048)
-            except socket.timeout:
-                await asyncio.sleep(0.1)
-            else:
-                logger.info("Socket reestablished")
-                self.sock.settimeout(1)
-                self.conn_open = True
+            np.abs(np.subtract(tx_data.values, self._sent_values, out=self._diff), out=self._diff)
+            slots = np.flatnonzero(self._diff > self._tolerance).tolist()
+
+        values = tx_data.values
+        for slot in slots:
+            packet = self._dref_packets[slot]
+            DREF_VALUE.pack_into(packet, DREF_VALUE_OFFSET, values[slot])
+            self._transport.sendto(packet, (self.X_PLANE_IP, self.UDP_PORT))
+            self._sent_values[slot] = values[slot]
+        self.drefs_sent += len(slots)
+        self.drefs_offered += len(tx_data)
+
+    def _decode(self, data: bytes) -> None:
+        """Write the values of an RREF packet into rx_data."""
+        count = (len(data) - RREF_HEADER) // RREF_DTYPE.itemsize
+        if count <= 0: # Truncated or empty packet
+            return
+        packet = np.frombuffer(data, dtype=RREF_DTYPE, count=count, offset=RREF_HEADER)
+        index = packet['idx']
+        valid = (index >= 0) & (index < self._slots.size)
+        rx_data.values[self._slots[index[valid]]] = packet['val'][valid]
 
     async def run(self) -> None:
+        await self._connect()
         logger.warning("Data streaming...")
         await self._xpconnect_run_loop()
 
     async def _halt(self) -> None:
-        for index, dref in enumerate(rx_data.keys()):
-            msg = struct.pack('<4sxii400s', b'RREF', 0, index, dref)
-            self.sock.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
+        for index, dref in enumerate(rx_data.names):
+            msg = RREF_REQUEST.pack(b'RREF', 0, index, dref)
+            self._transport.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
         logger.info("Stopped listening for drefs")
         
     async def close(self) -> None:
         logger.info("Closing XPL")
 
-        await self._halt()
+        if self._transport is None: # Never connected
+            self.sock.close()
+            return
 
-        tx_data[b'fmuas/python_running'] = 0.0
+        await self._halt()
 
         # line1 = "PYTHON CONNECTION LOST"
         # line2 = ""
@@ -241,13 +346,16 @@ class XPConnect:
         #                 line2.encode('utf-8'),
         #                 line3.encode('utf-8'),
         #                 line4.encode('utf-8'))
-        # self.sock.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
+        # self._transport.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
         
-        msg = struct.pack('<4sxf500s', b'DREF', 0.0, b'fmuas/python_running')
-        self.sock.sendto(msg, (self.X_PLANE_IP, self.UDP_PORT))
+        tx_data[b'fmuas/python_running'] = 0.0
+        self._send_drefs()
         logger.info("LUA suspended")
+        logger.info(f"Sent {self.drefs_sent}/{self.drefs_offered} DREF values")
 
-        self.sock.close()
+        if self._protocol.dropped:
+            logger.info(f"Dropped {self._protocol.dropped} X-Plane datagrams")
+        self._transport.close()
 
 
 class TestXPConnect:
@@ -263,23 +371,18 @@ class TestXPConnect:
         self.UDP_PORT=0
         logger.warning("X-Plane found at IP: %s, port: %s" % (self.X_PLANE_IP,self.UDP_PORT))
 
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _testxpconnect_run_loop(self) -> None:
-        global rx_data
-
         self._time = time.time_ns()//1000 - self._boot_time
         rx_data[b'fmuas/clock/time'] = time.time() - self._boot_time/1e6
 
         if self.rx_indices is not None:
-            for i in self.rx_indices:
-                rx_data[list(rx_data.keys())[i]] = 20*math.sin(self._time/2e6)
+            rx_data.values[self.rx_indices] = 20*math.sin(self._time/2e6)
 
         now = datetime.datetime.now()
         rx_data[b'sim/time/zulu_time_sec'] = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
         rx_data[b'sim/time/paused'] = 0
 
-        await asyncio.sleep(1 / self._freq)
-
     async def run(self) -> None:
         logger.warning("Data streaming...")
         await self._testxpconnect_run_loop()
@@ -292,77 +395,66 @@ class TestXPConnect:
 
 class MotorHub:
     def __init__(self, freq: int = FREQ) -> None:
-        if os.path.exists(f:='./'+config.get('db_files', 'motorhub')):
-            os.remove(f)
-            logger.debug(f"Removing preexisting {f}")
-        logger.debug(f"Compiling {f}")
-
-        _registry = pycyphal.application.make_registry(environment_variables={
-            'UAVCAN__NODE__ID'                      :db_config.get('node_ids', 'motorhub'),
-            'UAVCAN__UDP__IFACE'                    :db_config.get('main', 'udp'),
-
-            'UAVCAN__SUB__SERVO_READINESS__ID'      :db_config.get('subject_ids', 'servo_readiness'),
-            'UAVCAN__SUB__ESC_READINESS__ID'        :db_config.get('subject_ids', 'esc_readiness'),
-
-            'UAVCAN__SUB__ELEVON1_SP__ID'           :db_config.get('subject_ids', 'elevon1_sp'),
-            'UAVCAN__PUB__ELEVON1_FEEDBACK__ID'     :db_config.get('subject_ids', 'elevon1_feedback'),
-            'UAVCAN__PUB__ELEVON1_STATUS__ID'       :db_config.get('subject_ids', 'elevon1_status'),
-            'UAVCAN__PUB__ELEVON1_POWER__ID'        :db_config.get('subject_ids', 'elevon1_power'),
-            'UAVCAN__PUB__ELEVON1_DYNAMICS__ID'     :db_config.get('subject_ids', 'elevon1_dynamics'),
-
-            'UAVCAN__SUB__ELEVON2_SP__ID'           :db_config.get('subject_ids', 'elevon2_sp'),
-            'UAVCAN__PUB__ELEVON2_FEEDBACK__ID'     :db_config.get('subject_ids', 'elevon2_feedback'),
-            'UAVCAN__PUB__ELEVON2_STATUS__ID'       :db_config.get('subject_ids', 'elevon2_status'),
-            'UAVCAN__PUB__ELEVON2_POWER__ID'        :db_config.get('subject_ids', 'elevon2_power'),
-            'UAVCAN__PUB__ELEVON2_DYNAMICS__ID'     :db_config.get('subject_ids', 'elevon2_dynamics'),
-
-            'UAVCAN__SUB__TILT_SP__ID'              :db_config.get('subject_ids', 'tilt_sp'),
-            'UAVCAN__PUB__TILT_FEEDBACK__ID'        :db_config.get('subject_ids', 'tilt_feedback'),
-            'UAVCAN__PUB__TILT_STATUS__ID'          :db_config.get('subject_ids', 'tilt_status'),
-            'UAVCAN__PUB__TILT_POWER__ID'           :db_config.get('subject_ids', 'tilt_power'),
-            'UAVCAN__PUB__TILT_DYNAMICS__ID'        :db_config.get('subject_ids', 'tilt_dynamics'),
-
-            'UAVCAN__SUB__ESC1_SP__ID'              :db_config.get('subject_ids', 'esc1_sp'),
-            'UAVCAN__PUB__ESC1_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc1_feedback'),
-            'UAVCAN__PUB__ESC1_STATUS__ID'          :db_config.get('subject_ids', 'esc1_status'),
-            'UAVCAN__PUB__ESC1_POWER__ID'           :db_config.get('subject_ids', 'esc1_power'),
-            'UAVCAN__PUB__ESC1_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc1_dynamics'),
-
-            'UAVCAN__SUB__ESC2_SP__ID'              :db_config.get('subject_ids', 'esc2_sp'),
-            'UAVCAN__PUB__ESC2_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc2_feedback'),
-            'UAVCAN__PUB__ESC2_STATUS__ID'          :db_config.get('subject_ids', 'esc2_status'),
-            'UAVCAN__PUB__ESC2_POWER__ID'           :db_config.get('subject_ids', 'esc2_power'),
-            'UAVCAN__PUB__ESC2_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc2_dynamics'),
-
-            'UAVCAN__SUB__ESC3_SP__ID'              :db_config.get('subject_ids', 'esc3_sp'),
-            'UAVCAN__PUB__ESC3_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc3_feedback'),
-            'UAVCAN__PUB__ESC3_STATUS__ID'          :db_config.get('subject_ids', 'esc3_status'),
-            'UAVCAN__PUB__ESC3_POWER__ID'           :db_config.get('subject_ids', 'esc3_power'),
-            'UAVCAN__PUB__ESC3_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc3_dynamics'),
-
-            'UAVCAN__SUB__ESC4_SP__ID'              :db_config.get('subject_ids', 'esc4_sp'),
-            'UAVCAN__PUB__ESC4_FEEDBACK__ID'        :db_config.get('subject_ids', 'esc4_feedback'),
-            'UAVCAN__PUB__ESC4_STATUS__ID'          :db_config.get('subject_ids', 'esc4_status'),
-            'UAVCAN__PUB__ESC4_POWER__ID'           :db_config.get('subject_ids', 'esc4_power'),
-            'UAVCAN__PUB__ESC4_DYNAMICS__ID'        :db_config.get('subject_ids', 'esc4_dynamics'),
-        })
-
-        for var in os.environ:
-            if var.startswith('UAVCAN__'):
-                os.environ.pop(var)
-        for var, value in _registry.environment_variables.items():
-            assert isinstance(value, bytes)
-            os.environ[var] = value.decode('utf-8')
-
         self._freq = freq
         self.stop = asyncio.Event()
+        self._actuators = tx_data.view('actuators') # elevon1, elevon2, tilt (deg), rpm1-4
         
         node_info = uavcan.node.GetInfo_1.Response(
             software_version=uavcan.node.Version_1(major=1, minor=0),
             name='fmuas.motorhub',
         )
 
-        self._registry = pycyphal.application.make_registry(config.get('db_files', 'motorhub'))
+        self._registry = open_registry(config.get('db_files', 'motorhub'), {
+            'uavcan.node.id'                        :db_config.getint('node_ids', 'motorhub'),
+            'uavcan.udp.iface'                      :db_config.get('main', 'udp'),
+            'uavcan.diagnostic.severity'            :DIAGNOSTIC_SEVERITY,
+
+            'uavcan.sub.servo_readiness.id'         :db_config.getint('subject_ids', 'servo_readiness'),
+            'uavcan.sub.esc_readiness.id'           :db_config.getint('subject_ids', 'esc_readiness'),
+            'uavcan.sub.actuator_sp.id'             :db_config.getint('subject_ids', 'actuator_sp'),
+
+            'uavcan.sub.elevon1_sp.id'              :db_config.getint('subject_ids', 'elevon1_sp'),
+            'uavcan.pub.elevon1_feedback.id'        :db_config.getint('subject_ids', 'elevon1_feedback'),
+            'uavcan.pub.elevon1_status.id'          :db_config.getint('subject_ids', 'elevon1_status'),
+            'uavcan.pub.elevon1_power.id'           :db_config.getint('subject_ids', 'elevon1_power'),
+            'uavcan.pub.elevon1_dynamics.id'        :db_config.getint('subject_ids', 'elevon1_dynamics'),
+
+            'uavcan.sub.elevon2_sp.id'              :db_config.getint('subject_ids', 'elevon2_sp'),
+            'uavcan.pub.elevon2_feedback.id'        :db_config.getint('subject_ids', 'elevon2_feedback'),
+            'uavcan.pub.elevon2_status.id'          :db_config.getint('subject_ids', 'elevon2_status'),
+            'uavcan.pub.elevon2_power.id'           :db_config.getint('subject_ids', 'elevon2_power'),
+            'uavcan.pub.elevon2_dynamics.id'        :db_config.getint('subject_ids', 'elevon2_dynamics'),
+
+            'uavcan.sub.tilt_sp.id'                 :db_config.getint('subject_ids', 'tilt_sp'),
+            'uavcan.pub.tilt_feedback.id'           :db_config.getint('subject_ids', 'tilt_feedback'),
+            'uavcan.pub.tilt_status.id'             :db_config.getint('subject_ids', 'tilt_status'),
+            'uavcan.pub.tilt_power.id'              :db_config.getint('subject_ids', 'tilt_power'),
+            'uavcan.pub.tilt_dynamics.id'           :db_config.getint('subject_ids', 'tilt_dynamics'),
+
+            'uavcan.sub.esc1_sp.id'                 :db_config.getint('subject_ids', 'esc1_sp'),
+            'uavcan.pub.esc1_feedback.id'           :db_config.getint('subject_ids', 'esc1_feedback'),
+            'uavcan.pub.esc1_status.id'             :db_config.getint('subject_ids', 'esc1_status'),
+            'uavcan.pub.esc1_power.id'              :db_config.getint('subject_ids', 'esc1_power'),
+            'uavcan.pub.esc1_dynamics.id'           :db_config.getint('subject_ids', 'esc1_dynamics'),
+
+            'uavcan.sub.esc2_sp.id'                 :db_config.getint('subject_ids', 'esc2_sp'),
+            'uavcan.pub.esc2_feedback.id'           :db_config.getint('subject_ids', 'esc2_feedback'),
+            'uavcan.pub.esc2_status.id'             :db_config.getint('subject_ids', 'esc2_status'),
+            'uavcan.pub.esc2_power.id'              :db_config.getint('subject_ids', 'esc2_power'),
+            'uavcan.pub.esc2_dynamics.id'           :db_config.getint('subject_ids', 'esc2_dynamics'),
+
+            'uavcan.sub.esc3_sp.id'                 :db_config.getint('subject_ids', 'esc3_sp'),
+            'uavcan.pub.esc3_feedback.id'           :db_config.getint('subject_ids', 'esc3_feedback'),
+            'uavcan.pub.esc3_status.id'             :db_config.getint('subject_ids', 'esc3_status'),
+            'uavcan.pub.esc3_power.id'              :db_config.getint('subject_ids', 'esc3_power'),
+            'uavcan.pub.esc3_dynamics.id'           :db_config.getint('subject_ids', 'esc3_dynamics'),
+
+            'uavcan.sub.esc4_sp.id'                 :db_config.getint('subject_ids', 'esc4_sp'),
+            'uavcan.pub.esc4_feedback.id'           :db_config.getint('subject_ids', 'esc4_feedback'),
+            'uavcan.pub.esc4_status.id'             :db_config.getint('subject_ids', 'esc4_status'),
+            'uavcan.pub.esc4_power.id'              :db_config.getint('subject_ids', 'esc4_power'),
+            'uavcan.pub.esc4_dynamics.id'           :db_config.getint('subject_ids', 'esc4_dynamics'),
+        })
         self._node = pycyphal.application.make_node(node_info, self._registry)
 
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.INITIALIZATION
@@ -370,6 +462,7 @@ class MotorHub:
 
         self._sub_servo_readiness = self._node.make_subscriber(reg.udral.service.common.Readiness_0, 'servo_readiness')
         self._sub_esc_readiness = self._node.make_subscriber(reg.udral.service.common.Readiness_0, 'esc_readiness')
+        self._sub_actuator_sp = self._node.make_subscriber(reg.udral.service.actuator.common.sp.Vector8_0, 'actuator_sp')
 
         self._sub_elevon1_sp = self._node.make_subscriber(reg.udral.physics.dynamics.rotation.Planar_0, 'elevon1_sp')
         self._pub_elevon1_feedback = self._node.make_publisher(reg.udral.service.actuator.common.Feedback_0, 'elevon1_feedback')
@@ -417,6 +510,7 @@ class MotorHub:
 
         self._sub_servo_readiness.receive_in_background(self._on_servo_readiness)
         self._sub_esc_readiness.receive_in_background(self._on_esc_readiness)
+        self._sub_actuator_sp.receive_in_background(self._on_actuator_sp)
         self._sub_elevon1_sp.receive_in_background(self._on_elevon1_sp)
         self._sub_elevon2_sp.receive_in_background(self._on_elevon2_sp)
         self._sub_tilt_sp.receive_in_background(self._on_tilt_sp)
@@ -486,7 +580,7 @@ class MotorHub:
                     uavcan.node.ExecuteCommand_1.Response.STATUS_BAD_COMMAND
                 )
 
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _motorhub_run_loop(self) -> None:
         now = time.monotonic()
         try:
@@ -629,8 +723,6 @@ class MotorHub:
         except pycyphal.presentation._port._error.PortClosedError:
             pass
 
-        await asyncio.sleep(1 / self._freq)
-
     #region Subscribers
     def _on_servo_readiness(self, msg: reg.udral.service.common.Readiness_0, _: pycyphal.transport.TransferFrom) -> None:
         self._servo_readiness = msg.value
@@ -638,8 +730,24 @@ class MotorHub:
     def _on_esc_readiness(self, msg: reg.udral.service.common.Readiness_0, _: pycyphal.transport.TransferFrom) -> None:
         self._esc_readiness = msg.value
 
+    def _on_actuator_sp(self, msg: reg.udral.service.actuator.common.sp.Vector8_0, _: pycyphal.transport.TransferFrom) -> None:
+        """Handle every actuator setpoint in one vector (elevon1, elevon2, tilt, esc1-4)."""
+        value = msg.value
+        np.degrees(value[:3], out=self._actuators[:3])
+        np.multiply(value[3:7], RADS_TO_RPM, out=self._actuators[3:])
+        asyncio.create_task(self._publish_actuator_status())
+
+    async def _publish_actuator_status(self) -> None:
+        await self._publish_elevon1_status()
+        await self._publish_elevon2_status()
+        await self._publish_tilt_status()
+        await self._publish_esc1_status()
+        await self._publish_esc2_status()
+        await self._publish_esc3_status()
+        await self._publish_esc4_status()
+
     def _on_elevon1_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/elevon1'] = math.degrees(msg.kinematics.angular_position.radian)
+        self._actuators[0] = math.degrees(msg.kinematics.angular_position.radian)
         asyncio.create_task(self._publish_elevon1_status())
 
     async def _publish_elevon1_status(self) -> None:
@@ -660,7 +768,7 @@ class MotorHub:
             self._elevon1_publish_time = time.monotonic()
 
     def _on_elevon2_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/elevon2'] = math.degrees(msg.kinematics.angular_position.radian)
+        self._actuators[1] = math.degrees(msg.kinematics.angular_position.radian)
         asyncio.create_task(self._publish_elevon2_status())
 
     async def _publish_elevon2_status(self) -> None:
@@ -681,7 +789,7 @@ class MotorHub:
             self._elevon2_publish_time = time.monotonic()
 
     def _on_tilt_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/wing_tilt'] = math.degrees(msg.kinematics.angular_position.radian)
+        self._actuators[2] = math.degrees(msg.kinematics.angular_position.radian)
         asyncio.create_task(self._publish_tilt_status())
 
     async def _publish_tilt_status(self) -> None:
@@ -702,7 +810,7 @@ class MotorHub:
             self._tilt_publish_time = time.monotonic()
 
     def _on_esc1_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/rpm1'] = msg.kinematics.angular_velocity.radian_per_second * (30/math.pi)
+        self._actuators[3] = msg.kinematics.angular_velocity.radian_per_second * RADS_TO_RPM
         asyncio.create_task(self._publish_esc1_status())
 
     async def _publish_esc1_status(self) -> None:
@@ -723,7 +831,7 @@ class MotorHub:
             self._esc1_publish_time = time.monotonic()
 
     def _on_esc2_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/rpm2'] = msg.kinematics.angular_velocity.radian_per_second * (30/math.pi)
+        self._actuators[4] = msg.kinematics.angular_velocity.radian_per_second * RADS_TO_RPM
         asyncio.create_task(self._publish_esc2_status())
 
     async def _publish_esc2_status(self) -> None:
@@ -744,7 +852,7 @@ class MotorHub:
             self._esc2_publish_time = time.monotonic()
 
     def _on_esc3_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/rpm3'] = msg.kinematics.angular_velocity.radian_per_second * (30/math.pi)
+        self._actuators[5] = msg.kinematics.angular_velocity.radian_per_second * RADS_TO_RPM
         asyncio.create_task(self._publish_esc3_status())
 
     async def _publish_esc3_status(self) -> None:
@@ -765,7 +873,7 @@ class MotorHub:
             self._esc3_publish_time = time.monotonic()
 
     def _on_esc4_sp(self, msg: reg.udral.physics.dynamics.rotation.Planar_0, _: pycyphal.transport.TransferFrom) -> None:
-        tx_data[b'fmuas/afcs/output/rpm4'] = msg.kinematics.angular_velocity.radian_per_second * (30/math.pi)
+        self._actuators[6] = msg.kinematics.angular_velocity.radian_per_second * RADS_TO_RPM
         asyncio.create_task(self._publish_esc4_status())
 
     async def _publish_esc4_status(self) -> None:
@@ -797,42 +905,35 @@ class MotorHub:
 
 class SensorHub:
     def __init__(self, freq: int = FREQ) -> None:
-        if os.path.exists(f:='./'+config.get('db_files', 'sensorhub')):
-            os.remove(f)
-            logger.debug(f"Removing preexisting {f}")
-        logger.debug(f"Compiling {f}")
-
-        _registry = pycyphal.application.make_registry(environment_variables={
-            'UAVCAN__NODE__ID'                      :db_config.get('node_ids', 'sensorhub'),
-            'UAVCAN__UDP__IFACE'                    :db_config.get('main', 'udp'),
-
-            'UAVCAN__PUB__INERTIAL__ID'             :db_config.get('subject_ids', 'inertial'),
-            'UAVCAN__PUB__ALTITUDE__ID'             :db_config.get('subject_ids', 'altitude'),
-            'UAVCAN__PUB__IAS__ID'                  :db_config.get('subject_ids', 'ias'),
-            'UAVCAN__PUB__AOA__ID'                  :db_config.get('subject_ids', 'aoa'),
-
-            'UAVCAN__SUB__CLOCK_SYNC_TIME__ID'      :db_config.get('subject_ids', 'clock_sync_time'),
-            'UAVCAN__SUB__GPS_SYNC_TIME__ID'        :db_config.get('subject_ids', 'gps_sync_time')
-        })
-        
-        for var in os.environ:
-            if var.startswith('UAVCAN__'):
-                os.environ.pop(var)
-        for var, value in _registry.environment_variables.items():
-            assert isinstance(value, bytes)
-            os.environ[var] = value.decode('utf-8')
-
         self._freq = freq
         self.stop = asyncio.Event()
         self._time = 0.0
         self._use_gps_time = False
+        self._quaternion = rx_data.view('quaternion')
+        self._gps_velocity = rx_data.view('gps_velocity')
+        self._rates = rx_data.view('rates')
+        self._ias = rx_data.slot(b'fmuas/adc/ias')
+        self._radalt = rx_data.slot(b'fmuas/radalt/altitude')
+        self._aoa = rx_data.slot(b'fmuas/adc/aoa')
         
         node_info = uavcan.node.GetInfo_1.Response(
             software_version=uavcan.node.Version_1(major=1, minor=0),
             name='fmuas.sensorhub',
         )
 
-        self._registry = pycyphal.application.make_registry(config.get('db_files', 'sensorhub'))
+        self._registry = open_registry(config.get('db_files', 'sensorhub'), {
+            'uavcan.node.id'                        :db_config.getint('node_ids', 'sensorhub'),
+            'uavcan.udp.iface'                      :db_config.get('main', 'udp'),
+            'uavcan.diagnostic.severity'            :DIAGNOSTIC_SEVERITY,
+
+            'uavcan.pub.inertial.id'                :db_config.getint('subject_ids', 'inertial'),
+            'uavcan.pub.altitude.id'                :db_config.getint('subject_ids', 'altitude'),
+            'uavcan.pub.ias.id'                     :db_config.getint('subject_ids', 'ias'),
+            'uavcan.pub.aoa.id'                     :db_config.getint('subject_ids', 'aoa'),
+
+            'uavcan.sub.clock_sync_time.id'         :db_config.getint('subject_ids', 'clock_sync_time'),
+            'uavcan.sub.gps_sync_time.id'           :db_config.getint('subject_ids', 'gps_sync_time'),
+        })
         self._node = pycyphal.application.make_node(node_info, self._registry)
 
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.INITIALIZATION
@@ -908,7 +1009,7 @@ class SensorHub:
                     uavcan.node.ExecuteCommand_1.Response.STATUS_BAD_COMMAND
                 )
 
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _sensorhub_run_loop(self) -> None:
         try:
             await self._pub_ins.publish(reg.udral.physics.kinematics.cartesian.StateVarTs_0(
@@ -917,14 +1018,7 @@ class SensorHub:
                     reg.udral.physics.kinematics.cartesian.PoseVar_0(
                         reg.udral.physics.kinematics.cartesian.Pose_0(
                             # position,
-                            orientation = uavcan.si.unit.angle.Quaternion_1(
-                                [
-                                    rx_data[b'fmuas/att/attitude_quaternion_w'],
-                                    rx_data[b'fmuas/att/attitude_quaternion_x'], 
-                                    rx_data[b'fmuas/att/attitude_quaternion_y'], 
-                                    rx_data[b'fmuas/att/attitude_quaternion_z']
-                                ]
-                            )
+                            orientation = uavcan.si.unit.angle.Quaternion_1(self._quaternion)
                         ),
                         # covariance
                     ),
@@ -932,15 +1026,11 @@ class SensorHub:
                         reg.udral.physics.kinematics.cartesian.Twist_0(
                             uavcan.si.unit.velocity.Vector3_1(
                                 # TODO: inertial velocity
-                                [rx_data[b'fmuas/gps/vn'], rx_data[b'fmuas/gps/ve'], rx_data[b'fmuas/gps/vd']],
+                                self._gps_velocity,
                             ),
                             uavcan.si.unit.angular_velocity.Vector3_1(
                                 # TODO: not extrinsic
-                                [
-                                    rx_data[b'fmuas/att/rollrate'],
-                                    rx_data[b'fmuas/att/pitchrate'],
-                                    rx_data[b'fmuas/att/yawrate'],
-                                ],
+                                self._rates,
                             )
                         ),
                         # covariance
@@ -951,17 +1041,15 @@ class SensorHub:
             await self._pub_ias.publish(reg.udral.physics.kinematics.translation.LinearTs_0(
                 uavcan.time.SynchronizedTimestamp_1(self._time),
                 reg.udral.physics.kinematics.translation.Linear_0(
-                    velocity = uavcan.si.unit.velocity.Scalar_1(rx_data[b'fmuas/adc/ias'])
+                    velocity = uavcan.si.unit.velocity.Scalar_1(rx_data.values[self._ias])
                 )
             ))
 
-            await self._pub_alt.publish(uavcan.si.unit.length.WideScalar_1(rx_data[b'fmuas/radalt/altitude']))
-            await self._pub_aoa.publish(uavcan.si.unit.angle.Scalar_1(rx_data[b'fmuas/adc/aoa']))
+            await self._pub_alt.publish(uavcan.si.unit.length.WideScalar_1(rx_data.values[self._radalt]))
+            await self._pub_aoa.publish(uavcan.si.unit.angle.Scalar_1(rx_data.values[self._aoa]))
         except pycyphal.presentation._port._error.PortClosedError:
             pass
 
-        await asyncio.sleep(1 / self._freq)
-
     def _on_time(self, msg: uavcan.time.SynchronizedTimestamp_1, _: pycyphal.transport.TransferFrom) -> None:
         self._time = msg.microsecond
 
@@ -986,39 +1074,28 @@ class SensorHub:
 
 class GPS:
     def __init__(self, freq: int = FREQ) -> None:
-        if os.path.exists(f:='./'+config.get('db_files', 'gps')):
-            os.remove(f)
-            logger.debug(f"Removing preexisting {f}")
-        logger.debug(f"Compiling {f}")
-        
-        _registry = pycyphal.application.make_registry(environment_variables={
-            'UAVCAN__NODE__ID'                      :db_config.get('node_ids', 'gps'),
-            'UAVCAN__UDP__IFACE'                    :db_config.get('main', 'udp'),
-
-            'UAVCAN__PUB__GPS__ID'                  :db_config.get('subject_ids', 'gps'),
-            'UAVCAN__PUB__GPS_SYNC_TIME__ID'        :db_config.get('subject_ids', 'gps_sync_time'),
-
-            'UAVCAN__SUB__CLOCK_SYNC_TIME__ID'      :db_config.get('subject_ids', 'clock_sync_time'),
-        })
-        
-        for var in os.environ:
-            if var.startswith('UAVCAN__'):
-                os.environ.pop(var)
-        for var, value in _registry.environment_variables.items():
-            assert isinstance(value, bytes)
-            os.environ[var] = value.decode('utf-8')
-
         self._freq = freq
         self.stop = asyncio.Event()
         self._time = 0.0
         self._gnss_time = 0.0
+        self._position = rx_data.view('gps_position') # lat, lon (rad), alt (m)
+        self._velocity = rx_data.view('gps_velocity')
         
         node_info = uavcan.node.GetInfo_1.Response(
             software_version=uavcan.node.Version_1(major=1, minor=0),
             name='fmuas.gps',
         )
 
-        self._registry = pycyphal.application.make_registry(config.get('db_files', 'gps'))
+        self._registry = open_registry(config.get('db_files', 'gps'), {
+            'uavcan.node.id'                        :db_config.getint('node_ids', 'gps'),
+            'uavcan.udp.iface'                      :db_config.get('main', 'udp'),
+            'uavcan.diagnostic.severity'            :DIAGNOSTIC_SEVERITY,
+
+            'uavcan.pub.gps.id'                     :db_config.getint('subject_ids', 'gps'),
+            'uavcan.pub.gps_sync_time.id'           :db_config.getint('subject_ids', 'gps_sync_time'),
+
+            'uavcan.sub.clock_sync_time.id'         :db_config.getint('subject_ids', 'clock_sync_time'),
+        })
         self._node = pycyphal.application.make_node(node_info, self._registry)
 
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.INITIALIZATION
@@ -1102,7 +1179,7 @@ class GPS:
             uavcan.time.TAIInfo_0(uavcan.time.TAIInfo_0.DIFFERENCE_TAI_MINUS_GPS)
         )
     
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _gps_run_loop(self) -> None:
         try:
             await self._pub_gps_sync_time_last.publish(uavcan.time.Synchronization_1(self._gnss_time))
@@ -1116,18 +1193,16 @@ class GPS:
                 reg.udral.physics.kinematics.geodetic.PointStateVar_0(
                     reg.udral.physics.kinematics.geodetic.PointVar_0(
                         reg.udral.physics.kinematics.geodetic.Point_0(
-                            rx_data[b'fmuas/gps/latitude'],
-                            rx_data[b'fmuas/gps/longitude'],
+                            self._position[0],
+                            self._position[1],
                             uavcan.si.unit.length.WideScalar_1(
-                                rx_data[b'fmuas/gps/altitude']
+                                self._position[2]
                             )
                         ),
                         # covariance
                     ),
                     reg.udral.physics.kinematics.translation.Velocity3Var_0(
-                        uavcan.si.unit.velocity.Vector3_1(
-                            [rx_data[b'fmuas/gps/vn'], rx_data[b'fmuas/gps/ve'], rx_data[b'fmuas/gps/vd']]
-                        ),
+                        uavcan.si.unit.velocity.Vector3_1(self._velocity),
                         # covariance
                     )
                 )
@@ -1136,8 +1211,6 @@ class GPS:
             await self._pub_gps_sync_time.publish(uavcan.time.SynchronizedTimestamp_1(self._gnss_time))
         except pycyphal.presentation._port._error.PortClosedError:
             pass
-        
-        await asyncio.sleep(1 / self._freq)
 
     def _on_time(self, msg: uavcan.time.SynchronizedTimestamp_1, _: pycyphal.transport.TransferFrom) -> None:
         self._time = msg.microsecond
@@ -1155,26 +1228,9 @@ class GPS:
 
 
 class Clock:
-    def __init__(self) -> None:
-        if os.path.exists(f:='./'+config.get('db_files', 'clock')):
-            os.remove(f)
-            logger.debug(f"Removing preexisting {f}")
-        logger.debug(f"Compiling {f}")
-        
-        _registry = pycyphal.application.make_registry(environment_variables={
-            'UAVCAN__NODE__ID'                      :db_config.get('node_ids', 'clock'),
-            'UAVCAN__UDP__IFACE'                    :db_config.get('main', 'udp'),
+    def __init__(self, freq: int = CLOCK_FREQ) -> None:
+        self._freq = freq
 
-            'UAVCAN__PUB__CLOCK_SYNC_TIME__ID'      :db_config.get('subject_ids', 'clock_sync_time'),
-        })
-        
-        for var in os.environ:
-            if var.startswith('UAVCAN__'):
-                os.environ.pop(var)
-        for var, value in _registry.environment_variables.items():
-            assert isinstance(value, bytes)
-            os.environ[var] = value.decode('utf-8')
-            
         self._sync_time = 0.0
         self.stop = asyncio.Event()
         
@@ -1183,7 +1239,13 @@ class Clock:
             name='fmuas.clock',
         )
 
-        self._registry = pycyphal.application.make_registry(config.get('db_files', 'clock'))
+        self._registry = open_registry(config.get('db_files', 'clock'), {
+            'uavcan.node.id'                        :db_config.getint('node_ids', 'clock'),
+            'uavcan.udp.iface'                      :db_config.get('main', 'udp'),
+            'uavcan.diagnostic.severity'            :DIAGNOSTIC_SEVERITY,
+
+            'uavcan.pub.clock_sync_time.id'         :db_config.getint('subject_ids', 'clock_sync_time'),
+        })
         self._node = pycyphal.application.make_node(node_info, self._registry)
 
         self._node.heartbeat_publisher.mode = uavcan.node.Mode_1.INITIALIZATION
@@ -1255,7 +1317,7 @@ class Clock:
             uavcan.time.TAIInfo_0(uavcan.time.TAIInfo_0.DIFFERENCE_TAI_MINUS_UTC_UNKNOWN)
         )
 
-    @async_loop_decorator()
+    @async_loop_decorator(freq='_freq')
     async def _clock_run_loop(self) -> None:
         try:
             await self._pub_sync_time_last.publish(uavcan.time.Synchronization_1(int(self._sync_time))) # Last timestamp
@@ -1265,7 +1327,6 @@ class Clock:
             await self._pub_sync_time.publish(uavcan.time.SynchronizedTimestamp_1(int(self._sync_time))) # Current timestamp
         except pycyphal.presentation._port._error.PortClosedError:
             pass
-        await asyncio.sleep(0)
 
     async def run(self) -> None:
         await self._clock_run_loop()
@@ -1376,8 +1437,7 @@ class Camera:
                     self._att = [0, 0]
                 else:
                     self._att = py_to_rp(*[math.degrees(the) for the in quaternion_to_euler(msg.q)[1:]])
-                tx_data[b'fmuas/camera/roll'] = self._att[0]
-                tx_data[b'fmuas/camera/pitch'] = self._att[1]
+                tx_data.view('camera')[:] = self._att
         await asyncio.sleep(0)
 
     async def _camera_run(self) -> None:
@@ -1413,12 +1473,7 @@ class Camera:
                     int(math.degrees(rx_data[b'fmuas/gps/longitude'])*1e7), # lon 1e7
                     int(math.degrees(rx_data[b'fmuas/gps/altitude'])*1e3), # alt mm
                     int(math.degrees(rx_data[b'fmuas/radalt/altitude'])*1e3), # alt mm
-                    [
-                        rx_data[b'fmuas/att/attitude_quaternion_w'],
-                        rx_data[b'fmuas/att/attitude_quaternion_x'],
-                        rx_data[b'fmuas/att/attitude_quaternion_y'],
-                        rx_data[b'fmuas/att/attitude_quaternion_z'],
-                    ],
+                    rx_data.view('quaternion').tolist(),
                     0, # index
                     1, # success
                     url
@@ -1447,7 +1502,7 @@ class Camera:
                 except asyncio.exceptions.CancelledError:
                     break
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq=1)
     async def _camera_heartbeat_loop(self) -> None:
         self._camera_mav_conn.mav.heartbeat_send(
             m.MAV_TYPE_CAMERA,
@@ -1456,7 +1511,6 @@ class Camera:
             0,
             m.MAV_STATE_ACTIVE
         )
-        await asyncio.sleep(1)
 
     async def _heartbeat(self) -> None:
         await self._camera_heartbeat_loop()
@@ -1561,8 +1615,7 @@ class TestCamera:
                     self._att = [0, 0]
                 else:
                     self._att = py_to_rp(*[math.degrees(the) for the in quaternion_to_euler(msg.q)[1:]])
-                tx_data[b'fmuas/camera/roll'] = self._att[0]
-                tx_data[b'fmuas/camera/pitch'] = self._att[1]
+                tx_data.view('camera')[:] = self._att
         await asyncio.sleep(0)
 
     async def _testcamera_run(self) -> None:
@@ -1598,12 +1651,7 @@ class TestCamera:
                     int(math.degrees(rx_data[b'fmuas/gps/longitude'])*1e7), # lon 1e7
                     int(math.degrees(rx_data[b'fmuas/gps/altitude'])*1e3), # alt mm
                     int(math.degrees(rx_data[b'fmuas/radalt/altitude'])*1e3), # alt mm
-                    [
-                        rx_data[b'fmuas/att/attitude_quaternion_w'],
-                        rx_data[b'fmuas/att/attitude_quaternion_x'],
-                        rx_data[b'fmuas/att/attitude_quaternion_y'],
-                        rx_data[b'fmuas/att/attitude_quaternion_z'],
-                    ],
+                    rx_data.view('quaternion').tolist(),
                     0, # index
                     1, # success
                     url
@@ -1627,7 +1675,7 @@ class TestCamera:
                 except asyncio.exceptions.CancelledError:
                     break
 
-    @async_loop_decorator(close=False)
+    @async_loop_decorator(close=False, freq=1)
     async def _testcamera_heartbeat_loop(self) -> None:
         self._camera_mav_conn.mav.heartbeat_send(
             m.MAV_TYPE_CAMERA,
@@ -1636,7 +1684,6 @@ class TestCamera:
             0,
             m.MAV_STATE_ACTIVE
         )
-        await asyncio.sleep(1)
 
     async def _heartbeat(self) -> None:
         await self._testcamera_heartbeat_loop()
@@ -1658,6 +1705,8 @@ async def main():
     gps = GPS()
     sns = SensorHub()
     mot = MotorHub()
+    startup.mark('nodes')
+    logger.info(f"Startup timing: {startup}")
 
     tasks = [
         asyncio.create_task(xpl.run()),
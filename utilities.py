@@ -128,5 +128,121 @@ def watcher() -> None:
     except KeyboardInterrupt:
         logging.warning("Closed watcher cycle")
 
+
+def afcs_output_benchmark(cycles: int = 100000) -> None:
+    """Time the AFCS output path and check that a cycle allocates no NumPy buffers."""
+    import math
+    import sys
+    import time
+    import tracemalloc
+
+    import numpy as np
+
+    import common.control as control
+    from common.states import GlobalStates as g
+
+    state = control.ControlState()
+    state._fcommand[:] = [0.1, -0.1, 0.0, 0.6]
+    state._vcommand[:] = [0.02, 0.05, math.nan, 0.98] # Saturated and invalid inputs
+    state._vtol_ratio = 0.4
+    buffers = [state._outputs, state._servos, state._throttles, state._fcommand, state._vcommand]
+
+    numpy_only = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+
+    def numpy_memory() -> int:
+        return sum(trace.size for trace in tracemalloc.take_snapshot().filter_traces(numpy_only).traces)
+
+    for submode in [
+        g.CUSTOM_SUBMODE_LANDING_HOVER,
+        g.CUSTOM_SUBMODE_TAKEOFF_TRANSIT,
+        g.CUSTOM_SUBMODE_LANDING_TRANSIT,
+        g.CUSTOM_SUBMODE_FLIGHT_NORMAL,
+        g.CUSTOM_SUBMODE_UNINIT,
+    ]:
+        control._mix(state, submode) # Warm up
+
+        tstart = time.perf_counter_ns()
+        for _ in range(cycles):
+            control._mix(state, submode)
+        elapsed = time.perf_counter_ns() - tstart
+
+        # Temporaries are freed before a cycle returns, so look at the
+        # NumPy buffers alive after every bytecode of one traced cycle
+        tracemalloc.start()
+        before = numpy_memory()
+        allocated = 0
+
+        def trace(frame, event, _):
+            nonlocal allocated
+            frame.f_trace_opcodes = True
+            if event == 'opcode':
+                allocated = max(allocated, numpy_memory() - before)
+            return trace
+
+        sys.settrace(trace)
+        control._mix(state, submode)
+        sys.settrace(None)
+        tracemalloc.stop()
+
+        assert all(a is b for a, b in zip(buffers, [state._outputs, state._servos, state._throttles, state._fcommand, state._vcommand])), "Output buffer was reallocated"
+        assert allocated == 0, f"{g.CUSTOM_SUBMODE_NAMES[submode]} allocated {allocated} bytes of NumPy buffers in a cycle"
+
+        print(f"{g.CUSTOM_SUBMODE_NAMES[submode]:<16} {elapsed/cycles/1e3:7.2f} us/cycle, {allocated} bytes of NumPy buffers allocated per cycle")
+
+def txbuffer_benchmark(cycles: int = 100000) -> None:
+    """Compare in-place TxBuffer setpoints with rebuilding the DSDL messages."""
+    import gc
+    import sys
+    import time
+
+    from uav.uav import TxBuffer, RPM_TO_RADS # Puts the generated DSDL package on sys.path
+
+    import reg.udral.physics.dynamics.rotation
+    import reg.udral.physics.kinematics.rotation
+    import uavcan.si.unit.angle
+    import uavcan.si.unit.angular_velocity
+
+    txdata = TxBuffer()
+    messages = [txdata.elevon1, txdata.elevon2, txdata.tilt, txdata.esc1, txdata.esc2, txdata.esc3, txdata.esc4]
+
+    def inplace(value: float) -> None:
+        txdata.elevon1 = value
+        txdata.elevon2 = value
+        txdata.tilt = value
+        txdata.esc1 = value
+        txdata.esc2 = value
+        txdata.esc3 = value
+        txdata.esc4 = value
+
+    def rebuild(value: float) -> None:
+        for _ in range(3):
+            reg.udral.physics.dynamics.rotation.Planar_0(
+                reg.udral.physics.kinematics.rotation.Planar_0(
+                    uavcan.si.unit.angle.Scalar_1(value)
+                )
+            )
+        for _ in range(4):
+            reg.udral.physics.dynamics.rotation.Planar_0(
+                reg.udral.physics.kinematics.rotation.Planar_0(
+                    angular_velocity=uavcan.si.unit.angular_velocity.Scalar_1(value * RPM_TO_RADS)
+                )
+            )
+
+    for name, func in [('rebuild', rebuild), ('in place', inplace)]:
+        func(0.0) # Warm up
+        collections = gc.get_stats()[0]['collections']
+        blocks = sys.getallocatedblocks()
+        tstart = time.perf_counter_ns()
+        for i in range(cycles):
+            func(i * 1e-3)
+        elapsed = time.perf_counter_ns() - tstart
+        blocks = sys.getallocatedblocks() - blocks
+        collections = gc.get_stats()[0]['collections'] - collections
+
+        print(f"{name:<9} {elapsed/cycles/1e3:6.2f} us/cycle, {collections} gen0 collections, {blocks} blocks retained after {cycles} cycles")
+
+    assert all(a is b for a, b in zip(messages, [txdata.elevon1, txdata.elevon2, txdata.tilt, txdata.esc1, txdata.esc2, txdata.esc3, txdata.esc4])), "TxBuffer message was reallocated"
+    assert abs(txdata.esc4.kinematics.angular_velocity.radian_per_second - (cycles-1) * 1e-3 * RPM_TO_RADS) < 1e-3
+
 if __name__=='__main__':
     template_generator()
\ No newline at end of file